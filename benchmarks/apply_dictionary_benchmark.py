@@ -0,0 +1,82 @@
+"""Benchmark of applying a dictionary to a corpus, per token lookups vs vectorized lookups.
+"""
+import sys
+from os.path import dirname, join
+
+sys.path.insert(0, join(dirname(dirname(__file__)), "src"))
+
+from stage_apply_dictionary import apply_dictionary, apply_dictionary_with_unknown
+
+import argparse
+import time
+
+import numpy as np
+
+
+def create_corpus(num_tokens, vocabulary_size, seed=0):
+    """Creates a corpus with zipfian token frequencies.
+
+    Args:
+        num_tokens: number of tokens in the corpus.
+        vocabulary_size: number of distinct tokens the corpus is drawn from.
+        seed: seed of the random generator.
+
+    Returns:
+        String with the space separated tokens.
+    """
+    generator = np.random.default_rng(seed)
+    ranks = generator.zipf(1.2, num_tokens) % vocabulary_size
+    words = ["word{}".format(i) for i in range(vocabulary_size)]
+    return " ".join([words[r] for r in ranks])
+
+def create_dictionary(tokens, frequency_threshold):
+    """Creates a dictionary the same way as the dictionary creation stage.
+    """
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    dictionary = {}
+    for token in counts:
+        if counts[token] > frequency_threshold:
+            dictionary[token] = len(dictionary)
+    dictionary["<<unk>>"] = len(dictionary)
+    return dictionary
+
+def apply_per_token(tokens, dictionary):
+    """The per token implementation, 1 pass for unknown tokens and 1 pass for the lookups.
+    """
+    count = 0
+    for i, token in enumerate(tokens):
+        if not token in dictionary:
+            tokens[i] = "<<unk>>"
+            count += 1
+    return apply_dictionary(tokens, dictionary), count
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of applying a dictionary.")
+    parser.add_argument("--num-tokens", type=int, default=10000000)
+    parser.add_argument("--vocabulary-size", type=int, default=1000000)
+    parser.add_argument("--frequency-threshold", type=int, default=3)
+    args = parser.parse_args()
+
+    text = create_corpus(args.num_tokens, args.vocabulary_size)
+    dictionary = create_dictionary(text.split(" "), args.frequency_threshold)
+    print("{} tokens, {} dictionary entries".format(args.num_tokens, len(dictionary)))
+
+    results = {}
+    for name, function in [("per token", apply_per_token),
+                           ("vectorized", apply_dictionary_with_unknown)]:
+        # Fresh token strings, as read from the corpus file by the stage.
+        tokens = text.split(" ")
+        start = time.perf_counter()
+        results[name] = function(tokens, dictionary)
+        elapsed = time.perf_counter() - start
+        print("{:>10}: {:6.2f} s, {:6.2f} M tokens/s".format(name, elapsed,
+                                                             len(tokens) / elapsed / 1e6))
+
+    (ids, count), (vectorized_ids, vectorized_count) = results.values()
+    assert count == vectorized_count and np.array_equal(ids, vectorized_ids)
+    print("Same ids, {} unknown tokens".format(count))
+
+if __name__ == "__main__":
+    main()
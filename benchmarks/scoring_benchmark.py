@@ -0,0 +1,140 @@
+"""Benchmark client of the n-gram scoring server.
+
+Sends batches of sentences of a text corpus to a running scoring server, or to the scoring
+API in process, and reports the latency percentiles of the requests and the throughput.
+"""
+import sys
+from os.path import dirname, join
+
+sys.path.insert(0, join(dirname(dirname(__file__)), "src"))
+
+from ngram_scoring import NgramScorer, get_model_paths
+
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from itertools import islice
+
+import argparse
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """Http connection over a Unix socket.
+    """
+
+    def __init__(self, socket_path):
+        super(UnixHTTPConnection, self).__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+class ScoringClient:
+    """Client of the scoring server, keeping 1 connection per thread.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8000, unix_socket=None):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.local = threading.local()
+
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            if self.unix_socket:
+                self.local.connection = UnixHTTPConnection(self.unix_socket)
+            else:
+                self.local.connection = HTTPConnection(self.host, self.port)
+        return self.local.connection
+
+    def score(self, sentences):
+        connection = self.connection()
+        connection.request("POST", "/score", json.dumps({"sentences": sentences}),
+                           {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        content = json.loads(response.read().decode("utf-8"))
+        if response.status != 200:
+            raise RuntimeError(content.get("error"))
+        return content["results"]
+
+def read_sentences(file_path, sentence_length, max_sentences):
+    """Cuts the lines of a text corpus into sentences.
+
+    Args:
+        file_path: a path to a text file with space separated tokens.
+        sentence_length: the number of tokens of a sentence.
+        max_sentences: the number of sentences read.
+
+    Returns:
+        A list of sentences, each a string of space separated tokens.
+    """
+    def generate():
+        with open(file_path) as file:
+            for line in file:
+                tokens = line.split()
+                for start in range(0, len(tokens) - sentence_length + 1, sentence_length):
+                    yield " ".join(tokens[start:start + sentence_length])
+    return list(islice(generate(), max_sentences))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the scoring server.")
+    parser.add_argument("corpus_file", help="text corpus, e.g. tmp/countries.test.txt")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", help="path to the Unix socket of the server")
+    parser.add_argument("--in-process", action="store_true",
+                        help="call the scoring API directly instead of a server")
+    parser.add_argument("--topic", default="countries", help="model of --in-process")
+    parser.add_argument("--ngram", type=int, default=2, help="model of --in-process")
+    parser.add_argument("--frequency-threshold", type=int, default=None,
+                        help="model of --in-process")
+    parser.add_argument("--num-requests", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--sentence-length", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup-requests", type=int, default=10)
+    args = parser.parse_args()
+
+    sentences = read_sentences(args.corpus_file, args.sentence_length, 100000)
+    if not sentences:
+        raise ValueError("{} has no sentences of {} tokens.".format(args.corpus_file,
+                                                                   args.sentence_length))
+    batches = [[sentences[(i * args.batch_size + j) % len(sentences)]
+                for j in range(args.batch_size)] for i in range(args.num_requests)]
+
+    if args.in_process:
+        scorer = NgramScorer(*get_model_paths(args.topic, args.ngram, args.frequency_threshold))
+        scorer.warm()
+        score = scorer.score
+    else:
+        score = ScoringClient(args.host, args.port, args.unix_socket).score
+
+    def timed(batch):
+        start = time.perf_counter()
+        score(batch)
+        return time.perf_counter() - start
+
+    for batch in batches[:args.warmup_requests]:
+        score(batch)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        latencies = np.array(list(executor.map(timed, batches))) * 1e3
+    elapsed = time.perf_counter() - start
+
+    num_sentences = args.num_requests * args.batch_size
+    print("{} requests of {} sentences of {} tokens, concurrency {}".format(
+        args.num_requests, args.batch_size, args.sentence_length, args.concurrency))
+    print("Latency: p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(
+        *np.percentile(latencies, [50, 90, 99, 100])))
+    print("Throughput: {:.1f} requests/s, {:.1f} sentences/s, {:.1f} k tokens/s".format(
+        args.num_requests / elapsed, num_sentences / elapsed,
+        num_sentences * args.sentence_length / elapsed / 1e3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark of the tokenizers of the cleaning stages, nltk.word_tokenize vs the regex tokenizer.
+
+Reports the time of both tokenizers on a sample of raw articles and how many of the nltk tokens
+the regex tokenizer reproduces.
+"""
+import sys
+from os.path import dirname, join
+
+sys.path.insert(0, join(dirname(dirname(__file__)), "src"))
+
+from corpus_io import read_articles
+from stage_text_cleaning import clean_article
+from tokenization import get_tokenizer
+from wiki_dump_reader import Cleaner
+
+from collections import Counter
+from difflib import SequenceMatcher
+from itertools import islice
+
+import argparse
+import time
+
+
+class IdentityCache:
+    """Stand-in for the normalization cache that keeps the tokens as they are.
+    """
+
+    def get(self, token):
+        return token
+
+def prepare_texts(articles):
+    """Cleans the markup of the articles the same way as the cleaning stage does.
+
+    Args:
+        articles: a list with raw texts of the articles.
+
+    Returns:
+        A list with the texts the cleaning stage passes to the tokenizer.
+    """
+    texts = []
+
+    def record(text):
+        texts.append(text)
+        return []
+
+    cleaner = Cleaner()
+    for article in articles:
+        clean_article(article, cleaner, IdentityCache(), record)
+    return texts
+
+def compare(expected, actual, differences):
+    """Counts the tokens of the expected tokenization that the actual one reproduces.
+
+    Args:
+        expected: a list of tokens.
+        actual: a list of tokens of the same text.
+        differences: Counter of (expected, actual) pieces that differ, updated in place.
+
+    Returns:
+        The number of identical tokens.
+    """
+    matcher = SequenceMatcher(None, expected, actual, autojunk=False)
+    for operation, i1, i2, j1, j2 in matcher.get_opcodes():
+        if operation != "equal":
+            differences[(" ".join(expected[i1:i2]), " ".join(actual[j1:j2]))] += 1
+    return sum([block.size for block in matcher.get_matching_blocks()])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the tokenizers.")
+    parser.add_argument("corpus_file", help="raw corpus, e.g. tmp/countries.raw.txt")
+    parser.add_argument("--max-articles", type=int, default=1000)
+    parser.add_argument("--num-differences", type=int, default=20,
+                        help="number of the most common differences to print")
+    args = parser.parse_args()
+
+    articles = [article for article in islice(read_articles(args.corpus_file),
+                                              args.max_articles) if article.strip()]
+    texts = prepare_texts(articles)
+    print("{} articles, {} characters".format(len(texts), sum([len(t) for t in texts])))
+
+    results = {}
+    for name in ["nltk", "regex"]:
+        tokenize = get_tokenizer(name)
+        start = time.perf_counter()
+        results[name] = [tokenize(text) for text in texts]
+        elapsed = time.perf_counter() - start
+        num_tokens = sum([len(tokens) for tokens in results[name]])
+        print("{:>5}: {:6.2f} s, {:6.2f} k tokens/s".format(name, elapsed,
+                                                           num_tokens / elapsed / 1e3))
+
+    differences = Counter()
+    num_identical = sum([compare(expected, actual, differences)
+                         for expected, actual in zip(results["nltk"], results["regex"])])
+    num_tokens = sum([len(tokens) for tokens in results["nltk"]])
+    print("Agreement: {:.2%} of {} nltk tokens are identical".format(
+        num_identical / max(num_tokens, 1), num_tokens))
+    for (expected, actual), count in differences.most_common(args.num_differences):
+        print("{:>8}  {!r} -> {!r}".format(count, expected, actual))
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ LOGGING_PATH = join(WORKFLOW_ROOT, "logs")
 OUTPUT_PATH = join(WORKFLOW_ROOT, "output")
 DATA_PATH = join(WORKFLOW_ROOT, "data")
 TMP_PATH = join(WORKFLOW_ROOT, "tmp")
+CACHE_PATH = join(WORKFLOW_ROOT, "cache")
 SQL_SCRIPTS_PATH = join(WORKFLOW_ROOT, "sql_scripts")
 CONFIG_PATH = join(WORKFLOW_ROOT, "configs")
 
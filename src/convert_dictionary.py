@@ -0,0 +1,18 @@
+"""Converting json dictionaries to the binary vocabulary format.
+"""
+from vocabulary import convert_dictionary_file
+
+import json
+import argparse
+
+parser = argparse.ArgumentParser(description='Converting a json dictionary to a binary vocabulary.')
+parser.add_argument('dictionary_file')
+parser.add_argument('vocabulary_file')
+parser.add_argument('--counts-file', help='token counts of the corpus, to order the ids by frequency')
+args = parser.parse_args()
+
+counts = None
+if args.counts_file:
+    with open(args.counts_file) as file:
+        counts = [json.loads(line) for line in file]
+convert_dictionary_file(args.dictionary_file, args.vocabulary_file, counts)
@@ -0,0 +1,213 @@
+"""Helpers for reading corpus files without loading them whole.
+"""
+from os.path import exists, getmtime, getsize
+
+import mmap
+import os
+import random
+
+import numpy as np
+
+
+ARTICLE_END = b"<<article_end>>"
+
+
+def read_articles(file_path, buffer_size=1 << 20):
+    """Reads the articles from a corpus file one by one.
+
+    The text is split on <<article_end>> the same way text.split("<<article_end>>") would
+    split it, so the last item is whatever follows the last article.
+
+    Args:
+        file_path: a path to the file.
+        buffer_size: number of characters read from the file at once.
+
+    Yields:
+        String with the text of each article.
+    """
+    separator = "<<article_end>>"
+    with open(file_path, "r") as file:
+        rest = ""
+        while True:
+            data = file.read(buffer_size)
+            if not data:
+                break
+            parts = (rest + data).split(separator)
+            rest = parts.pop()
+            yield from parts
+        yield rest
+
+def read_token_chunks(file_path, chunk_size=1 << 24):
+    """Reads a space separated corpus file in chunks that do not cut any token in two.
+
+    Splitting every chunk on " " gives the same tokens, in the same order, as
+    text.split(" ") on the whole text.
+
+    Args:
+        file_path: a path to the file.
+        chunk_size: number of characters read from the file at once.
+
+    Yields:
+        String with a run of whole tokens.
+    """
+    with open(file_path, "r") as file:
+        rest = ""
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            data = rest + data
+            end = data.rfind(" ")
+            if end < 0:
+                rest = data
+                continue
+            rest = data[end + 1:]
+            yield data[:end]
+        yield rest
+
+def get_article_index_file_path(file_path):
+    """Helper function that names the article index of a corpus file.
+
+    Args:
+        file_path: a path to the corpus file.
+
+    Returns:
+        The path of the index, next to the corpus file.
+    """
+    return "{}.index.npy".format(file_path)
+
+def find_articles(data):
+    """Helper function that finds the articles in the bytes of a corpus.
+
+    An article runs from its first non-whitespace byte through its <<article_end>> tag.
+    Whatever follows the last tag is an article too, unless it is only whitespace.
+
+    Args:
+        data: the bytes of the corpus, e.g. a memory map of the file.
+
+    Returns:
+        A numpy uint64 array of shape (number of articles, 2) with the byte offset and the
+        byte length of every article.
+    """
+    index = []
+    start = 0
+    while start < len(data):
+        while start < len(data) and data[start:start + 1].isspace():
+            start += 1
+        if start == len(data):
+            break
+        end = data.find(ARTICLE_END, start)
+        end = len(data) if end < 0 else end + len(ARTICLE_END)
+        index.append((start, end - start))
+        start = end
+    return np.array(index, dtype=np.uint64).reshape(-1, 2)
+
+def build_article_index(file_path):
+    """Indexes the articles of a corpus file and saves the index next to it.
+
+    Args:
+        file_path: a path to the corpus file.
+
+    Returns:
+        The index, see find_articles.
+    """
+    with open(file_path, "rb") as file:
+        if getsize(file_path) == 0:
+            index = find_articles(b"")
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                index = find_articles(data)
+    index_file_path = get_article_index_file_path(file_path)
+    tmp_file_path = "{}.tmp".format(index_file_path)
+    with open(tmp_file_path, "wb") as file:
+        np.save(file, index)
+    os.replace(tmp_file_path, index_file_path)
+    return index
+
+def load_article_index(file_path):
+    """Loads the article index of a corpus file, building it if it is missing or outdated.
+
+    Args:
+        file_path: a path to the corpus file.
+
+    Returns:
+        The index, see find_articles.
+    """
+    index_file_path = get_article_index_file_path(file_path)
+    if exists(index_file_path) and getmtime(index_file_path) >= getmtime(file_path):
+        return np.load(index_file_path)
+    return build_article_index(file_path)
+
+class ArticleReader:
+    """Random access to the articles of a corpus file through a memory map and its index.
+
+    Only the articles that are read are paged in, the corpus is never loaded whole.
+    """
+
+    def __init__(self, file_path):
+        """Initialization for the article reader.
+
+        Args:
+            file_path: a path to the corpus file.
+        """
+        self.file_path = file_path
+        self.index = load_article_index(file_path)
+        self.file = open(file_path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if getsize(file_path) > 0 else b""
+
+    def close(self):
+        """Closes the memory map and the file.
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def article_bytes(self, index):
+        """Returns the utf-8 bytes of 1 article.
+        """
+        offset, length = self.index[index].tolist()
+        return self.data[offset:offset + length]
+
+    def __getitem__(self, index):
+        return self.article_bytes(index).decode("utf-8")
+
+    def sample(self, k):
+        """Returns k different articles picked at random.
+        """
+        return [self[i] for i in random.sample(range(len(self)), k)]
+
+    def shuffle(self):
+        """Returns the indices of all articles in random order.
+        """
+        indices = list(range(len(self)))
+        random.shuffle(indices)
+        return indices
+
+    def write_articles(self, indices, file):
+        """Copies articles to a binary file, separated by spaces, without decoding them.
+
+        Args:
+            indices: the indices of the articles, in the order they are written.
+            file: a file opened for writing bytes.
+
+        Returns:
+            The number of tokens written.
+        """
+        num_tokens = 0
+        for i, index in enumerate(indices):
+            article = self.article_bytes(index)
+            if i > 0:
+                file.write(b" ")
+            file.write(article)
+            num_tokens += article.count(b" ") + 1
+        return num_tokens
@@ -0,0 +1,193 @@
+"""Counting the n-grams of token id files with packed integer keys.
+
+An n-gram of token ids is packed into 1 uint64 key, every id taking the same number of bits
+and the first id taking the highest bits. Sorting the keys sorts the n-grams by their ids,
+so the counts of an order are 2 numpy arrays: the sorted keys and their counts.
+
+The file is counted in chunks, in worker processes if requested, and the sorted counts of
+the chunks are merged as they arrive, so only the merged counts and a few chunks are in
+memory at once.
+"""
+from token_ids import load_token_ids
+
+from multiprocessing import Pool
+
+import os
+
+import numpy as np
+
+
+def get_bits_per_id(vocabulary_size):
+    """Helper function that returns the number of bits a packed token id takes.
+
+    Args:
+        vocabulary_size: the number of different token ids.
+
+    Returns:
+        The number of bits needed for the largest id.
+    """
+    return max(int(vocabulary_size - 1).bit_length(), 1)
+
+def check_packing(order, bits):
+    """Helper function that checks whether n-grams of an order fit into 64 bit keys.
+
+    Args:
+        order: the number of tokens in the n-grams.
+        bits: the number of bits of 1 id.
+    """
+    if order * bits > 64:
+        raise ValueError("{}-grams of {} bit ids do not fit into 64 bit keys.".format(order,
+                                                                                   bits))
+
+def pack_ngrams(token_ids, order, bits):
+    """Packs all n-grams of an id array into keys.
+
+    Args:
+        token_ids: numpy array of token ids.
+        order: the number of tokens in the n-grams.
+        bits: the number of bits of 1 id.
+
+    Returns:
+        A numpy uint64 array with the key of the n-gram starting at every position.
+    """
+    num_ngrams = max(len(token_ids) - order + 1, 0)
+    keys = np.zeros(num_ngrams, dtype=np.uint64)
+    for i in range(order):
+        keys <<= np.uint64(bits)
+        keys |= token_ids[i:i + num_ngrams].astype(np.uint64)
+    return keys
+
+def unpack_keys(keys, order, bits):
+    """Unpacks keys into the ids of their n-grams.
+
+    Args:
+        keys: numpy array of keys.
+        order: the number of tokens in the n-grams.
+        bits: the number of bits of 1 id.
+
+    Returns:
+        A numpy uint32 array of shape (number of keys, order).
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    mask = np.uint64((1 << bits) - 1)
+    ids = np.empty((len(keys), order), dtype=np.uint32)
+    for i in range(order):
+        ids[:, order - 1 - i] = (keys >> np.uint64(bits * i)) & mask
+    return ids
+
+def merge_counts(runs):
+    """Merges sorted counts into 1 sorted count.
+
+    Args:
+        runs: a list of (keys, counts) tuples, each with sorted unique keys.
+
+    Returns:
+        A tuple of the sorted unique keys and their summed counts.
+    """
+    runs = [run for run in runs if len(run[0])]
+    if not runs:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    if len(runs) == 1:
+        return runs[0]
+    keys = np.concatenate([keys for keys, _ in runs])
+    counts = np.concatenate([counts for _, counts in runs])
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    counts = counts[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[starts], np.add.reduceat(counts, starts)
+
+def count_range(settings):
+    """Counts the n-grams that start in a range of positions of a token id file.
+
+    Args:
+        settings: a tuple of the file path, the start and end positions, the highest order
+            and the number of bits of 1 id.
+
+    Returns:
+        A list with the sorted (keys, counts) of every order, from unigrams up.
+    """
+    file_path, start, end, max_order, bits = settings
+    token_ids = load_token_ids(file_path)
+    # The n-grams starting at the end of the range continue into the next range.
+    chunk = np.array(token_ids[start:min(end + max_order - 1, len(token_ids))])
+    counts = []
+    for order in range(1, max_order + 1):
+        keys = pack_ngrams(chunk[:end - start + order - 1], order, bits)
+        keys, order_counts = np.unique(keys, return_counts=True)
+        counts.append((keys, order_counts.astype(np.int64)))
+    return counts
+
+def count_ngrams(file_path, max_order, bits, workers=1, chunk_size=1 << 24,
+                 merge_size=1 << 26):
+    """Counts the n-grams of all orders up to max_order of a token id file.
+
+    Args:
+        file_path: a path to the token id file.
+        max_order: the highest order counted.
+        bits: the number of bits of 1 id.
+        workers: number of processes counting the chunks.
+        chunk_size: number of positions counted in 1 chunk.
+        merge_size: number of chunk entries collected before they are merged into the counts.
+
+    Returns:
+        A list with the sorted (keys, counts) of every order, from unigrams up.
+    """
+    check_packing(max_order, bits)
+    num_tokens = len(load_token_ids(file_path))
+    ranges = [(file_path, start, min(start + chunk_size, num_tokens), max_order, bits)
+              for start in range(0, num_tokens, chunk_size)]
+    counts = [merge_counts([]) for _ in range(max_order)]
+    pending = []
+
+    def merge_pending():
+        for order in range(max_order):
+            counts[order] = merge_counts([counts[order]] + [run[order] for run in pending])
+        del pending[:]
+
+    def add(chunk_counts):
+        pending.append(chunk_counts)
+        if sum([len(keys) for run in pending for keys, _ in run]) >= merge_size:
+            merge_pending()
+
+    if workers > 1:
+        with Pool(workers) as pool:
+            for chunk_counts in pool.imap_unordered(count_range, ranges):
+                add(chunk_counts)
+    else:
+        for settings in ranges:
+            add(count_range(settings))
+    merge_pending()
+    return counts
+
+def save_ngram_counts(counts, bits, file_path):
+    """Saves the counts of all orders into 1 npz file.
+
+    Args:
+        counts: a list with the sorted (keys, counts) of every order, from unigrams up.
+        bits: the number of bits of 1 id.
+        file_path: a path to the file.
+    """
+    arrays = {"bits": np.array(bits)}
+    for order, (keys, order_counts) in enumerate(counts, 1):
+        arrays["keys_{}".format(order)] = keys
+        arrays["counts_{}".format(order)] = order_counts
+    tmp_file_path = "{}.tmp".format(file_path)
+    with open(tmp_file_path, "wb") as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_file_path, file_path)
+
+def load_ngram_counts(file_path):
+    """Loads counts saved by save_ngram_counts.
+
+    Args:
+        file_path: a path to the file.
+
+    Returns:
+        A tuple of the list with the (keys, counts) of every order and the bits of 1 id.
+    """
+    with np.load(file_path) as arrays:
+        max_order = len([name for name in arrays.files if name.startswith("keys_")])
+        counts = [(arrays["keys_{}".format(order)], arrays["counts_{}".format(order)])
+                  for order in range(1, max_order + 1)]
+        return counts, int(arrays["bits"])
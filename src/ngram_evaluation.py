@@ -0,0 +1,87 @@
+"""Perplexity of n-gram models on token id files.
+
+The file is scored in ranges of positions, in worker processes if requested. Every worker
+memory maps the model and the file, so only the ranges are sent between the processes.
+"""
+from ngram_model import load_ngram_model
+from token_ids import load_token_ids
+
+from multiprocessing import Pool
+
+import time
+
+
+worker_settings = None
+
+def init_worker(settings):
+    """Initializer of the worker processes, loads the model and the token ids.
+
+    Args:
+        settings: a dictionary with the model folder, the token id file and the id of the
+            unknown token.
+    """
+    global worker_settings
+    worker_settings = dict(settings)
+    worker_settings["model"] = load_ngram_model(settings["model_dir"])
+    worker_settings["token_ids"] = load_token_ids(settings["file_path"])
+
+def score_range(position_range):
+    """Scores the tokens at a range of positions of the token id file of the worker.
+
+    Args:
+        position_range: (start, end) positions of the scored tokens.
+
+    Returns:
+        A tuple of the sum of the log10 probabilities, the number of scored tokens and the
+        number of out of vocabulary tokens.
+    """
+    start, end = position_range
+    model = worker_settings["model"]
+    # The tokens before the range are the context of its first tokens.
+    context_start = max(start - model.order + 1, 0)
+    log_probs, oov = model.score(worker_settings["token_ids"][context_start:end],
+                                 start - context_start, worker_settings["unknown_id"])
+    num_oov = int(oov.sum())
+    return float(log_probs.sum()), len(log_probs) - num_oov, num_oov
+
+def evaluate_perplexity(file_path, model_dir, unknown_id=None, workers=1,
+                        chunk_size=1 << 22):
+    """Computes the perplexity of a model on a token id file.
+
+    The out of vocabulary tokens are not included in the perplexity, the same way as in SRILM.
+
+    Args:
+        file_path: a path to the token id file.
+        model_dir: a path to the folder of the model.
+        unknown_id: the id of the unknown token, None if it is a normal token.
+        workers: number of processes scoring the ranges.
+        chunk_size: number of tokens scored at once.
+
+    Returns:
+        A dictionary with the number of tokens, the number of out of vocabulary tokens, their
+        rate, the sum of the log10 probabilities, the perplexity, and the tokens per second.
+    """
+    start_time = time.perf_counter()
+    settings = {"model_dir": model_dir, "file_path": file_path, "unknown_id": unknown_id}
+    num_tokens = len(load_token_ids(file_path))
+    ranges = [(start, min(start + chunk_size, num_tokens))
+              for start in range(0, num_tokens, chunk_size)]
+    if workers > 1 and len(ranges) > 1:
+        with Pool(min(workers, len(ranges)), init_worker, (settings,)) as pool:
+            results = pool.map(score_range, ranges)
+    else:
+        init_worker(settings)
+        results = [score_range(position_range) for position_range in ranges]
+
+    log_prob = sum([result[0] for result in results])
+    num_scored = sum([result[1] for result in results])
+    num_oov = sum([result[2] for result in results])
+    elapsed = time.perf_counter() - start_time
+    return {
+        "num_tokens": num_tokens,
+        "num_oov": num_oov,
+        "oov_rate": num_oov / num_tokens if num_tokens else 0.0,
+        "log_prob": log_prob,
+        "perplexity": 10 ** (-log_prob / num_scored) if num_scored else float("inf"),
+        "tokens_per_second": num_tokens / elapsed if elapsed > 0 else 0.0,
+    }
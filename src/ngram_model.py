@@ -0,0 +1,403 @@
+"""N-gram language models with modified Kneser-Ney smoothing, stored in sorted arrays.
+
+Every order of a model is 3 numpy arrays of the same length: the sorted packed keys of the
+n-grams (see ngram_counting), the log10 probabilities and the log10 backoff weights, the
+same numbers an ARPA file holds. Looking up n-grams is a binary search in the keys.
+
+A model is saved as a folder of .npy files that are memory mapped when the model is loaded.
+"""
+from ngram_counting import check_packing, get_bits_per_id, unpack_keys
+
+from contextlib import closing
+from os.path import join
+
+import csv
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def get_suffix_mask(order, bits):
+    """Helper function that returns the mask of the last order - 1 ids of packed keys.
+    """
+    return np.uint64((1 << (bits * (order - 1))) - 1)
+
+def get_discounts(counts):
+    """Helper function that estimates the 3 discounts of modified Kneser-Ney from counts.
+
+    Args:
+        counts: numpy array with the counts of 1 order.
+
+    Returns:
+        A numpy array with the discounts of counts 0, 1, 2 and 3 or more.
+    """
+    n1, n2, n3, n4 = [np.count_nonzero(counts == i) for i in range(1, 5)]
+    y = n1 / (n1 + 2 * n2) if n1 > 0 and n2 > 0 else 0.5
+    if min(n1, n2, n3, n4) > 0:
+        discounts = [1 - 2 * y * n2 / n1, 2 - 3 * y * n3 / n2, 3 - 4 * y * n4 / n3]
+    else:
+        # Too few n-grams for the estimate, e.g. in tiny corpora.
+        discounts = [y, y, y]
+    return np.array([0.0] + [min(max(d, 0.0), i) for i, d in enumerate(discounts, 1)])
+
+def get_continuation_counts(keys, counts, higher_keys, order, bits):
+    """Replaces the counts of n-grams with the number of different words preceding them.
+
+    Args:
+        keys: sorted keys of the n-grams.
+        counts: their counts in the corpus.
+        higher_keys: sorted keys of the n-grams 1 order higher.
+        order: the order of the n-grams.
+        bits: the number of bits of 1 id.
+
+    Returns:
+        A numpy array with the continuation counts. N-grams that are never preceded by a
+        word, like the first n-gram of the corpus, keep their counts.
+    """
+    suffixes, num_preceding = np.unique(higher_keys & get_suffix_mask(order + 1, bits),
+                                        return_counts=True)
+    continuation_counts = np.array(counts, dtype=np.int64)
+    continuation_counts[np.searchsorted(keys, suffixes)] = num_preceding
+    return continuation_counts
+
+def find_keys(keys, queries):
+    """Helper function that finds keys in a sorted key array.
+
+    Args:
+        keys: sorted numpy array of keys.
+        queries: numpy array of the keys looked up.
+
+    Returns:
+        A tuple of the positions of the queries in the keys and a mask of the queries found.
+    """
+    if len(keys) == 0:
+        return np.zeros(len(queries), dtype=np.int64), np.zeros(len(queries), dtype=bool)
+    positions = np.searchsorted(keys, queries)
+    positions[positions == len(keys)] = 0
+    return positions, keys[positions] == queries
+
+class NgramModel:
+    """Backoff n-gram model with the n-grams of every order in sorted arrays.
+    """
+
+    def __init__(self, bits, vocabulary_size, keys, log_probs, backoffs):
+        """Initialization for the n-gram model.
+
+        Args:
+            bits: the number of bits of 1 id in the keys.
+            vocabulary_size: the number of different token ids.
+            keys: a list with the sorted keys of every order, from unigrams up.
+            log_probs: a list with the log10 probabilities of the n-grams of every order.
+            backoffs: a list with the log10 backoff weights of the n-grams of every order.
+        """
+        self.bits = bits
+        self.vocabulary_size = vocabulary_size
+        self.keys = keys
+        self.log_probs = log_probs
+        self.backoffs = backoffs
+
+    @property
+    def order(self):
+        """The highest order of the model.
+        """
+        return len(self.keys)
+
+    def score(self, token_ids, num_context=0, unknown_id=None, context_starts=None):
+        """Computes the log10 probabilities of tokens given the tokens preceding them.
+
+        All positions are scored at once, 1 order at a time from the highest: the n-grams
+        found in an order get their probabilities, the others add the backoff weights of their
+        contexts and are looked up 1 order lower.
+
+        Args:
+            token_ids: numpy array of token ids.
+            num_context: number of tokens at the start that are only used as context.
+            unknown_id: the id of the unknown token, scored as out of vocabulary.
+            context_starts: numpy array with the first position the context of every scored
+                token may use, e.g. the start of its sentence. None to use all preceding tokens.
+
+        Returns:
+            A tuple of the numpy array with the log10 probability of every scored token and
+            the mask of the out of vocabulary tokens, whose probabilities are 0.
+        """
+        token_ids = np.asarray(token_ids).astype(np.uint64)
+        positions = np.arange(num_context, len(token_ids))
+        history = positions if context_starts is None else positions - context_starts
+        log_probs = np.zeros(len(positions))
+        backoffs = np.zeros(len(positions))
+        pending = np.ones(len(positions), dtype=bool)
+        bits = np.uint64(self.bits)
+        for order in range(self.order, 0, -1):
+            indices = np.flatnonzero(pending & (history >= order - 1))
+            if len(indices) == 0:
+                continue
+            ends = positions[indices]
+            keys = np.zeros(len(indices), dtype=np.uint64)
+            for i in range(order - 1, -1, -1):
+                keys = (keys << bits) | token_ids[ends - i]
+            ngram_positions, found = find_keys(self.keys[order - 1], keys)
+            log_probs[indices[found]] = (self.log_probs[order - 1][ngram_positions[found]]
+                                         + backoffs[indices[found]])
+            pending[indices[found]] = False
+            if order > 1:
+                context_positions, context_found = find_keys(self.keys[order - 2],
+                                                             keys[~found] >> bits)
+                backoffs[indices[~found][context_found]] += \
+                    self.backoffs[order - 2][context_positions[context_found]]
+
+        # Tokens missing even from the unigrams are out of vocabulary.
+        oov = pending
+        if unknown_id is not None:
+            oov |= token_ids[positions] == unknown_id
+        log_probs[oov] = 0
+        return log_probs, oov
+
+    def save(self, model_dir):
+        """Saves the arrays of the model into a folder.
+
+        Args:
+            model_dir: a path to the folder, created if it does not exist.
+        """
+        os.makedirs(model_dir, exist_ok=True)
+        for order in range(1, self.order + 1):
+            for name, arrays in [("keys", self.keys), ("log_probs", self.log_probs),
+                                 ("backoffs", self.backoffs)]:
+                file_path = join(model_dir, "{}_{}.npy".format(name, order))
+                with open("{}.tmp".format(file_path), "wb") as file:
+                    np.save(file, arrays[order - 1])
+                os.replace("{}.tmp".format(file_path), file_path)
+        with open(join(model_dir, "model.json"), "w") as file:
+            file.write(json.dumps({"order": self.order, "bits": self.bits,
+                                   "vocabulary_size": self.vocabulary_size}))
+
+def load_ngram_model(model_dir):
+    """Loads a model saved by NgramModel.save, memory mapping its arrays.
+
+    Args:
+        model_dir: a path to the folder of the model.
+
+    Returns:
+        The NgramModel.
+    """
+    with open(join(model_dir, "model.json")) as file:
+        settings = json.loads(file.read())
+    arrays = dict((name, [np.load(join(model_dir, "{}_{}.npy".format(name, order)),
+                                  mmap_mode="r")
+                          for order in range(1, settings["order"] + 1)])
+                  for name in ["keys", "log_probs", "backoffs"])
+    return NgramModel(settings["bits"], settings["vocabulary_size"], **arrays)
+
+def train_kneser_ney(counts, bits, vocabulary_size):
+    """Trains an interpolated modified Kneser-Ney model from n-gram counts.
+
+    The probabilities of the n-grams seen in the corpus are interpolated with the lower
+    orders, and the backoff weight of a context is the weight of the interpolation, so the
+    model can be used as a backoff model, the same way as SRILM -kndiscount -interpolate.
+
+    Args:
+        counts: a list with the sorted (keys, counts) of every order, from unigrams up.
+        bits: the number of bits of 1 id.
+        vocabulary_size: the number of different token ids, all of them get a unigram.
+
+    Returns:
+        The NgramModel.
+    """
+    max_order = len(counts)
+    check_packing(max_order, bits)
+    keys = [order_keys for order_keys, _ in counts]
+    # All ids get a unigram, the ones missing from the corpus have no count.
+    all_ids = np.arange(vocabulary_size, dtype=np.uint64)
+    unigram_counts = np.zeros(vocabulary_size, dtype=np.int64)
+    unigram_counts[keys[0].astype(np.int64)] = counts[0][1]
+    keys[0] = all_ids
+    model_counts = [unigram_counts] + [order_counts for _, order_counts in counts[1:]]
+    for order in range(1, max_order):
+        model_counts[order - 1] = get_continuation_counts(keys[order - 1],
+                                                          model_counts[order - 1],
+                                                          keys[order], order, bits)
+
+    probs = []
+    backoffs = [np.zeros(len(order_keys), dtype=np.float32) for order_keys in keys]
+    for order in range(1, max_order + 1):
+        order_keys = keys[order - 1]
+        order_counts = model_counts[order - 1]
+        discounts = get_discounts(order_counts)[np.minimum(order_counts, 3)]
+        if order == 1:
+            total = max(order_counts.sum(), 1)
+            weight = discounts.sum() / total
+            probs.append((order_counts - discounts) / total + weight / vocabulary_size)
+            continue
+
+        # The keys are sorted, so the n-grams of a context are next to each other.
+        contexts = order_keys >> np.uint64(bits)
+        starts = np.flatnonzero(np.concatenate([[True], contexts[1:] != contexts[:-1]]))
+        lengths = np.diff(np.append(starts, len(order_keys)))
+        totals = np.add.reduceat(order_counts, starts)
+        weights = np.add.reduceat(discounts, starts) / totals
+        lower_positions = np.searchsorted(keys[order - 2],
+                                          order_keys & get_suffix_mask(order, bits))
+        probs.append((order_counts - discounts) / np.repeat(totals, lengths)
+                     + np.repeat(weights, lengths) * probs[order - 2][lower_positions])
+        context_positions = np.searchsorted(keys[order - 2], contexts[starts])
+        backoffs[order - 2][context_positions] = np.log10(weights)
+
+    log_probs = [np.log10(order_probs).astype(np.float32) for order_probs in probs]
+    return NgramModel(bits, vocabulary_size, keys, log_probs, backoffs)
+
+def write_arpa(model, tokens, file_path, batch_size=100000):
+    """Writes a model to a file in the ARPA format.
+
+    Args:
+        model: the NgramModel.
+        tokens: a list with the token of every id.
+        file_path: a path to the ARPA file.
+        batch_size: number of n-grams formatted at once.
+    """
+    tokens = np.array(tokens, dtype=object)
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("\n\\data\\\n")
+        for order in range(1, model.order + 1):
+            file.write("ngram {}={}\n".format(order, len(model.keys[order - 1])))
+        for order in range(1, model.order + 1):
+            file.write("\n\\{}-grams:\n".format(order))
+            keys = model.keys[order - 1]
+            for start in range(0, len(keys), batch_size):
+                end = start + batch_size
+                words = tokens[unpack_keys(keys[start:end], order, model.bits)]
+                log_probs = model.log_probs[order - 1][start:end].tolist()
+                ngrams = [" ".join(ngram_words) for ngram_words in words.tolist()]
+                if order < model.order:
+                    lines = ["{:.7g}\t{}\t{:.7g}\n".format(log_prob, ngram, backoff)
+                             for log_prob, ngram, backoff in zip(
+                                 log_probs, ngrams, model.backoffs[order - 1][start:end].tolist())]
+                else:
+                    lines = ["{:.7g}\t{}\n".format(log_prob, ngram)
+                             for log_prob, ngram in zip(log_probs, ngrams)]
+                file.write("".join(lines))
+        file.write("\n\\end\\\n")
+
+def find_arpa_sections(file_path, buffer_size=1 << 24):
+    """Helper function that finds the numbers of n-grams and the sections of an ARPA file.
+
+    Args:
+        file_path: a path to the ARPA file.
+        buffer_size: number of bytes read at once.
+
+    Returns:
+        A tuple of the list with the number of n-grams of every order and the list with the
+        byte offset of the first n-gram line of every order.
+    """
+    num_ngrams = {}
+    offsets = {}
+    count_pattern = re.compile(rb"\nngram\s+(\d+)\s*=\s*(\d+)")
+    section_pattern = re.compile(rb"\n\\(\d+)-grams:[ \t\r]*\n")
+    with open(file_path, "rb") as file:
+        data = b""
+        while True:
+            new_data = file.read(buffer_size)
+            if not new_data:
+                break
+            # The end of the previous buffer is searched again, in case a line was cut.
+            data = data[-64:] + new_data
+            start = file.tell() - len(data)
+            if not offsets:
+                for match in count_pattern.finditer(data):
+                    num_ngrams[int(match.group(1))] = int(match.group(2))
+            for match in section_pattern.finditer(data):
+                offsets[int(match.group(1))] = start + match.end()
+    orders = range(1, max(num_ngrams) + 1) if num_ngrams else []
+    if any([order not in offsets for order in orders]):
+        raise ValueError("{} is not a complete ARPA file.".format(file_path))
+    return [num_ngrams[order] for order in orders], [offsets[order] for order in orders]
+
+def read_arpa_section(file, offset, order, num_ngrams, chunk_size):
+    """Helper function that reads the n-grams of 1 order of an ARPA file.
+
+    Args:
+        file: the ARPA file opened in binary mode.
+        offset: byte offset of the first n-gram line.
+        order: the order of the n-grams.
+        num_ngrams: the number of n-grams.
+        chunk_size: number of lines parsed at once.
+
+    Yields:
+        pandas DataFrames with the log probability, the words and the backoff weight columns.
+    """
+    if num_ngrams == 0:
+        return
+    file.seek(offset)
+    columns = ["log_prob"] + ["word_{}".format(i) for i in range(order)] + ["backoff"]
+    yield from pd.read_csv(file, sep="\\s+", header=None, names=columns, nrows=num_ngrams,
+                           chunksize=chunk_size, quoting=csv.QUOTE_NONE, encoding="utf-8",
+                           dtype=dict([(column, str) for column in columns[1:-1]]),
+                           keep_default_na=False, na_values={"backoff": [""]})
+
+def read_arpa(file_path, dictionary=None, chunk_size=1 << 20):
+    """Reads a model from a file in the ARPA format.
+
+    The file is parsed in chunks of lines into numpy arrays, no Python object is created
+    per n-gram. Only the chunks of the unigrams are kept until the ids of the words are
+    known, the chunks of the higher orders are converted and dropped one by one.
+
+    Args:
+        file_path: a path to the ARPA file.
+        dictionary: token to number mapping giving the ids of the words. Words missing from
+            it get the next free ids. Without a dictionary the ids follow the unigrams.
+        chunk_size: number of lines parsed at once.
+
+    Returns:
+        A tuple of the NgramModel and the list with the token of every id, None for the ids
+        of the dictionary that are not in the model.
+    """
+    num_ngrams, offsets = find_arpa_sections(file_path)
+    dictionary = pd.Series(dictionary if dictionary is not None else {}, dtype=np.int64)
+    keys, log_probs, backoffs = [], [], []
+    with open(file_path, "rb") as file:
+        for order, (order_num_ngrams, offset) in enumerate(zip(num_ngrams, offsets), 1):
+            section = read_arpa_section(file, offset, order, order_num_ngrams, chunk_size)
+            with closing(section):
+                chunks = list(section) if order == 1 else section
+                if order == 1:
+                    words = pd.concat([chunk["word_0"] for chunk in chunks]) if chunks \
+                        else pd.Series([], dtype=str)
+                    ids = dictionary.reindex(words.values).values.astype(np.float64)
+                    new = np.isnan(ids)
+                    next_id = int(dictionary.max()) + 1 if len(dictionary) else 0
+                    ids[new] = np.arange(next_id, next_id + np.count_nonzero(new))
+                    ids = ids.astype(np.int64)
+                    vocabulary_size = int(max(ids.max() + 1 if len(ids) else 0, next_id))
+                    bits = get_bits_per_id(vocabulary_size)
+                    check_packing(len(num_ngrams), bits)
+                    tokens = [None] * vocabulary_size
+                    for token, id in dictionary.items():
+                        tokens[id] = token
+                    for token, id in zip(words.values[new].tolist(), ids[new].tolist()):
+                        tokens[id] = token
+                    word_index = pd.Index(tokens)
+                    del words
+
+                order_keys = np.zeros(order_num_ngrams, dtype=np.uint64)
+                order_log_probs = np.zeros(order_num_ngrams, dtype=np.float32)
+                order_backoffs = np.zeros(order_num_ngrams, dtype=np.float32)
+                position = 0
+                for chunk in chunks:
+                    end = position + len(chunk)
+                    chunk_keys = np.zeros(len(chunk), dtype=np.uint64)
+                    for i in range(order):
+                        chunk_ids = word_index.get_indexer(chunk["word_{}".format(i)].values)
+                        if np.any(chunk_ids < 0):
+                            raise ValueError("{}-grams of {} have words missing from the unigrams."
+                                             .format(order, file_path))
+                        chunk_keys = (chunk_keys << np.uint64(bits)) | chunk_ids.astype(np.uint64)
+                    order_keys[position:end] = chunk_keys
+                    order_log_probs[position:end] = chunk["log_prob"].values
+                    order_backoffs[position:end] = chunk["backoff"].fillna(0).values
+                    position = end
+                sorted_order = np.argsort(order_keys[:position], kind="stable")
+                keys.append(order_keys[sorted_order])
+                log_probs.append(order_log_probs[sorted_order])
+                backoffs.append(order_backoffs[sorted_order])
+    return NgramModel(bits, vocabulary_size, keys, log_probs, backoffs), tokens
@@ -0,0 +1,169 @@
+"""Scoring batches of sentences with trained n-gram models.
+
+The scorer loads a model saved by the srilm model stage, memory mapped, with the dictionary
+it was trained with. The sentences of a batch are encoded into 1 id array and scored by 1
+call of the model, with the context of every token limited to its own sentence.
+"""
+from ngram_model import load_ngram_model
+from stage_dictionary_creation import get_dictionary_file_name
+from stage_srilm_model import get_model_dir_name
+from vocabulary import Vocabulary
+
+import constants
+
+from os.path import join
+
+import json
+import mmap
+
+import numpy as np
+
+
+UNKNOWN_TOKEN = "<<unk>>"
+
+def get_model_paths(topic, ngram, frequency_threshold=None, vocabulary_format="json"):
+    """Helper function that returns the paths to the model and the dictionary of a topic.
+
+    Args:
+        topic: the topic of the pipeline.
+        ngram: the ngram size of the model.
+        frequency_threshold: the threshold the srilm model stage selected, if any.
+        vocabulary_format: json for a json dictionary, binary for a binary vocabulary.
+
+    Returns:
+        A tuple of the path to the model folder and the path to the dictionary file.
+    """
+    return (join(constants.DATA_PATH, get_model_dir_name(topic, ngram, frequency_threshold)),
+            join(constants.DATA_PATH, get_dictionary_file_name(topic, frequency_threshold,
+                                                               vocabulary_format)))
+
+class NgramScorer:
+    """Scores batches of tokenized sentences with an n-gram model.
+    """
+
+    def __init__(self, model_dir, dictionary_file_path, vocabulary_format="json",
+                 preload=False):
+        """Initialization for the scorer.
+
+        Args:
+            model_dir: a path to the folder of the model.
+            dictionary_file_path: a path to the dictionary of the token ids of the model.
+            vocabulary_format: json for a json dictionary, binary for a binary vocabulary.
+            preload: True to copy the arrays of the model into memory instead of memory
+                mapping them.
+        """
+        self.model = load_ngram_model(model_dir)
+        if preload:
+            for arrays in [self.model.keys, self.model.log_probs, self.model.backoffs]:
+                arrays[:] = [np.array(array) for array in arrays]
+        if vocabulary_format == "binary":
+            self.dictionary = Vocabulary(dictionary_file_path)
+        else:
+            with open(dictionary_file_path) as file:
+                self.dictionary = json.loads(file.read())
+        self.unknown_id = self.dictionary.get(UNKNOWN_TOKEN)
+
+    def warm(self):
+        """Reads 1 value of every page of the arrays of the model, so the pages are in memory
+        before the first query instead of being read from the disk during it.
+
+        Returns:
+            The number of bytes of the arrays.
+        """
+        num_bytes = 0
+        for arrays in [self.model.keys, self.model.log_probs, self.model.backoffs]:
+            for array in arrays:
+                step = max(mmap.PAGESIZE // array.itemsize, 1)
+                np.asarray(array[::step]).sum()
+                num_bytes += array.nbytes
+        return num_bytes
+
+    def lookup(self, tokens):
+        """Returns the ids of tokens, -1 for the tokens that are not in the dictionary.
+
+        Args:
+            tokens: a list of tokens.
+
+        Returns:
+            A numpy int64 array with the ids.
+        """
+        if isinstance(self.dictionary, Vocabulary):
+            return self.dictionary.lookup(tokens)
+        dictionary = self.dictionary
+        return np.array([dictionary.get(token, -1) for token in tokens], dtype=np.int64)
+
+    def encode(self, sentences):
+        """Encodes a batch of sentences into 1 id array.
+
+        Tokens missing from the dictionary get the id of <<unk>>. If the dictionary has no
+        unknown token, they are out of vocabulary and the context of the next token starts
+        after them.
+
+        Args:
+            sentences: a list of sentences, each a string of space separated tokens, as in the
+                cleaned corpus, or a list of tokens.
+
+        Returns:
+            A tuple of the numpy array of token ids, the first position of the context of
+            every token, the mask of the tokens missing from the dictionary and the offsets of
+            the sentences, the last one being the number of tokens.
+        """
+        sentences = [sentence.split() if isinstance(sentence, str) else list(sentence)
+                     for sentence in sentences]
+        lengths = np.array([len(sentence) for sentence in sentences], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        token_ids = self.lookup([token for sentence in sentences for token in sentence])
+        context_starts = np.repeat(offsets[:-1], lengths)
+        missing = token_ids < 0
+        if self.unknown_id is not None:
+            token_ids[missing] = self.unknown_id
+            missing[:] = False
+        elif missing.any():
+            token_ids[missing] = 0
+            breaks = np.zeros(len(token_ids), dtype=np.int64)
+            after_missing = np.flatnonzero(missing[:-1]) + 1
+            breaks[after_missing] = after_missing
+            context_starts = np.maximum(context_starts, np.maximum.accumulate(breaks))
+        return token_ids, context_starts, missing, offsets
+
+    def score(self, sentences, per_token=False):
+        """Scores a batch of sentences.
+
+        Out of vocabulary tokens are left out of the log probabilities and the perplexities,
+        as in the perplexity of the srilm model stage.
+
+        Args:
+            sentences: a list of sentences, each a string of space separated tokens or a list
+                of tokens.
+            per_token: True to include the log10 probability of every token.
+
+        Returns:
+            A list with a dictionary for every sentence, with its number of tokens, number of
+            out of vocabulary tokens, sum of log10 probabilities and perplexity.
+        """
+        token_ids, context_starts, missing, offsets = self.encode(sentences)
+        log_probs, oov = self.model.score(token_ids, unknown_id=self.unknown_id,
+                                          context_starts=context_starts)
+        oov |= missing
+        log_probs[oov] = 0
+        sentence_ids = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        sentence_log_probs = np.bincount(sentence_ids, log_probs, len(offsets) - 1)
+        sentence_oov = np.bincount(sentence_ids, oov, len(offsets) - 1).astype(np.int64)
+
+        results = []
+        for i, (log_prob, num_oov) in enumerate(zip(sentence_log_probs.tolist(),
+                                                     sentence_oov.tolist())):
+            num_tokens = int(offsets[i + 1] - offsets[i])
+            num_scored = num_tokens - num_oov
+            result = {
+                "num_tokens": num_tokens,
+                "num_oov": num_oov,
+                "log_prob": log_prob,
+                "perplexity": 10 ** (-log_prob / num_scored) if num_scored else None,
+            }
+            if per_token:
+                result["token_log_probs"] = [None if is_oov else value for value, is_oov in
+                                             zip(log_probs[offsets[i]:offsets[i + 1]].tolist(),
+                                                 oov[offsets[i]:offsets[i + 1]].tolist())]
+            results.append(result)
+        return results
@@ -0,0 +1,105 @@
+"""Memoizing cache for token normalization.
+"""
+from collections import OrderedDict
+
+import json
+import os
+
+
+class NormalizationCache:
+    """Bounded LRU cache mapping raw tokens to their normalized form.
+    """
+
+    def __init__(self, normalize, max_size=100000, track_added=False):
+        """Initialization for the normalization cache.
+
+        Args:
+            normalize: function that normalizes 1 raw token.
+            max_size: maximum number of tokens kept in the cache.
+            track_added: whether to remember the tokens normalized since the last pop_added.
+        """
+        self.normalize = normalize
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.added = [] if track_added else None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, token):
+        """Returns the normalized token, normalizing it only if it is not cached.
+
+        Args:
+            token: the raw token.
+
+        Returns:
+            The normalized token.
+        """
+        try:
+            result = self.entries[token]
+        except KeyError:
+            self.misses += 1
+            result = self.normalize(token)
+            self.entries[token] = result
+            if self.added is not None:
+                self.added.append((token, result))
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            return result
+        self.hits += 1
+        self.entries.move_to_end(token)
+        return result
+
+    def update(self, entries):
+        """Adds already normalized tokens to the cache.
+
+        Args:
+            entries: iterable of (raw token, normalized token) pairs.
+        """
+        for token, result in entries:
+            self.entries[token] = result
+            self.entries.move_to_end(token)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def pop_added(self):
+        """Returns the tokens normalized since the last call and forgets them.
+
+        Returns:
+            A list of (raw token, normalized token) pairs.
+        """
+        added = self.added
+        self.added = []
+        return added
+
+    def hit_rate(self):
+        """Returns the share of lookups that were served from the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def save(self, file_path):
+        """Saves the cache entries, least recently used first.
+
+        Args:
+            file_path: a path to the file.
+        """
+        with open(file_path, "w") as file:
+            file.write(json.dumps(list(self.entries.items())))
+
+    def load(self, file_path):
+        """Loads the cache entries saved by a previous run, if there are any.
+
+        Args:
+            file_path: a path to the file.
+
+        Returns:
+            True if the entries were loaded, False otherwise.
+        """
+        if not os.path.exists(file_path):
+            return False
+        with open(file_path) as file:
+            self.update(json.loads(file.read()))
+        return True
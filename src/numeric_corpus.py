@@ -0,0 +1,183 @@
+"""Numeric representation of a corpus shared by the stages after cleaning.
+
+A numeric corpus consists of 3 files in the tmp folder:
+
+    {topic}.{name}.ids.npy          uint32 ids of the tokens, text.split(" ") of the text
+    {topic}.{name}.articles.npy     uint64 offsets of the first token of every article,
+                                    followed by the number of tokens
+    {topic}.corpus.vocab            binary vocabulary of the ids, shared by all the corpora
+                                    of a topic
+
+The text is tokenized once, when the cleaned corpus is encoded. The splits of the corpus
+reuse its ids and vocabulary, so " ".join of the tokens of the ids gives back their text.
+"""
+from corpus_io import read_token_chunks
+from token_ids import TOKEN_ID_DTYPE, load_token_ids, save_token_ids
+from vocabulary import Vocabulary, save_vocabulary
+
+import constants
+
+from os.path import join, splitext
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+ARTICLE_START = "<<article_start>>"
+
+def get_numeric_corpus_name(corpus_file):
+    """Helper function that names the numeric corpus of a text corpus file.
+
+    Args:
+        corpus_file: name of the corpus file, e.g. train.txt.
+
+    Returns:
+        The name of the numeric corpus, e.g. train.
+    """
+    return splitext(corpus_file)[0]
+
+def get_vocabulary_file_path(topic):
+    """Helper function that returns the path of the vocabulary shared by the numeric corpora.
+    """
+    return join(constants.TMP_PATH, "{}.corpus.vocab".format(topic))
+
+def get_article_offsets(token_ids, article_start_id):
+    """Helper function that finds the articles of the token ids.
+
+    Args:
+        token_ids: numpy array of token ids.
+        article_start_id: the id of the <<article_start>> token, None if there is none.
+
+    Returns:
+        A numpy uint64 array with the offsets of the first token of every article, followed
+        by the number of tokens.
+    """
+    starts = np.flatnonzero(token_ids == article_start_id) if article_start_id is not None \
+        else np.zeros(0, dtype=np.int64)
+    if len(starts) == 0 or starts[0] != 0:
+        starts = np.concatenate([[0], starts])
+    return np.append(starts, len(token_ids)).astype(np.uint64)
+
+def encode_corpus(file_path, topic, name, chunk_size=1 << 24):
+    """Tokenizes a text corpus file once and saves it as a numeric corpus.
+
+    The file is read in chunks, so only the token ids and the vocabulary are kept in
+    memory. The ids are given to the tokens in the order they first appear.
+
+    Args:
+        file_path: a path to the text corpus file.
+        topic: the topic of the pipeline.
+        name: the name of the numeric corpus.
+        chunk_size: number of characters tokenized at once.
+
+    Returns:
+        The NumericCorpus.
+    """
+    dictionary = {}
+    token_ids = []
+    for chunk in read_token_chunks(file_path, chunk_size):
+        codes, uniques = pd.factorize(np.array(chunk.split(" "), dtype=object))
+        ids = np.empty(len(uniques), dtype=TOKEN_ID_DTYPE)
+        for i, token in enumerate(uniques):
+            ids[i] = dictionary.setdefault(token, len(dictionary))
+        token_ids.append(ids[codes])
+    token_ids = np.concatenate(token_ids) if token_ids else np.zeros(0, TOKEN_ID_DTYPE)
+
+    save_vocabulary(dictionary, get_vocabulary_file_path(topic))
+    corpus = NumericCorpus(topic, name)
+    corpus.save(token_ids, get_article_offsets(token_ids, dictionary.get(ARTICLE_START)))
+    return corpus
+
+class NumericCorpus:
+    """Token ids, article offsets and vocabulary of 1 corpus of a topic.
+    """
+
+    def __init__(self, topic, name):
+        """Initialization for the numeric corpus.
+
+        Args:
+            topic: the topic of the pipeline.
+            name: the name of the corpus, e.g. clean for the whole cleaned text or train.
+        """
+        self.topic = topic
+        self.name = name
+        self.ids_file_path = join(constants.TMP_PATH, "{}.{}.ids.npy".format(topic, name))
+        self.articles_file_path = join(constants.TMP_PATH,
+                                       "{}.{}.articles.npy".format(topic, name))
+        self.vocabulary_file_path = get_vocabulary_file_path(topic)
+        self.token_ids = None
+        self.article_offsets = None
+        self.vocabulary = None
+
+    def exists(self):
+        """Returns whether the files of the corpus exist.
+        """
+        return all([os.path.exists(file_path) for file_path in
+                    [self.ids_file_path, self.articles_file_path, self.vocabulary_file_path]])
+
+    def load(self):
+        """Memory maps the files of the corpus.
+
+        Returns:
+            The corpus itself.
+        """
+        self.token_ids = load_token_ids(self.ids_file_path)
+        self.article_offsets = np.load(self.articles_file_path)
+        self.vocabulary = Vocabulary(self.vocabulary_file_path)
+        return self
+
+    def save(self, token_ids, article_offsets):
+        """Saves the token ids and the article offsets of the corpus.
+
+        Args:
+            token_ids: numpy array of token ids of the shared vocabulary.
+            article_offsets: numpy array with the offsets of the articles.
+        """
+        save_token_ids(token_ids, self.ids_file_path)
+        tmp_file_path = "{}.tmp".format(self.articles_file_path)
+        with open(tmp_file_path, "wb") as file:
+            np.save(file, np.asarray(article_offsets, dtype=np.uint64))
+        os.replace(tmp_file_path, self.articles_file_path)
+        self.load()
+
+    def __reduce__(self):
+        return (NumericCorpus, (self.topic, self.name))
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    @property
+    def num_articles(self):
+        """The number of articles in the corpus.
+        """
+        return len(self.article_offsets) - 1
+
+    def article(self, index):
+        """Returns the token ids of 1 article.
+        """
+        return self.token_ids[int(self.article_offsets[index]):
+                              int(self.article_offsets[index + 1])]
+
+    def tokens(self):
+        """Returns the tokens of the corpus as strings.
+
+        Returns:
+            A list of tokens, the same as text.split(" ") of the text of the corpus.
+        """
+        vocabulary_tokens = np.array(self.vocabulary.tokens(), dtype=object)
+        return vocabulary_tokens[self.token_ids].tolist()
+
+    def counts(self):
+        """Counts the tokens of the corpus.
+
+        Returns:
+            A list of (token, count) pairs in the order the tokens first appear in the corpus.
+        """
+        ids, first_indices, counts = np.unique(self.token_ids, return_index=True,
+                                               return_counts=True)
+        order = np.argsort(first_indices, kind="stable")
+        vocabulary_tokens = self.vocabulary.tokens()
+        return [(vocabulary_tokens[id], int(count))
+                for id, count in zip(ids[order].tolist(), counts[order].tolist())]
@@ -0,0 +1,157 @@
+"""On-disk cache for scraped wiki pages.
+"""
+from os.path import exists, join
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class PageCache:
+    """Content-addressed cache of page texts, keyed on site and title.
+
+    The texts are stored in files named after the sha1 of the text and an sqlite index maps
+    (site, title) to the revision id and the text file. A cached page is only used while its
+    revision is still the latest one. When the texts take more than max_size bytes, the least
+    recently used pages are evicted.
+    """
+
+    def __init__(self, cache_dir, max_size=1 << 30):
+        """Initialization for the page cache.
+
+        Args:
+            cache_dir: directory for the index and the page texts.
+            max_size: maximum number of bytes taken by the page texts.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(join(cache_dir, "texts"), exist_ok=True)
+        self.connection = sqlite3.connect(join(cache_dir, "index.sqlite"),
+                                          check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS pages (site TEXT, title TEXT, "
+                                "revid INTEGER, digest TEXT, size INTEGER, last_used REAL, "
+                                "PRIMARY KEY (site, title))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest)")
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT DISTINCT digest, size FROM pages)").fetchone()[0]
+
+    def text_path(self, digest):
+        """Returns the path of the file with the text of the given digest.
+        """
+        return join(self.cache_dir, "texts", digest[:2], digest)
+
+    def get(self, site, title, revid):
+        """Returns the cached text of a page if it is still current.
+
+        Args:
+            site: the site of the page.
+            title: title of the page.
+            revid: id of the latest revision of the page.
+
+        Returns:
+            String with the text of the page, None if it is not cached or out of date.
+        """
+        # The text is read under the lock, so a put on another thread cannot evict it
+        # between the lookup and the read.
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT revid, digest FROM pages WHERE site = ? AND title = ?",
+                (site, title)).fetchone()
+            text = None
+            if row is not None and row[0] == revid:
+                try:
+                    with open(self.text_path(row[1]), "r", encoding="utf-8") as file:
+                        text = file.read()
+                except FileNotFoundError:
+                    pass
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE pages SET last_used = ? WHERE site = ? AND title = ?",
+                (time.time(), site, title))
+            return text
+
+    def put(self, site, title, revid, text):
+        """Stores the text of a page.
+
+        Args:
+            site: the site of the page.
+            title: title of the page.
+            revid: id of the revision the text belongs to.
+            text: text of the page.
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha1(data).hexdigest()
+        path = self.text_path(digest)
+        with self.lock:
+            if not exists(path):
+                os.makedirs(join(self.cache_dir, "texts", digest[:2]), exist_ok=True)
+                tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+            if not self.is_referenced(digest):
+                self.size += len(data)
+            old = self.connection.execute(
+                "SELECT digest, size FROM pages WHERE site = ? AND title = ?",
+                (site, title)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (site, title, revid, digest, len(data), time.time()))
+            if old is not None and old[0] != digest:
+                self.remove_text(*old)
+            self.evict()
+
+    def is_referenced(self, digest):
+        """Returns whether any page in the index uses the text of the given digest.
+        """
+        return self.connection.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1",
+                                       (digest,)).fetchone() is not None
+
+    def remove_text(self, digest, size):
+        """Removes the text of the given digest if no page in the index uses it anymore.
+        """
+        if self.is_referenced(digest):
+            return
+        self.size -= size
+        try:
+            os.remove(self.text_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Removes the least recently used pages until the texts fit into max_size bytes.
+        """
+        while self.size > self.max_size:
+            rows = self.connection.execute(
+                "SELECT site, title, digest, size FROM pages ORDER BY last_used LIMIT 100"
+                ).fetchall()
+            if not rows:
+                break
+            for site, title, digest, size in rows:
+                self.connection.execute("DELETE FROM pages WHERE site = ? AND title = ?",
+                                        (site, title))
+                self.remove_text(digest, size)
+                if self.size <= self.max_size:
+                    break
+
+    def close(self):
+        """Closes the index of the cache.
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,300 @@
+"""Page fetchers used by the scraping stages for getting the text of wiki pages.
+"""
+from urllib.parse import urlparse
+
+import abc
+import requests
+import threading
+import time
+
+
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+class RateLimiter:
+    """Spaces out the requests sent to 1 host.
+    """
+
+    def __init__(self, requests_per_second):
+        """Initialization for the rate limiter.
+
+        Args:
+            requests_per_second: maximum number of requests per second.
+        """
+        self.interval = 1.0 / requests_per_second
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the next request can be sent.
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+def get_rate_limiter(host, requests_per_second):
+    """Helper function that returns the rate limiter shared by all fetchers of a host.
+
+    Args:
+        host: the host name.
+        requests_per_second: maximum number of requests per second, None for no limit.
+
+    Returns:
+        RateLimiter for the host or None if there is no limit.
+    """
+    if not requests_per_second:
+        return None
+    with rate_limiters_lock:
+        if host not in rate_limiters:
+            rate_limiters[host] = RateLimiter(requests_per_second)
+        return rate_limiters[host]
+
+class PageFetcher(metaclass=abc.ABCMeta):
+    """Base class for fetching the text of wiki pages.
+    """
+
+    def __init__(self, host, requests_per_second=None):
+        """Initialization for the page fetcher.
+
+        Args:
+            host: the host the pages are fetched from.
+            requests_per_second: maximum number of requests per second sent to the host.
+        """
+        self.host = host
+        self.rate_limiter = get_rate_limiter(host, requests_per_second)
+
+    def fetch(self, title):
+        """The function that is called from the outside to fetch a page.
+
+        Args:
+            title: title of the page.
+
+        Returns:
+            String with the wikitext of the page, empty if the page does not exist.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+        return self.fetch_page(title)
+
+    def fetch_many(self, titles, min_length=0):
+        """Fetches a list of pages.
+
+        Args:
+            titles: a list of page titles.
+            min_length: pages shorter than this many bytes may be skipped without fetching.
+
+        Returns:
+            A list with the wikitext of the pages in the order of the titles, empty for the
+            pages that do not exist or were skipped.
+        """
+        return [self.fetch(title) for title in titles]
+
+    @abc.abstractmethod
+    def fetch_page(self, title):
+        """Fetches 1 page.
+
+        Args:
+            title: title of the page.
+
+        Returns:
+            String with the wikitext of the page, empty if the page does not exist.
+        """
+
+class APIPageFetcher(PageFetcher):
+    """Base class for fetchers that can send queries to the MediaWiki API of the wiki.
+
+    Many pages are fetched with 1 request, page lengths are checked before the texts of the
+    pages are downloaded, and pages whose latest revision is in the page cache are not
+    downloaded again.
+    """
+
+    def __init__(self, host, requests_per_second=None, batch_size=50, cache=None):
+        """Initialization for the API page fetcher.
+
+        Args:
+            host: the host the pages are fetched from.
+            requests_per_second: maximum number of requests per second sent to the host.
+            batch_size: maximum number of titles in 1 query, 50 for most API users.
+            cache: optional PageCache for the fetched pages.
+        """
+        super(APIPageFetcher, self).__init__(host, requests_per_second)
+        self.batch_size = batch_size
+        self.cache = cache
+
+    def query(self, params):
+        """Sends 1 query to the API, respecting the rate limit of the host.
+
+        Args:
+            params: a dictionary with the query parameters.
+
+        Returns:
+            A dictionary with the decoded response.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+        return self.send_query(dict(params, action="query", formatversion=2))
+
+    @abc.abstractmethod
+    def send_query(self, params):
+        """Sends 1 request to the API.
+
+        Args:
+            params: a dictionary with the request parameters.
+
+        Returns:
+            A dictionary with the decoded response.
+        """
+
+    def query_pages(self, titles, params):
+        """Runs a query for a batch of titles, following the continuations of the query.
+
+        Args:
+            titles: a list of page titles.
+            params: a dictionary with the query parameters.
+
+        Returns:
+            A dictionary from the requested titles to the page dictionaries of the response.
+            Continued responses are merged into the page dictionaries.
+        """
+        params = dict(params, titles="|".join(titles))
+        pages = {}
+        normalized = {}
+        while True:
+            result = self.query(params)
+            query = result.get("query", {})
+            for entry in query.get("normalized", []):
+                normalized[entry["to"]] = entry["from"]
+            for page in query.get("pages", []):
+                title = normalized.get(page["title"], page["title"])
+                if title in pages:
+                    revisions = pages[title].get("revisions", []) + page.get("revisions", [])
+                    pages[title].update(page)
+                    pages[title]["revisions"] = revisions
+                else:
+                    pages[title] = page
+            if "continue" not in result:
+                return pages
+            params.update(result["continue"])
+
+    def category_members(self, category):
+        """Lists the pages and subcategories of a category, as many per request as allowed.
+
+        Args:
+            category: title of the category, including the namespace prefix.
+
+        Returns:
+            A list of member dictionaries with the namespace ("ns") and the title.
+        """
+        params = {"list": "categorymembers", "cmtitle": category, "cmtype": "page|subcat",
+                  "cmlimit": "max", "cmprop": "title"}
+        members = []
+        while True:
+            result = self.query(params)
+            members.extend(result.get("query", {}).get("categorymembers", []))
+            if "continue" not in result:
+                return members
+            params.update(result["continue"])
+
+    def fetch(self, title):
+        """Fetches 1 page, the queries respect the rate limit themselves.
+        """
+        return self.fetch_page(title)
+
+    def fetch_page(self, title):
+        """Fetches 1 page with a revisions query.
+        """
+        return self.fetch_many([title])[0]
+
+    def fetch_many(self, titles, min_length=0):
+        """Fetches a list of pages, batch_size pages per request.
+
+        If min_length is set or there is a page cache, the lengths and the latest revisions
+        of the pages are queried first. The texts of shorter pages and of pages with a
+        current cached copy are not downloaded.
+        """
+        texts = {}
+        for i in range(0, len(titles), self.batch_size):
+            batch = list(dict.fromkeys(titles[i:i + self.batch_size]))
+            if min_length > 0 or self.cache is not None:
+                pages = self.query_pages(batch, {"prop": "info"})
+                batch = [title for title in batch
+                         if not pages.get(title, {}).get("missing")
+                         and pages.get(title, {}).get("length", 0) >= min_length]
+            if self.cache is not None:
+                not_cached = []
+                for title in batch:
+                    text = self.cache.get(self.host, title,
+                                          pages.get(title, {}).get("lastrevid"))
+                    if text is None:
+                        not_cached.append(title)
+                    else:
+                        texts[title] = text
+                batch = not_cached
+            if not batch:
+                continue
+            pages = self.query_pages(batch, {"prop": "revisions", "rvprop": "ids|content",
+                                             "rvslots": "main"})
+            for title, page in pages.items():
+                if page.get("revisions"):
+                    revision = page["revisions"][0]
+                    texts[title] = revision["slots"]["main"]["content"]
+                    if self.cache is not None:
+                        self.cache.put(self.host, title, revision["revid"], texts[title])
+        return [texts.get(title, "") for title in titles]
+
+class PywikibotPageFetcher(APIPageFetcher):
+    """Fetches pages with pywikibot.
+    """
+
+    def __init__(self, site, requests_per_second=None, batch_size=50, cache=None):
+        """Initialization for the pywikibot page fetcher.
+
+        Args:
+            site: pywikibot Site.
+            requests_per_second: maximum number of requests per second sent to the site.
+            batch_size: maximum number of titles in 1 query.
+            cache: optional PageCache for the fetched pages.
+        """
+        super(PywikibotPageFetcher, self).__init__(site.hostname(), requests_per_second,
+                                                   batch_size, cache)
+        self.site = site
+
+    def send_query(self, params):
+        """Sends 1 request to the API of the site with pywikibot.
+        """
+        return self.site.simple_request(**params).submit()
+
+class MediaWikiPageFetcher(APIPageFetcher):
+    """Fetches pages with plain HTTP requests to a MediaWiki api.php endpoint.
+
+    Works with any server that speaks the MediaWiki query API, e.g. a local stand-in used
+    for tests and benchmarks.
+    """
+
+    def __init__(self, api_url, requests_per_second=None, batch_size=50, cache=None,
+                 timeout=60):
+        """Initialization for the MediaWiki page fetcher.
+
+        Args:
+            api_url: url of the api.php endpoint.
+            requests_per_second: maximum number of requests per second sent to the host.
+            batch_size: maximum number of titles in 1 query.
+            cache: optional PageCache for the fetched pages.
+            timeout: timeout of 1 request in seconds.
+        """
+        super(MediaWikiPageFetcher, self).__init__(urlparse(api_url).netloc,
+                                                   requests_per_second, batch_size, cache)
+        self.api_url = api_url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send_query(self, params):
+        """Sends 1 HTTP request to the API.
+        """
+        response = self.session.get(self.api_url, params=dict(params, format="json"),
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
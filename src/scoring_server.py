@@ -0,0 +1,160 @@
+"""Local server scoring sentences with a trained n-gram model.
+
+The server loads the model once and keeps it in memory between the queries. It listens on a
+TCP port or on a Unix socket and answers:
+
+    GET /health   the order and the vocabulary size of the model.
+    POST /score   {"sentences": [...], "per_token": false} -> {"results": [...]}
+
+e.g. python3 src/scoring_server.py --topic countries --ngram 3 --port 8000
+"""
+from configuration import run_configuration
+from ngram_scoring import NgramScorer, get_model_paths
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger("pipeline").getChild("scoring_server")
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """Handler of the requests of the scoring server.
+    """
+    protocol_version = "HTTP/1.1"
+    # Buffering the response sends the headers and the body in 1 packet, so keep-alive
+    # requests do not wait for the delayed acknowledgement of the headers.
+    wbufsize = -1
+
+    def send_json(self, status, content):
+        """Sends a json response.
+
+        Args:
+            status: the http status code.
+            content: the object sent as json.
+        """
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"error": "Unknown path {}.".format(self.path)})
+            return
+        model = self.server.scorer.model
+        self.send_json(200, {"status": "ok", "order": model.order,
+                             "vocabulary_size": model.vocabulary_size})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self.send_json(404, {"error": "Unknown path {}.".format(self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            sentences = request["sentences"]
+            if not isinstance(sentences, list):
+                raise ValueError("sentences must be a list.")
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_json(400, {"error": "Invalid request: {}".format(error)})
+            return
+        try:
+            results = self.server.scorer.score(sentences, bool(request.get("per_token", False)))
+        except (TypeError, AttributeError) as error:
+            self.send_json(400, {"error": "Invalid sentences: {}".format(error)})
+            return
+        self.send_json(200, {"results": results})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+class UnixScoringServer(ThreadingMixIn, UnixStreamServer):
+    """Threaded http server listening on a Unix socket.
+    """
+    daemon_threads = True
+
+def create_server(scorer, host="127.0.0.1", port=8000, unix_socket=None):
+    """Creates a scoring server.
+
+    Args:
+        scorer: the NgramScorer answering the requests.
+        host: the address of the TCP server.
+        port: the port of the TCP server.
+        unix_socket: a path to a Unix socket to listen on instead of a TCP port.
+
+    Returns:
+        The server, not yet serving.
+    """
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixScoringServer(unix_socket, ScoringRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+    server.scorer = scorer
+    return server
+
+def keep_warm(scorer, interval):
+    """Reads the pages of the model again every interval seconds, so the operating system
+    does not evict them while the server is idle.
+
+    Args:
+        scorer: the NgramScorer of the server.
+        interval: the number of seconds between 2 reads.
+    """
+    while True:
+        time.sleep(interval)
+        scorer.warm()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serving an n-gram model of a topic.")
+    parser.add_argument("--topic", default="countries")
+    parser.add_argument("--ngram", type=int, default=2)
+    parser.add_argument("--frequency-threshold", type=int, default=None,
+                        help="threshold selected in the srilm model stage, if any")
+    parser.add_argument("--vocabulary-format", choices=["json", "binary"], default="json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", help="path to a Unix socket to listen on instead")
+    parser.add_argument("--preload", action="store_true",
+                        help="copy the model into memory instead of memory mapping it")
+    parser.add_argument("--warm-interval", type=float, default=0,
+                        help="seconds between reads of the model pages, 0 to read them once")
+    args = parser.parse_args()
+
+    run_configuration()
+    model_dir, dictionary_file_path = get_model_paths(args.topic, args.ngram,
+                                                      args.frequency_threshold,
+                                                      args.vocabulary_format)
+    scorer = NgramScorer(model_dir, dictionary_file_path, args.vocabulary_format, args.preload)
+    start = time.perf_counter()
+    num_bytes = scorer.warm()
+    logger.info("Loaded {} ({:.1f} MB) in {:.2f} s".format(model_dir, num_bytes / 2 ** 20,
+                                                           time.perf_counter() - start))
+    if args.warm_interval > 0:
+        threading.Thread(target=keep_warm, args=(scorer, args.warm_interval),
+                         daemon=True).start()
+
+    server = create_server(scorer, args.host, args.port, args.unix_socket)
+    logger.info("Serving on {}".format(args.unix_socket or
+                                       "http://{}:{}".format(args.host, args.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Checkpoints that let an interrupted scrape continue where it stopped.
+"""
+from os.path import exists, getsize
+
+import json
+import os
+
+
+def write_json_atomically(file_path, data):
+    """Helper function that replaces a json file without ever leaving it half-written.
+
+    Args:
+        file_path: a path to the file.
+        data: the data to save.
+    """
+    tmp_file_path = "{}.tmp".format(file_path)
+    with open(tmp_file_path, "w") as tmp_file:
+        tmp_file.write(json.dumps(data))
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_file_path, file_path)
+
+class ScrapingCheckpoint:
+    """Progress of a scraping stage, saved next to its output.
+
+    The list of articles is saved once, so a restarted run works on the same rows even if
+    the query returns them differently. After every batch the checkpoint records how many
+    rows are done and how many bytes of the output belong to them. Anything written after
+    the last checkpoint is cut off when the scrape is resumed.
+    """
+
+    def __init__(self, output_file_path, source):
+        """Initialization for the scraping checkpoint.
+
+        Args:
+            output_file_path: a path to the output file of the scrape.
+            source: description of where the articles come from, e.g. the query file. A
+                checkpoint of a scrape with another source is not resumed.
+        """
+        self.output_file_path = output_file_path
+        self.source = source
+        self.articles_file_path = "{}.articles.json".format(output_file_path)
+        self.checkpoint_file_path = "{}.checkpoint.json".format(output_file_path)
+
+    def start(self, titles):
+        """Saves the list of articles of a new scrape and removes the old checkpoint.
+
+        Args:
+            titles: a list of article titles.
+        """
+        self.clear()
+        write_json_atomically(self.articles_file_path, {"source": self.source,
+                                                        "titles": titles})
+
+    def restore(self):
+        """Loads the progress of an interrupted scrape.
+
+        Returns:
+            A tuple of the list of article titles and the number of rows that are done, or
+            (None, 0) if there is no scrape of the same source to resume.
+        """
+        if not exists(self.articles_file_path) or not exists(self.checkpoint_file_path):
+            return None, 0
+        with open(self.articles_file_path, "r") as articles_file:
+            articles = json.loads(articles_file.read())
+        with open(self.checkpoint_file_path, "r") as checkpoint_file:
+            checkpoint = json.loads(checkpoint_file.read())
+        if articles["source"] != self.source or not exists(self.output_file_path) \
+                or getsize(self.output_file_path) < checkpoint["output_size"]:
+            return None, 0
+        os.truncate(self.output_file_path, checkpoint["output_size"])
+        return articles["titles"], checkpoint["num_rows"]
+
+    def save(self, num_rows, output_file):
+        """Makes the output written so far durable and records the progress.
+
+        Args:
+            num_rows: the number of rows that are done.
+            output_file: the open output file.
+        """
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        write_json_atomically(self.checkpoint_file_path, {
+            "num_rows": num_rows,
+            "output_size": os.fstat(output_file.fileno()).st_size,
+        })
+
+    def clear(self):
+        """Removes the checkpoint and the list of articles.
+        """
+        for file_path in [self.checkpoint_file_path, self.articles_file_path]:
+            if exists(file_path):
+                os.remove(file_path)
@@ -2,16 +2,25 @@
 """
 from base_stage import BaseStage
 from configuration import run_configuration
+from numeric_corpus import NumericCorpus, get_numeric_corpus_name
+from stage_dictionary_creation import get_dictionary_file_name
+from token_ids import TOKEN_ID_DTYPE, get_token_ids_file_name, save_token_ids
+from vocabulary import Vocabulary
 
 import constants
 
+from multiprocessing import Pool
 from os.path import join
 from collections import Counter
 
 import json
 import logging
+import numpy as np
+import pandas as pd
 
 
+worker_dictionary = None
+
 def get_tokens_from_file(file_path):
     """Helper function for getting tokens from file.
 
@@ -26,44 +35,147 @@ def get_tokens_from_file(file_path):
         tokens = text.split(" ")
     return tokens
 
-def save_tokens_to_file(tokens, file_path):
-    """Helper function for saving tokens to file.
+def apply_dictionary(tokens, dictionary):
+    """Applies dictionary to tokens with 1 lookup per token.
+
+    The stage does not use it anymore. It is the per-token reference that
+    benchmarks/apply_dictionary_benchmark.py compares apply_dictionary_with_unknown with.
 
     Args:
         tokens: a list of tokens.
-        file_path: a path to the file.
+        dictionary: token to number mapping.
+
+    Returns:
+        A numpy array of the numbers generated.
     """
-    with open(file_path, "w") as file:
-        text = " ".join([str(t) for t in tokens])
-        file.write(text)
+    return np.fromiter((dictionary[t] for t in tokens), dtype=TOKEN_ID_DTYPE, count=len(tokens))
 
-def apply_dictionary(tokens, dictionary):
-    """Applies dictionary to tokens.
+def apply_dictionary_with_unknown(tokens, dictionary, unknown_token="<<unk>>"):
+    """Applies dictionary to tokens, mapping the tokens missing from it to the unknown token.
+
+    Every distinct token is looked up once, the ids of the token stream are then gathered
+    with 1 numpy indexing operation.
 
     Args:
         tokens: a list of tokens.
-        dictionary: token to number mapping.
+        dictionary: token to number mapping, a dictionary or a Vocabulary.
+        unknown_token: the token used for the tokens missing from the dictionary.
+
+    Returns:
+        A tuple of the numpy array of the numbers generated and the number of unknown tokens.
+    """
+    codes, uniques = pd.factorize(np.array(tokens, dtype=object))
+    unknown_id = dictionary[unknown_token]
+    if isinstance(dictionary, Vocabulary):
+        ids = dictionary.lookup(uniques)
+    else:
+        ids = np.array([dictionary.get(token, -1) for token in uniques], dtype=np.int64)
+    known = ids >= 0
+    ids = np.where(known, ids, unknown_id).astype(TOKEN_ID_DTYPE)
+    num_unknown = int(np.bincount(codes, minlength=len(uniques))[~known].sum())
+    return ids[codes], num_unknown
+
+def create_id_mapping(tokens, dictionary, unknown_token="<<unk>>"):
+    """Maps the ids of a numeric corpus vocabulary to the ids of a dictionary.
+
+    Args:
+        tokens: the tokens of the numeric corpus vocabulary, the token with id i at index i.
+        dictionary: token to number mapping, a dictionary or a Vocabulary.
+        unknown_token: the token used for the tokens missing from the dictionary.
+
+    Returns:
+        A numpy int64 array with the dictionary id of every corpus id, -1 for the tokens
+        missing from the dictionary.
+    """
+    tokens = [token if token is not None else unknown_token for token in tokens]
+    if isinstance(dictionary, Vocabulary):
+        return dictionary.lookup(tokens)
+    return np.array([dictionary.get(token, -1) for token in tokens], dtype=np.int64)
+
+def apply_id_mapping(token_ids, id_mapping, unknown_id):
+    """Applies a mapping created by create_id_mapping to the token ids of a numeric corpus.
+
+    Args:
+        token_ids: numpy array of corpus token ids.
+        id_mapping: numpy array with the dictionary id of every corpus id.
+        unknown_id: the dictionary id of the unknown token.
 
     Returns:
-        A list of numbers generated.
+        A tuple of the numpy array of the dictionary ids and the number of unknown tokens.
+    """
+    known = id_mapping >= 0
+    ids = np.where(known, id_mapping, unknown_id).astype(TOKEN_ID_DTYPE)
+    num_unknown = int(np.bincount(token_ids, minlength=len(id_mapping))[~known].sum())
+    return ids[token_ids], num_unknown
+
+def init_worker(dictionary):
+    """Initializer of the worker processes, stores the dictionary.
+
+    Args:
+        dictionary: token to number mapping, or a tuple of an id mapping and the id of the
+            unknown token for the numeric corpora.
     """
-    return [dictionary[t] for t in tokens]
+    global worker_dictionary
+    worker_dictionary = dictionary
+
+def apply_dictionary_to_file(file_paths):
+    """Applies the dictionary of the worker to 1 corpus file and saves the token ids.
+
+    Args:
+        file_paths: a tuple of the path to the corpus file and the path to the output file.
+
+    Returns:
+        A tuple of the number of tokens and the number of unknown tokens.
+    """
+    file_path, output_file_path = file_paths
+    tokens = get_tokens_from_file(file_path)
+    token_ids, num_unknown = apply_dictionary_with_unknown(tokens, worker_dictionary)
+    save_token_ids(token_ids, output_file_path)
+    return len(token_ids), num_unknown
+
+def apply_id_mapping_to_corpus(corpus_and_path):
+    """Applies the id mapping of the worker to 1 numeric corpus and saves the token ids.
+
+    Args:
+        corpus_and_path: a tuple of the NumericCorpus and the path to the output file.
+
+    Returns:
+        A tuple of the number of tokens and the number of unknown tokens.
+    """
+    corpus, output_file_path = corpus_and_path
+    id_mapping, unknown_id = worker_dictionary
+    token_ids, num_unknown = apply_id_mapping(corpus.load().token_ids, id_mapping, unknown_id)
+    save_token_ids(token_ids, output_file_path)
+    return len(token_ids), num_unknown
 
 class ApplyDictionaryStage(BaseStage):
-    """Stage for applying dictionary on a text file.
+    """Stage for applying dictionary on text files.
     """
     name = "apply_dictionary"
     logger = logging.getLogger("pipeline").getChild("apply_dictionary_stage")
 
-    def __init__(self, parent=None, corpus_file=None):
+    def __init__(self, parent=None, corpus_file=None, corpus_files=None, workers=1,
+                 frequency_threshold=None, vocabulary_format="json", numeric_corpus=False):
         """Initialization for apply dictionary stage.
 
         Args:
             parent: the parent stage.
             corpus_file: file to apply the dictionary on.
+            corpus_files: a list of files to apply the dictionary on, instead of corpus_file.
+            workers: number of files processed at the same time.
+            frequency_threshold: selects the dictionary of this threshold, if the dictionary
+                creation stage created several.
+            vocabulary_format: json to use a json dictionary, binary to memory map a binary
+                vocabulary file.
+            numeric_corpus: whether to map the ids of the numeric corpora of the files instead
+                of reading the text.
         """
         super(ApplyDictionaryStage, self).__init__(parent)
-        self.corpus_file = corpus_file
+        self.corpus_files = corpus_files if corpus_files is not None else [corpus_file]
+        self.workers = workers
+        self.frequency_threshold = frequency_threshold
+        self.vocabulary_format = vocabulary_format
+        self.numeric_corpus = numeric_corpus
 
     def pre_run(self):
         """The function that is executed before the stage is run.
@@ -73,37 +185,53 @@ class ApplyDictionaryStage(BaseStage):
         """
         self.logger.info("=" * 40)
         self.logger.info("Executing dictionary apply stage.")
-        self.logger.info("Target file: {}".format(self.corpus_file))
+        self.logger.info("Target files: {}".format(", ".join(self.corpus_files)))
         self.logger.info("-" * 40)
 
     def run(self):
-        """Run analysis on the corpus file.
+        """Run analysis on the corpus files.
 
         Returns:
             True if the stage execution succeded, False otherwise.
         """
-        self.logger.info("Starting applying dictionary...")
-        file_path = join(constants.TMP_PATH, "{}.{}".format(self.parent.topic, self.corpus_file))
-        tokens = get_tokens_from_file(file_path)
-
         self.logger.info("Loading dictionary...")
-        dictionary_file_path = join(constants.DATA_PATH,
-                                    "{}.dictionary.json".format(self.parent.topic))
-        with open(dictionary_file_path) as file:
-            dictionary = json.loads(file.read())
-
-        self.logger.info("Changing unknown tokens to <<unk>>...")
-        count = 0
-        for i, token in enumerate(tokens):
-            if not token in dictionary:
-                tokens[i] = "<<unk>>"
-                count += 1
-        self.logger.info("Changed {} tokens".format(count))
-
-        self.logger.info("Applying dictionary...")
-        tokens = [dictionary[t] for t in tokens]
-
-        self.logger.info("Saving the result...")
-        output_file_path = join(constants.DATA_PATH,
-                                "{}.{}".format(self.parent.topic, self.corpus_file))
+        dictionary_file_path = join(constants.DATA_PATH, get_dictionary_file_name(
+            self.parent.topic, self.frequency_threshold, self.vocabulary_format))
+        if self.vocabulary_format == "binary":
+            dictionary = Vocabulary(dictionary_file_path)
+        else:
+            with open(dictionary_file_path) as file:
+                dictionary = json.loads(file.read())
+
+        self.logger.info("Applying dictionary, changing unknown tokens to <<unk>>...")
+        output_file_paths = [join(constants.DATA_PATH, "{}.{}".format(
+            self.parent.topic, get_token_ids_file_name(corpus_file, self.frequency_threshold)))
+                             for corpus_file in self.corpus_files]
+        if self.numeric_corpus:
+            # The corpora share 1 vocabulary, every token of it is looked up once.
+            corpora = [NumericCorpus(self.parent.topic, get_numeric_corpus_name(corpus_file))
+                       for corpus_file in self.corpus_files]
+            vocabulary = corpora[0].load().vocabulary
+            dictionary = (create_id_mapping(vocabulary.tokens(), dictionary),
+                          dictionary["<<unk>>"])
+            function = apply_id_mapping_to_corpus
+            arguments = list(zip(corpora, output_file_paths))
+        else:
+            function = apply_dictionary_to_file
+            arguments = [(join(constants.TMP_PATH, "{}.{}".format(self.parent.topic,
+                                                                   corpus_file)),
+                          output_file_path)
+                         for corpus_file, output_file_path in zip(self.corpus_files,
+                                                                   output_file_paths)]
+        workers = min(self.workers, len(arguments))
+        if workers > 1:
+            with Pool(workers, init_worker, (dictionary,)) as pool:
+                counts = pool.map(function, arguments)
+        else:
+            init_worker(dictionary)
+            counts = [function(argument) for argument in arguments]
+
+        for corpus_file, (num_tokens, num_unknown) in zip(self.corpus_files, counts):
+            self.logger.info("{}: {} tokens, changed {} tokens".format(corpus_file, num_tokens,
+                                                                      num_unknown))
         return True
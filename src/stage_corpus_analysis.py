@@ -2,6 +2,8 @@
 """
 from base_stage import BaseStage
 from configuration import run_configuration
+from numeric_corpus import NumericCorpus, get_numeric_corpus_name
+from token_frequencies import TokenFrequencies, encode_tokens, write_token_rows
 
 import constants
 
@@ -11,20 +13,14 @@ import logging
 
 import pandas as pd
 import numpy as np
-import string
-from nltk.corpus import stopwords
-import sidetable
-import nltk
 from nltk.corpus import stopwords
 from scipy import stats
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from collections import deque
 from statistics import mean
 from statistics import pstdev
-from copy import copy
 
 class CorpusAnalysisStage(BaseStage):
     """Stage for analyzing corpus.
@@ -32,15 +28,18 @@ class CorpusAnalysisStage(BaseStage):
     name = "corpus_analysis"
     logger = logging.getLogger("pipeline").getChild("corpus_analysis_stage")
 
-    def __init__(self, parent=None, corpus_file=None):
+    def __init__(self, parent=None, corpus_file=None, numeric_corpus=False):
         """Initialization for corpus analysis stage.
 
         Args:
             parent: The parent stage.
             corpus_file: corpus file to analyze.
+            numeric_corpus: whether to read the tokens from the numeric corpus of the corpus
+                file instead of the text.
         """
         super(CorpusAnalysisStage, self).__init__(parent)
         self.corpus_file = corpus_file
+        self.numeric_corpus = numeric_corpus
         self.corpus_stopwords = ['wa']
 
     def pre_run(self):
@@ -51,138 +50,119 @@ class CorpusAnalysisStage(BaseStage):
         self.logger.info("Target file: {}".format(self.corpus_file))
         self.logger.info("-" * 40)
 
-    def run(self):
-        """Run analysis on the corpus file.
+    def encode_tokens(self, corpus_file_path):
+        """Reads the tokens of the corpus file as codes of the distinct tokens.
+
+        Args:
+            corpus_file_path: a path to the corpus file.
 
         Returns:
-            True if the stage execution succeded, False otherwise.
+            A tuple of the list of the distinct tokens and the numpy array with the code of
+            every token.
         """
-        self.logger.info("Starting analysis...")
-        corpus_file_path = join(constants.TMP_PATH,
-                                "{}.{}".format(self.parent.topic, self.corpus_file))
-
-        output_file_path = join(constants.OUTPUT_PATH,
-                                "{}.{}".format(self.parent.topic, self.corpus_file))
+        if self.numeric_corpus:
+            corpus = NumericCorpus(self.parent.topic,
+                                   get_numeric_corpus_name(self.corpus_file)).load()
+            return corpus.vocabulary.tokens(), corpus.token_ids
+        return encode_tokens(corpus_file_path)
 
-        with open(corpus_file_path, "r") as file:
-            text = file.read()
+    def analyze_counts(self, corpus_file_path, output_prefix, stop_words):
+        """Writes the summary files from the counts of the distinct tokens.
 
-        tokens = text.split(" ")
-
-        self.logger.info("Corpus contains {} tokens".format(len(tokens)))
-        self.logger.info("Corpus contains {} unique tokens".format(len(set(tokens))))
-
-        df = pd.DataFrame(tokens, columns=['text_orig'])
-        
-        def remove_unicode(x):
-            x = x.encode("ascii", "ignore")
-            x = x.decode()
-            return x
+        Args:
+            corpus_file_path: a path to the corpus file.
+            output_prefix: the prefix of the paths to the summary files.
+            stop_words: a list of stop words.
 
-        df['text_strp_unicode'] = df['text_orig'].apply(lambda x: remove_unicode(x))
+        Returns:
+            A tuple of the statistics, the DataFrame with the counts of the words that are not
+            stop words and the list of the lengths of the articles.
+        """
+        tokens, codes = self.encode_tokens(corpus_file_path)
+        frequencies = TokenFrequencies(tokens, codes, stop_words)
+        codes = frequencies.codes
+        self.logger.info("Corpus contains {} tokens".format(len(codes)))
+        self.logger.info("Corpus contains {} unique tokens".format(len(frequencies.tokens)))
         self.logger.info('Stripped Unicode Characters')
 
-        def text_strip(x):
-            markers = ['<<', '>>']
-            if any(i in x for i in markers):
-                return x
-            else:
-                return x.translate(str.maketrans('', '', string.punctuation))
-
-        df['text_strp_punct'] = df['text_strp_unicode'].apply(lambda x: text_strip(x))
-        df_corpus = df[['text_strp_punct']].copy()
-
         try:
             analysis_type = '1_cleaning_summary.csv'
-            filename = str(output_file_path[:-3] + analysis_type)
-            df.to_csv(filename, index=False)
-
+            filename = str(output_prefix + analysis_type)
+            write_token_rows(filename, ['text_orig', 'text_strp_unicode', 'text_strp_punct'],
+                             frequencies.cleaning_rows(), codes)
         except:
             self.logger.info("Created Summary File 1 but did not write to disk")
 
-        df['text_strp_punct'].replace('', np.nan, inplace=True)
-
-        df = df[['text_strp_punct']].dropna()
-
-        df = df[~df['text_strp_punct'].str.contains("<<")]
-
-        df['text_strp_punct'] = df['text_strp_punct'].astype('string')
-
-
         self.logger.info('Stripped Punctuation but not <<article_start>> or other tags')
 
-        df.rename(columns={'text_strp_punct': 'text'}, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-
-        summary_2 = df.stb.freq(['text'])
         try:
             analysis_type = '2_raw_text_summary.csv'
-            filename = str(output_file_path[:-3] + analysis_type)
-            summary_2.to_csv(filename, index=False)
+            filename = str(output_prefix + analysis_type)
+            frequencies.frequency_table().to_csv(filename, index=False)
         except:
             self.logger.info("Created Text Summary 2 File but did not write to disk")
 
-        stop_words = list(stopwords.words('english'))
-        stop_words.extend(self.corpus_stopwords)
-
-        df['stop_flag'] = df[['text']].isin(stop_words).any(1)
-
-        stops = df.copy()
-
-        stops = stops[stops['stop_flag'] == True].reset_index(drop=True)
-        stops.drop(columns='stop_flag', inplace=True)
-        summary_3 = stops.stb.freq(['text'])
-
         self.logger.info('Flagged and Removed Stop Words')
 
         try:
             analysis_type = '3_stop_text_summary.csv'
-            filename = str(output_file_path[:-3] + analysis_type)
-            summary_3.to_csv(filename, index=False)
+            filename = str(output_prefix + analysis_type)
+            frequencies.frequency_table(stop_flag=True).to_csv(filename, index=False)
         except:
             self.logger.info("Created Summary 3 File but did not write to disk")
 
-        summary_4 = df[df['stop_flag'] == False].reset_index(drop=True).drop(columns='stop_flag')
-        summary_4 = summary_4.stb.freq(['text'])
+        summary_4 = frequencies.frequency_table(stop_flag=False)
         try:
             analysis_type = '4_cleaned_text_summary.csv'
-            filename = str(output_file_path[:-3] + analysis_type)
+            filename = str(output_prefix + analysis_type)
             summary_4.to_csv(filename, index=False)
         except:
             self.logger.info("Created Summary 4 File but did not write to disk")
 
         try:
             analysis_type = '5_cleaned_text.csv'
-            filename = str(output_file_path[:-3] + analysis_type)
-            df.to_csv(filename, index=False)
+            filename = str(output_prefix + analysis_type)
+            write_token_rows(filename, ['text', 'stop_flag'], frequencies.cleaned_text_rows(),
+                             frequencies.text_ids)
 
             analysis_type = '5_cleaned_text.pickle'
-            filename = str(output_file_path[:-3] + analysis_type)
-            df.to_pickle(filename, protocol=2)
+            filename = str(output_prefix + analysis_type)
+            frequencies.cleaned_text().to_pickle(filename, protocol=2)
         except:
             self.logger.info("Created Summary Text Analysis File but did not write to disk")
 
-
         stats_dict = {}
-
-        unique_words = len(df['text'].unique())
-        stats_dict.update({"unique_words_bf_stop":unique_words})
-
-        df = df[df['stop_flag'] == False].reset_index(drop=True).drop(columns='stop_flag')
-        unique_words = len(df['text'].unique())
-        stats_dict.update({"unique_words_af_stop": unique_words})
-
-        frequency = df.stb.freq(['text'])
+        stats_dict.update({"unique_words_bf_stop": len(frequencies.texts)})
+        stats_dict.update({"unique_words_af_stop": int((~frequencies.stop_flags).sum())})
 
         try:
             analysis_type = '6_text_frequency_t10.csv'
-            filename = str(output_file_path[:-3] + analysis_type)
-            frequency[:10].to_csv(filename, index=False)
-
+            filename = str(output_prefix + analysis_type)
+            summary_4[:10].to_csv(filename, index=False)
         except:
             self.logger.info("Created Summary Text Analysis File but did not write to disk")
 
-        df = df.groupby(['text'])['text'].agg('count').reset_index(name='count')
+        return stats_dict, frequencies.word_counts(), frequencies.article_lengths()
+
+    def run(self):
+        """Run analysis on the corpus file.
+
+        Returns:
+            True if the stage execution succeded, False otherwise.
+        """
+        self.logger.info("Starting analysis...")
+        corpus_file_path = join(constants.TMP_PATH,
+                                "{}.{}".format(self.parent.topic, self.corpus_file))
+
+        output_file_path = join(constants.OUTPUT_PATH,
+                                "{}.{}".format(self.parent.topic, self.corpus_file))
+        output_prefix = output_file_path[:-3]
+
+        stop_words = list(stopwords.words('english'))
+        stop_words.extend(self.corpus_stopwords)
+
+        stats_dict, df, article_lengths = self.analyze_counts(corpus_file_path, output_prefix,
+                                                              stop_words)
 
         df['text_length'] = df['text'].str.len()
 
@@ -206,7 +186,7 @@ class CorpusAnalysisStage(BaseStage):
         plt.title('A Word Cloud of Subject Matter Universal Corpus')
 
         analysis_type = 'word_cloud.png'
-        filename = str(output_file_path[:-3] + analysis_type)
+        filename = str(output_prefix + analysis_type)
         plt.savefig(filename)
 
         plt.figure()
@@ -222,33 +202,10 @@ class CorpusAnalysisStage(BaseStage):
         plt.title('Frequency Distribution of Corpus\n Organized by Corpus Word Count and Word Text Length')
         plt.tight_layout()
         analysis_type = 'word_frequency.png'
-        filename = str(output_file_path[:-3] + analysis_type)
+        filename = str(output_prefix + analysis_type)
         plt.savefig(filename)
 
-        corpus_text = deque(df_corpus['text_strp_punct'].values)
-
-        corpus_dict = {}
-        counter = 0
-        accu = []
-
-        while corpus_text:
-            start_marker = ['<<article_start>>']
-            curr = corpus_text.popleft()
-
-            if any(m in curr for m in start_marker):
-                if accu:
-                    counter += 1
-                    corpus_dict.update({counter: (accu)})
-                accu = []
-                accu.append(curr)
-                curr = corpus_text.popleft()
-
-            if accu:
-                accu.append(curr)
-
-        stats_dict.update({"total_articles": len(corpus_dict)})
-
-        article_lengths = [len(value) for key, value in corpus_dict.items()]
+        stats_dict.update({"total_articles": len(article_lengths)})
 
         stats_dict.update({"article_max_len": max(article_lengths)})
         stats_dict.update({"article_min_len": min(article_lengths)})
@@ -0,0 +1,51 @@
+"""Stage for encoding the cleaned corpus as token ids.
+"""
+from base_stage import BaseStage
+from configuration import run_configuration
+from numeric_corpus import encode_corpus, get_numeric_corpus_name
+
+import constants
+
+from os.path import join
+
+import logging
+
+
+class CorpusEncodingStage(BaseStage):
+    """Stage for tokenizing the cleaned corpus once into a numeric corpus.
+
+    The later stages can work on the numeric corpus instead of splitting the text again.
+    """
+    name = "corpus_encoding"
+    logger = logging.getLogger("pipeline").getChild("corpus_encoding_stage")
+
+    def __init__(self, parent=None, chunk_size=16):
+        """Initialization for corpus encoding stage.
+
+        Args:
+            parent: The parent stage.
+            chunk_size: size of the chunks of the corpus tokenized at once, in megabytes.
+        """
+        super(CorpusEncodingStage, self).__init__(parent)
+        self.chunk_size = chunk_size
+
+    def pre_run(self):
+        """The function that is executed before the stage is run.
+        """
+        self.logger.info("=" * 40)
+        self.logger.info("Executing corpus encoding stage.")
+        self.logger.info("-" * 40)
+
+    def run(self):
+        """Encodes the cleaned corpus.
+
+        Returns:
+            True if the stage execution succeded, False otherwise.
+        """
+        self.logger.info("Encoding the cleaned corpus...")
+        input_file_path = join(constants.TMP_PATH, "{}.clean.txt".format(self.parent.topic))
+        corpus = encode_corpus(input_file_path, self.parent.topic,
+                               get_numeric_corpus_name("clean.txt"), self.chunk_size << 20)
+        self.logger.info("Corpus contains {} tokens, {} unique tokens and {} articles".format(
+            len(corpus), len(corpus.vocabulary), corpus.num_articles))
+        return True
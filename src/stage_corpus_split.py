@@ -2,32 +2,59 @@
 """
 from base_stage import BaseStage
 from configuration import run_configuration
+from corpus_io import ArticleReader
+from numeric_corpus import NumericCorpus, get_numeric_corpus_name
 
 import constants
 
 from os.path import join
 
+import bisect
+import hashlib
 import logging
 import math
+import numpy as np
 import random
-import re
 
 
+def hash_article(article, seed=0):
+    """Helper function that maps an article to a number in [0, 1) by hashing its content.
+
+    Args:
+        article: the utf-8 bytes of the article.
+        seed: the seed of the hash, other seeds give other splits.
+
+    Returns:
+        A float that is the same for the same article and seed in every run.
+    """
+    digest = hashlib.blake2b(article, digest_size=8, key=str(seed).encode("utf-8")).digest()
+    return int.from_bytes(digest, "little") / 2 ** 64
+
 class CorpusSplitStage(BaseStage):
     """Stage for splitting corpus.
     """
     name = "corpus_split"
     logger = logging.getLogger("pipeline").getChild("corpus_split_stage")
 
-    def __init__(self, parent=None, splits=None):
+    def __init__(self, parent=None, splits=None, numeric_corpus=False, mode="shuffle", seed=0):
         """Initializer for corpus split stage.
 
         Args:
             parent: the parent stage
             splits: configuration for the splitting.
+            numeric_corpus: whether to split the numeric corpus of the corpus encoding stage
+                into numeric corpora instead of splitting the text.
+            mode: shuffle to shuffle the articles and divide them exactly by the proportions,
+                hash to stream the articles and pick the split of every article from a hash of
+                its content. Hashed splits match the proportions on average, are the same in
+                every run, and articles keep their split when the corpus grows.
+            seed: the seed of the hash in hash mode.
         """
         super(CorpusSplitStage, self).__init__(parent)
         self.splits = splits
+        self.numeric_corpus = numeric_corpus
+        self.mode = mode
+        self.seed = seed
 
     def pre_run(self):
         """The function that is executed before the stage is run.
@@ -43,36 +70,130 @@ class CorpusSplitStage(BaseStage):
             True if the stage execution succeded, False otherwise.
         """
         self.logger.info("Starting corpus splitting...")
-        total_proportions = sum([s["proportion"] for s in self.splits])
+        if self.numeric_corpus:
+            return self.split_numeric_corpus()
+        if self.mode == "hash":
+            return self.split_by_hash()
+
         input_file_path = join(constants.TMP_PATH, "{}.clean.txt".format(self.parent.topic))
 
-        with open(input_file_path, "r") as file:
-            text = file.read()
+        with ArticleReader(input_file_path) as reader:
+            articles = reader.shuffle()
+            num_articles_for_split = self.get_num_articles_for_split(len(articles))
+
+            prev_index = 0
+            for i in range(len(self.splits)):
+                curr_index = prev_index + num_articles_for_split[i]
+                output_file_path = join(constants.TMP_PATH, "{}.{}.txt".format(
+                    self.parent.topic, self.splits[i]["name"]))
+                with open(output_file_path, "wb") as file:
+                    num_tokens = reader.write_articles(articles[prev_index:curr_index], file)
+                prev_index = curr_index
+
+                self.logger.info("Corpus {} contains ~ {} tokens".format(self.splits[i]["name"],
+                                                                         num_tokens))
+        return True
+
+    def get_num_articles_for_split(self, num_articles):
+        """Divides the articles between the splits by their proportions.
+
+        Args:
+            num_articles: the number of articles in the corpus.
 
-        text = re.sub("(\n)?<<article_start>>", "", text)
-        articles = text.split("<<article_end>>")
-        articles = ["<<article_start>>{}<<article_end>>".format(a) for a in articles]
-        random.shuffle(articles)
-        num_articles_for_split = [math.floor(len(articles) * (s["proportion"] / total_proportions))
+        Returns:
+            A list with the number of articles of every split.
+        """
+        total_proportions = sum([s["proportion"] for s in self.splits])
+        num_articles_for_split = [math.floor(num_articles * (s["proportion"] / total_proportions))
                                   for s in self.splits]
-        diff = len(articles) - sum(num_articles_for_split)
+        diff = num_articles - sum(num_articles_for_split)
         for i in range(len(self.splits)):
             num_articles_for_split[i] += diff // len(self.splits)
             if i < diff % len(self.splits):
                 num_articles_for_split[i] += 1
+        return num_articles_for_split
+
+    def get_split_bounds(self):
+        """Divides [0, 1) between the splits by their proportions.
+
+        Returns:
+            A list with the upper bound of the hashes of every split but the last.
+        """
+        total_proportions = sum([s["proportion"] for s in self.splits])
+        bounds = []
+        cumulative_proportion = 0
+        for split in self.splits[:-1]:
+            cumulative_proportion += split["proportion"]
+            bounds.append(cumulative_proportion / total_proportions)
+        return bounds
+
+    def split_by_hash(self):
+        """Streams the articles into the splits picked by their hashes.
+
+        Returns:
+            True if the splitting succeded, False otherwise.
+        """
+        input_file_path = join(constants.TMP_PATH, "{}.clean.txt".format(self.parent.topic))
+        bounds = self.get_split_bounds()
+        files = [open(join(constants.TMP_PATH, "{}.{}.txt".format(
+            self.parent.topic, split["name"])), "wb") for split in self.splits]
+        num_articles = [0] * len(self.splits)
+        num_tokens = [0] * len(self.splits)
+        try:
+            with ArticleReader(input_file_path) as reader:
+                for index in range(len(reader)):
+                    article = reader.article_bytes(index)
+                    i = bisect.bisect_right(bounds, hash_article(article, self.seed))
+                    if num_articles[i] > 0:
+                        files[i].write(b" ")
+                    files[i].write(article)
+                    num_articles[i] += 1
+                    num_tokens[i] += article.count(b" ") + 1
+        finally:
+            for file in files:
+                file.close()
+
+        for split, split_articles, split_tokens in zip(self.splits, num_articles, num_tokens):
+            self.logger.info("Corpus {} contains {} articles and ~ {} tokens".format(
+                split["name"], split_articles, split_tokens))
+        return True
+
+    def split_numeric_corpus(self):
+        """Splits the articles of the numeric corpus into numeric corpora.
+
+        Returns:
+            True if the splitting succeded, False otherwise.
+        """
+        corpus = NumericCorpus(self.parent.topic, get_numeric_corpus_name("clean.txt")).load()
+        if self.mode == "hash":
+            # The articles are hashed as text, so they get the same splits as in the text mode.
+            tokens = np.array(corpus.vocabulary.tokens(), dtype=object)
+            bounds = self.get_split_bounds()
+            split_indices = [[] for _ in self.splits]
+            for a in range(corpus.num_articles):
+                article = " ".join(tokens[corpus.article(a)]).encode("utf-8")
+                i = bisect.bisect_right(bounds, hash_article(article, self.seed))
+                split_indices[i].append(a)
+        else:
+            articles = list(range(corpus.num_articles))
+            random.shuffle(articles)
+            num_articles_for_split = self.get_num_articles_for_split(len(articles))
+            split_indices = []
+            prev_index = 0
+            for i in range(len(self.splits)):
+                curr_index = prev_index + num_articles_for_split[i]
+                split_indices.append(articles[prev_index:curr_index])
+                prev_index = curr_index
 
-        prev_index = 0
         for i in range(len(self.splits)):
-            curr_index = prev_index + num_articles_for_split[i]
-            text = " ".join(articles[prev_index:curr_index])
-            prev_index = curr_index
-
-            num_tokens = len(text.split(" "))
-            self.logger.info("Corpus {} contains ~ {} tokens".format(self.splits[i]["name"],
-                                                                     num_tokens))
-
-            output_file_path = join(constants.TMP_PATH,
-                                    "{}.{}.txt".format(self.parent.topic, self.splits[i]["name"]))
-            with open(output_file_path, "w") as file:
-                file.write(text)
+            split_articles = [corpus.article(a) for a in split_indices[i]]
+
+            lengths = [len(a) for a in split_articles]
+            token_ids = np.concatenate(split_articles) if split_articles \
+                else np.zeros(0, dtype=corpus.token_ids.dtype)
+            article_offsets = np.concatenate([[0], np.cumsum(lengths)])
+            self.logger.info("Corpus {} contains {} tokens".format(self.splits[i]["name"],
+                                                                   len(token_ids)))
+            NumericCorpus(self.parent.topic, self.splits[i]["name"]).save(token_ids,
+                                                                         article_offsets)
         return True
@@ -2,29 +2,94 @@
 """
 from base_stage import BaseStage
 from configuration import run_configuration
+from numeric_corpus import NumericCorpus, get_numeric_corpus_name
+from token_counting import count_tokens
+from vocabulary import order_by_frequency, save_vocabulary
 
 import constants
 
-from os.path import join
-from collections import Counter
+from os.path import exists, getmtime, join
 
 import json
 import logging
+import os
 
 
-def get_tokens_from_file(file_path):
-    """Helper function for getting tokens from file.
+def get_dictionary_file_name(topic, frequency_threshold=None, vocabulary_format="json"):
+    """Helper function that names the dictionary file.
 
     Args:
-        file_path: a path to the file.
+        topic: the topic of the pipeline.
+        frequency_threshold: the threshold of the dictionary, if the stage created several.
+        vocabulary_format: json for a json dictionary, binary for a binary vocabulary.
 
     Returns:
-        A list of tokens.
+        The name of the dictionary file in the data folder.
     """
-    with open(file_path) as file:
-        text = file.read()
-        tokens = text.split(" ")
-    return tokens
+    extension = "vocab" if vocabulary_format == "binary" else "json"
+    if frequency_threshold is None:
+        return "{}.dictionary.{}".format(topic, extension)
+    return "{}.dictionary.{}.{}".format(topic, frequency_threshold, extension)
+
+def counts_are_current(counts_file_path, file_path):
+    """Helper function that checks whether the saved token counts of a corpus can be used.
+
+    Args:
+        counts_file_path: a path to the counts file.
+        file_path: a path to the corpus file the counts belong to.
+
+    Returns:
+        True if the counts file exists and is newer than the corpus file.
+    """
+    return exists(counts_file_path) and getmtime(counts_file_path) >= getmtime(file_path)
+
+def read_counts(counts_file_path):
+    """Helper function that reads the saved token counts of a corpus.
+
+    Args:
+        counts_file_path: a path to the counts file.
+
+    Yields:
+        (token, count) pairs in the order the tokens first appear.
+    """
+    with open(counts_file_path) as file:
+        for line in file:
+            token, count = json.loads(line)
+            yield token, count
+
+def save_counts(counts, counts_file_path):
+    """Helper function that saves the token counts, 1 json pair per line.
+
+    Args:
+        counts: an iterable of (token, count) pairs in the order the tokens first appear.
+        counts_file_path: a path to the counts file.
+    """
+    tmp_file_path = "{}.tmp".format(counts_file_path)
+    with open(tmp_file_path, "w") as file:
+        for pair in counts:
+            file.write(json.dumps(pair))
+            file.write("\n")
+    os.replace(tmp_file_path, counts_file_path)
+
+def create_dictionaries(counts, frequency_thresholds):
+    """Creates 1 dictionary per threshold of the tokens that appear more times than it.
+
+    Args:
+        counts: an iterable of (token, count) pairs in the order the tokens first appear.
+        frequency_thresholds: a list of minimum numbers of times a token has to appear.
+
+    Returns:
+        A list of token to number mappings, the numbers follow the order the tokens first
+        appear.
+    """
+    dictionaries = [{} for _ in frequency_thresholds]
+    for token, count in counts:
+        for dictionary, frequency_threshold in zip(dictionaries, frequency_thresholds):
+            if count > frequency_threshold:
+                dictionary[token] = len(dictionary)
+    for dictionary in dictionaries:
+        dictionary["<<unk>>"] = len(dictionary)
+    return dictionaries
 
 class DictionaryCreationStage(BaseStage):
     """Stage for creating a dictionary.
@@ -32,17 +97,36 @@ class DictionaryCreationStage(BaseStage):
     name = "dictionary_creation"
     logger = logging.getLogger("pipeline").getChild("dictionary_creation_stage")
 
-    def __init__(self, parent=None, corpus_file=None, frequency_threshold=0):
+    def __init__(self, parent=None, corpus_file=None, frequency_threshold=0, workers=1,
+                 chunk_size=16, max_vocabulary_size=None, vocabulary_format="json",
+                 frequency_order=False, numeric_corpus=False):
         """Initialization for dictionary creation stage.
 
         Args:
             parent: The parent stage.
             corpus_file: corpus file to create dictionary from.
-            frequency_threshold: minimum number of times a token has to appear.
+            frequency_threshold: minimum number of times a token has to appear, or a list of
+                thresholds to create 1 dictionary per threshold.
+            workers: number of processes counting the tokens.
+            chunk_size: size of the chunks of the corpus counted at once, in megabytes.
+            max_vocabulary_size: maximum number of distinct tokens counted in memory, the
+                counts are spilled to disk above it.
+            vocabulary_format: json to save json dictionaries, binary to save memory mappable
+                vocabulary files.
+            frequency_order: whether to number the tokens by decreasing frequency instead of
+                the order they first appear in.
+            numeric_corpus: whether to count the tokens of the numeric corpus of the corpus
+                file instead of reading the text.
         """
         super(DictionaryCreationStage, self).__init__(parent)
         self.frequency_threshold = frequency_threshold
         self.corpus_file = corpus_file
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_vocabulary_size = max_vocabulary_size
+        self.vocabulary_format = vocabulary_format
+        self.frequency_order = frequency_order
+        self.numeric_corpus = numeric_corpus
 
     def pre_run(self):
         """The function that is executed before the stage is run.
@@ -62,24 +146,48 @@ class DictionaryCreationStage(BaseStage):
         Returns:
             True if the stage execution succeded, False otherwise.
         """
-        self.logger.info("Loading tokens from corpus...")
-        file_path = join(constants.TMP_PATH, "{}.{}".format(self.parent.topic, self.corpus_file))
-        tokens = get_tokens_from_file(file_path)
-
-        self.logger.info("Generating dictionary from loaded tokens...")
-        counter = Counter(tokens)
-        dictionary = {}
-        id = 0
-        for token in counter:
-            if counter[token] > self.frequency_threshold:
-                dictionary[token] = id
-                id += 1
-        dictionary["<<unk>>"] = id
-
-        self.logger.info("Dictionary contains {} tokens".format(len(dictionary)))
-        self.logger.info("Saving dictionary...")
-        dictionary_file_path = join(constants.DATA_PATH,
-                                    "{}.dictionary.json".format(self.parent.topic))
-        with open(dictionary_file_path, 'w') as file:
-            file.write(json.dumps(dictionary))
+        corpus = NumericCorpus(self.parent.topic, get_numeric_corpus_name(self.corpus_file))
+        if self.numeric_corpus:
+            file_path = corpus.ids_file_path
+        else:
+            file_path = join(constants.TMP_PATH, "{}.{}".format(self.parent.topic,
+                                                                self.corpus_file))
+        counts_file_path = join(constants.DATA_PATH, "{}.{}.counts.jsonl".format(
+            self.parent.topic, get_numeric_corpus_name(self.corpus_file)))
+        if counts_are_current(counts_file_path, file_path):
+            self.logger.info("Using the saved token counts of the corpus...")
+        elif self.numeric_corpus:
+            self.logger.info("Counting tokens of the numeric corpus...")
+            save_counts(corpus.load().counts(), counts_file_path)
+        else:
+            self.logger.info("Counting tokens of the corpus...")
+            save_counts(count_tokens(file_path, self.workers, self.chunk_size << 20,
+                                     self.max_vocabulary_size, constants.TMP_PATH),
+                        counts_file_path)
+
+        if isinstance(self.frequency_threshold, list):
+            thresholds = self.frequency_threshold
+            dictionary_file_names = [get_dictionary_file_name(self.parent.topic, threshold,
+                                                              self.vocabulary_format)
+                                     for threshold in thresholds]
+        else:
+            thresholds = [self.frequency_threshold]
+            dictionary_file_names = [get_dictionary_file_name(
+                self.parent.topic, vocabulary_format=self.vocabulary_format)]
+
+        self.logger.info("Generating dictionaries from the token counts...")
+        dictionaries = create_dictionaries(read_counts(counts_file_path), thresholds)
+        for threshold, dictionary, dictionary_file_name in zip(thresholds, dictionaries,
+                                                               dictionary_file_names):
+            self.logger.info("Dictionary with threshold {} contains {} tokens".format(
+                threshold, len(dictionary)))
+            if self.frequency_order:
+                dictionary = order_by_frequency(dictionary, read_counts(counts_file_path))
+            self.logger.info("Saving dictionary...")
+            dictionary_file_path = join(constants.DATA_PATH, dictionary_file_name)
+            if self.vocabulary_format == "binary":
+                save_vocabulary(dictionary, dictionary_file_path)
+            else:
+                with open(dictionary_file_path, 'w') as file:
+                    file.write(json.dumps(dictionary))
         return True
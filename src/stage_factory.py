@@ -2,12 +2,14 @@
 """
 from pipeline import Pipeline
 from stage_corpus_analysis import CorpusAnalysisStage
+from stage_corpus_encoding import CorpusEncodingStage
 from stage_corpus_split import CorpusSplitStage
 from stage_fandom_wiki_scraping import FandomWikiScrapingStage
 from stage_fandom_wiki_text_cleaning import FandomWikiTextCleaningStage
 from stage_dictionary_creation import DictionaryCreationStage
 from stage_apply_dictionary import ApplyDictionaryStage
 from stage_srilm_model import SRILMModelStage
+from stage_wikipedia_dump_ingestion import WikipediaDumpIngestionStage
 from stage_wikipedia_scraping import WikipediaScrapingStage
 from stage_wikipedia_text_cleaning import WikipediaTextCleaningStage
 
@@ -19,11 +21,13 @@ import yaml
 
 possible_stages = [ApplyDictionaryStage,
                    CorpusAnalysisStage,
+                   CorpusEncodingStage,
                    CorpusSplitStage,
                    DictionaryCreationStage,
                    FandomWikiScrapingStage,
                    FandomWikiTextCleaningStage,
                    SRILMModelStage,
+                   WikipediaDumpIngestionStage,
                    WikipediaScrapingStage,
                    WikipediaTextCleaningStage]
 stage_name_mapping = {s.name: s for s in possible_stages}
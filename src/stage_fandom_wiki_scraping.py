@@ -1,11 +1,7 @@
 """Stage for scrapping the text data from the wikipedia.
 """
-from base_stage import BaseStage
 from configuration import run_configuration
-
-import constants
-
-from os.path import join
+from stage_scraping import ScrapingStage
 
 import logging
 import pandas as pd
@@ -13,61 +9,70 @@ import requests
 import pywikibot
 
 
-def get_article_list(site, category):
+CATEGORY_NAMESPACE = 14
+
+def get_article_list(fetcher, category, recurse=False):
     """Helper function that finds a list of articles to scrape.
 
     Args:
-        site: pywikibot.Site() to use for selecting articles.
+        fetcher: APIPageFetcher used for listing the category members.
         category: The category to use for selecting articles.
+        recurse: whether to include the articles of the subcategories too.
 
     Returns:
-        Pandas data frame containing the result of the query.
-    """
-    return None
-
-def scrape_article(site, query_row, min_num_tokens=500):
-    """Helper function that scrapes 1 fandom wiki article.
-
-    Args:
-        site: pywikibot.Site().
-        query_row: 1 row of the result from the sparql query.
-        min_num_tokens: required minimum number of tokens in the page.
-
-    Returns:
-        String with the article, if it has more than min_num_tokens tokens.
+        A list of article titles, each title listed once.
     """
-    entry_label = query_row["hLabel.value"]
-    try:
-        page = pywikibot.Page(site, entry_label)
-        num_tokens = len(page.text.split(" "))
-        if num_tokens < min_num_tokens:
-            result = ""
-        else:
-            result = "<<article_start>> {} <<article_end>>\n".format(page.text)
-    except Exception:
-        result = ""
-    return result
-
-class FandomWikiScrapingStage(BaseStage):
+    if not category.startswith("Category:"):
+        category = "Category:{}".format(category)
+    categories = [category.replace("_", " ")]
+    visited = set(categories)
+    titles = {}
+    # Every category is listed once, even if the category graph has cycles.
+    while categories:
+        for member in fetcher.category_members(categories.pop(0)):
+            if member["ns"] != CATEGORY_NAMESPACE:
+                titles[member["title"]] = True
+            elif recurse and member["title"] not in visited:
+                visited.add(member["title"])
+                categories.append(member["title"])
+    return list(titles)
+
+class FandomWikiScrapingStage(ScrapingStage):
     """Stage for scraping the data from the fandom wiki.
     """
     name = "fandom_wiki_scraping"
     logger = logging.getLogger("pipeline").getChild("fandom_wiki_scraping_stage")
 
     def __init__(self, parent=None, category="Jedi_Masters_of_the_Jedi_Order",
-                 fandom="starwars", min_num_tokens=500):
+                 fandom="starwars", recurse=False, min_num_tokens=500, concurrency=1,
+                 requests_per_second=None, api_url=None, batch_size=1, page_cache=False,
+                 page_cache_size=1024, resume=True, retries=3, fetcher=None):
         """Initialization for Fandom Wiki Scraping stage.
 
         Args:
             parent: The parent stage.
             category: The category to scrape.
             fnadom: Which fandom to scrape.
+            recurse: whether to scrape the articles of the subcategories too.
             min_num_tokens: The minimum number of tokens in the article.
+            concurrency: number of articles fetched at the same time.
+            requests_per_second: maximum number of requests per second sent to the wiki.
+            api_url: url of a MediaWiki api.php to fetch from instead of using pywikibot.
+            batch_size: number of articles fetched with 1 request.
+            page_cache: whether to keep the fetched pages in the on-disk page cache.
+            page_cache_size: maximum size of the page cache in megabytes.
+            resume: whether to continue an interrupted scrape from its last checkpoint.
+            retries: number of times a page that failed is fetched again before it is
+                skipped.
+            fetcher: PageFetcher to use instead of the one created from the options above.
         """
-        super(FandomWikiScrapingStage, self).__init__(parent)
+        super(FandomWikiScrapingStage, self).__init__(parent, min_num_tokens, concurrency,
+                                                      requests_per_second, api_url,
+                                                      batch_size, page_cache, page_cache_size,
+                                                      resume, retries, fetcher)
         self.category = category
         self.fandom = fandom
-        self.min_num_tokens = min_num_tokens
+        self.recurse = recurse
 
     def pre_run(self):
         """The function that is executed before the stage is run.
@@ -78,26 +83,26 @@ class FandomWikiScrapingStage(BaseStage):
                                                                          self.fandom))
         self.logger.info("-" * 40)
 
-    def run(self):
-        """Scraps the articles from fandom wiki.
+    def create_site(self):
+        """Creates the pywikibot site of the fandom wiki.
+        """
+        return pywikibot.Site("en", self.fandom)
 
-        Returns:
-            True if the stage execution succeded, False otherwise.
+    def get_source(self):
+        """Returns the fandom, the category and the recursion, the source of the articles.
         """
-        self.logger.info("Looking for articles to scrape...")
-        site = pywikibot.Site("en", self.fandom)
-        article_list = get_article_list(site, self.category)
-        self.logger.info("Got {} possible articles.".format(len(article_list)))
+        return [self.fandom, self.category, self.recurse]
 
-        step_size = len(article_list) // 10
-        output_file_path = join(constants.TMP_PATH, "{}.raw.txt".format(self.parent.topic))
-        with open(output_file_path, "w") as output_file:
-            for i in range(len(article_list)):
-                output_file.write(scrape_article(site, article_list.iloc[i], self.min_num_tokens))
-                if i % step_size == step_size - 1:
-                    self.logger.info("Scraped {} articles out of {}".format(i+1, len(article_list)))
+    def get_titles(self, fetcher):
+        """Lists the articles of the category to scrape.
 
-        with open(output_file_path, "r") as output_file:
-            num_tokens = len(output_file.read().split(" "))
-            self.logger.info("Scraping finished. Output contains ~ {} tokens".format(num_tokens))
-        return True
+        Args:
+            fetcher: APIPageFetcher of the fandom wiki.
+
+        Returns:
+            A list of article titles.
+        """
+        self.logger.info("Looking for articles to scrape...")
+        titles = get_article_list(fetcher, self.category, self.recurse)
+        self.logger.info("Got {} possible articles.".format(len(titles)))
+        return titles
@@ -0,0 +1,224 @@
+"""Base stage for scraping the articles of a wiki.
+
+The wikipedia and fandom wiki scraping stages share the fetching of the pages in batches,
+the checkpoints and the page cache, and differ in how they find the articles to scrape.
+"""
+from base_stage import BaseStage
+from page_cache import PageCache
+from page_fetcher import MediaWikiPageFetcher, PywikibotPageFetcher
+from scraping_checkpoint import ScrapingCheckpoint
+
+import constants
+
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+
+import abc
+
+
+def format_article(text, min_num_tokens=500):
+    """Helper function that surrounds the text of 1 article with the article tokens.
+
+    Args:
+        text: wikitext of the article.
+        min_num_tokens: required minimum number of tokens in the page.
+
+    Returns:
+        String with the article, if it has more than min_num_tokens tokens.
+    """
+    num_tokens = len(text.split(" "))
+    if num_tokens < min_num_tokens:
+        return ""
+    return "<<article_start>> {} <<article_end>>\n".format(text)
+
+class ScrapingStage(BaseStage):
+    """Base stage for scraping the articles of a wiki.
+    """
+
+    def __init__(self, parent=None, min_num_tokens=500, concurrency=1,
+                 requests_per_second=None, api_url=None, batch_size=1, page_cache=False,
+                 page_cache_size=1024, resume=True, retries=3, fetcher=None):
+        """Initialization for the scraping stage.
+
+        Args:
+            parent: The parent stage.
+            min_num_tokens: The minimum number of tokens in the article.
+            concurrency: number of articles fetched at the same time.
+            requests_per_second: maximum number of requests per second sent to the wiki.
+            api_url: url of a MediaWiki api.php to fetch from instead of using pywikibot.
+            batch_size: number of articles fetched with 1 request.
+            page_cache: whether to keep the fetched pages in the on-disk page cache.
+            page_cache_size: maximum size of the page cache in megabytes.
+            resume: whether to continue an interrupted scrape from its last checkpoint.
+            retries: number of times a page that failed is fetched again before it is
+                skipped.
+            fetcher: PageFetcher to use instead of the one created from the options above.
+        """
+        super(ScrapingStage, self).__init__(parent)
+        self.min_num_tokens = min_num_tokens
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.page_cache = page_cache
+        self.page_cache_size = page_cache_size
+        self.resume = resume
+        self.retries = retries
+        self.fetcher = fetcher
+
+    @abc.abstractmethod
+    def create_site(self):
+        """Creates the pywikibot site of the wiki.
+        """
+
+    @abc.abstractmethod
+    def get_source(self):
+        """Returns the description of where the articles come from, see ScrapingCheckpoint.
+        """
+
+    @abc.abstractmethod
+    def get_titles(self, fetcher):
+        """Finds the articles to scrape.
+
+        Args:
+            fetcher: PageFetcher of the wiki.
+
+        Returns:
+            A list of article titles.
+        """
+
+    def create_fetcher(self):
+        """Creates the page fetcher used for scraping.
+
+        Returns:
+            PageFetcher for the wiki.
+        """
+        if self.fetcher is not None:
+            return self.fetcher
+        cache = None
+        if self.page_cache:
+            cache = PageCache(join(constants.CACHE_PATH, "pages"), self.page_cache_size << 20)
+        if self.api_url is not None:
+            return MediaWikiPageFetcher(self.api_url, self.requests_per_second, self.batch_size,
+                                        cache)
+        return PywikibotPageFetcher(self.create_site(), self.requests_per_second,
+                                    self.batch_size, cache)
+
+    def fetch_page(self, fetcher, title):
+        """Fetches 1 page, trying again up to self.retries times if it fails.
+
+        Args:
+            fetcher: PageFetcher used for getting the page.
+            title: title of the page.
+
+        Returns:
+            String with the wikitext of the page, empty if it could not be fetched.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return fetcher.fetch(title)
+            except Exception as error:
+                last_error = error
+        self.logger.warning("Skipping the article {} after {} failed attempts: {}".format(
+            title, self.retries + 1, last_error))
+        return ""
+
+    def scrape_articles(self, fetcher, titles):
+        """Scrapes a batch of articles.
+
+        If the batch request fails, the pages are fetched one by one, and a page that keeps
+        failing is skipped, so it cannot stop the scrape on every resume.
+
+        Args:
+            fetcher: PageFetcher used for getting the pages.
+            titles: a list of article titles.
+
+        Returns:
+            String with the articles that have more than min_num_tokens tokens.
+        """
+        # A page of n bytes has at most n + 1 tokens, so shorter pages are not downloaded.
+        # The length query only pays off if it covers several pages.
+        min_length = self.min_num_tokens - 1 if len(titles) > 1 else 0
+        try:
+            texts = fetcher.fetch_many(titles, min_length)
+        except Exception as error:
+            self.logger.warning("Fetching {} failed ({}), fetching the articles one by "
+                                "one.".format(titles, error))
+            texts = [self.fetch_page(fetcher, title) for title in titles]
+        return "".join([format_article(text, self.min_num_tokens) for text in texts])
+
+    def scrape(self, fetcher, titles, num_done, checkpoint, output_file_path):
+        """Scrapes the articles after the first num_done ones, saving a checkpoint after
+        every batch.
+
+        Args:
+            fetcher: PageFetcher used for getting the pages.
+            titles: a list of article titles.
+            num_done: the number of articles scraped before.
+            checkpoint: ScrapingCheckpoint of the scrape.
+            output_file_path: path to the output file.
+
+        Returns:
+            True if all the articles were scraped, False if the scrape stopped.
+        """
+        batches = [titles[i:i + self.batch_size]
+                   for i in range(num_done, len(titles), self.batch_size)]
+        step_size = max(len(batches) // 10, 1)
+
+        def scrape(batch):
+            return self.scrape_articles(fetcher, batch)
+
+        # A resumed scrape appends to the output that the checkpoint covers.
+        num_scraped = num_done
+        with open(output_file_path, "a" if num_done else "w") as output_file, \
+                ThreadPoolExecutor(self.concurrency) as executor:
+            try:
+                # map yields the results in the order of the rows, whichever finishes first.
+                for i, articles in enumerate(executor.map(scrape, batches)):
+                    output_file.write(articles)
+                    num_scraped = min(num_done + (i + 1) * self.batch_size, len(titles))
+                    checkpoint.save(num_scraped, output_file)
+                    if i % step_size == step_size - 1:
+                        self.logger.info("Scraped {} articles out of {}".format(
+                            num_scraped, len(titles)))
+            except Exception as error:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.logger.error("Scraping stopped after {} articles out of {}: {}. Run the "
+                                  "stage again to resume.".format(num_scraped, len(titles),
+                                                                 error))
+                return False
+        return True
+
+    def run(self):
+        """Scraps the articles from the wiki.
+
+        Returns:
+            True if the stage execution succeded, False otherwise.
+        """
+        output_file_path = join(constants.TMP_PATH, "{}.raw.txt".format(self.parent.topic))
+        checkpoint = ScrapingCheckpoint(output_file_path, self.get_source())
+        titles, num_done = checkpoint.restore() if self.resume else (None, 0)
+        fetcher = self.create_fetcher()
+        cache = getattr(fetcher, "cache", None)
+        try:
+            if titles is None:
+                titles = self.get_titles(fetcher)
+                checkpoint.start(titles)
+            else:
+                self.logger.info("Resuming the scrape after {} articles out of {}".format(
+                    num_done, len(titles)))
+            if not self.scrape(fetcher, titles, num_done, checkpoint, output_file_path):
+                return False
+            checkpoint.clear()
+            if cache is not None:
+                self.logger.info("Page cache: {} hits, {} misses".format(cache.hits,
+                                                                         cache.misses))
+        finally:
+            # A fetcher passed to the stage belongs to the caller, who closes its cache.
+            if cache is not None and fetcher is not self.fetcher:
+                cache.close()
+
+        with open(output_file_path, "r") as output_file:
+            num_tokens = len(output_file.read().split(" "))
+            self.logger.info("Scraping finished. Output contains ~ {} tokens".format(num_tokens))
+        return True
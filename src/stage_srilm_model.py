@@ -2,10 +2,16 @@
 """
 from base_stage import BaseStage
 from configuration import run_configuration
+from ngram_counting import count_ngrams, get_bits_per_id, save_ngram_counts
+from ngram_evaluation import evaluate_perplexity
+from ngram_model import train_kneser_ney, write_arpa
+from stage_dictionary_creation import get_dictionary_file_name
+from token_ids import get_token_ids_file_name, load_token_ids
+from vocabulary import Vocabulary
 
 import constants
 
-from os.path import join
+from os.path import exists, join
 
 import json
 import logging
@@ -15,31 +21,114 @@ def get_tokens_from_file(file_path):
     """Helper function for getting tokens from file.
 
     Args:
-        file_path: a path to the file.
+        file_path: a path to the token id file written by the apply dictionary stage.
 
     Returns:
-        A list of tokens.
+        A memory mapped numpy array of token ids.
     """
-    with open(file_path) as file:
-        text = file.read()
-        tokens = [int(t) for t in text.split(" ")]
+    return load_token_ids(file_path)
+
+def get_model_name(topic, ngram, frequency_threshold=None):
+    """Helper function that names the files of the model of a topic.
+
+    Args:
+        topic: the topic of the pipeline.
+        ngram: the ngram size of the model.
+        frequency_threshold: the threshold of the dictionary of the model, if a dictionary
+            of a threshold was selected.
+
+    Returns:
+        The common prefix of the names of the model files, e.g. countries.3gram, or
+        countries.3gram.3 for threshold 3.
+    """
+    if frequency_threshold is None:
+        return "{}.{}gram".format(topic, ngram)
+    return "{}.{}gram.{}".format(topic, ngram, frequency_threshold)
+
+def get_model_dir_name(topic, ngram, frequency_threshold=None):
+    """Helper function that names the folder of the model of a topic.
+
+    Args:
+        topic: the topic of the pipeline.
+        ngram: the ngram size of the model.
+        frequency_threshold: the threshold of the dictionary of the model, if a dictionary
+            of a threshold was selected.
+
+    Returns:
+        The name of the model folder in the data folder.
+    """
+    return "{}.model".format(get_model_name(topic, ngram, frequency_threshold))
+
+def load_dictionary_tokens(dictionary_file_path, vocabulary_format="json"):
+    """Helper function that reads the tokens of a dictionary in the order of their ids.
+
+    Args:
+        dictionary_file_path: a path to the dictionary file.
+        vocabulary_format: json for a json dictionary, binary for a binary vocabulary.
+
+    Returns:
+        A list with the token of every id.
+    """
+    if vocabulary_format == "binary":
+        return Vocabulary(dictionary_file_path).tokens()
+    with open(dictionary_file_path) as file:
+        dictionary = json.loads(file.read())
+    tokens = [None] * (max(dictionary.values()) + 1 if dictionary else 0)
+    for token, id in dictionary.items():
+        tokens[id] = token
     return tokens
 
+def get_unknown_id(dictionary_file_path, vocabulary_format="json"):
+    """Helper function that returns the id of the unknown token of a dictionary.
+
+    Args:
+        dictionary_file_path: a path to the dictionary file.
+        vocabulary_format: json for a json dictionary, binary for a binary vocabulary.
+
+    Returns:
+        The id of <<unk>>, None if the dictionary has no unknown token.
+
+    Raises:
+        FileNotFoundError: if there is no dictionary file, as the perplexity would count the
+            unknown tokens as words of the model without it.
+    """
+    if not exists(dictionary_file_path):
+        raise FileNotFoundError("There is no dictionary {} to find the unknown token in."
+                                .format(dictionary_file_path))
+    if vocabulary_format == "binary":
+        return Vocabulary(dictionary_file_path).get("<<unk>>")
+    with open(dictionary_file_path) as file:
+        return json.loads(file.read()).get("<<unk>>")
+
 class SRILMModelStage(BaseStage):
     """Stage for applying SRILM model on the corpora.
     """
     name = "srilm_model"
     logger = logging.getLogger("pipeline").getChild("srilm_model_stage")
 
-    def __init__(self, parent=None, ngram=2):
+    def __init__(self, parent=None, ngram=2, workers=1, chunk_size=16, arpa=False,
+                 frequency_threshold=None, vocabulary_format="json"):
         """Initialization for SRILM model stage.
 
         Args:
             parent: The parent stage.
             ngram: the ngram size for the model.
+            workers: number of processes counting the n-grams and scoring the splits.
+            chunk_size: number of tokens counted at once, in millions.
+            arpa: whether to also write the model in the ARPA format.
+            frequency_threshold: selects the token ids and the dictionary of this threshold,
+                if the apply dictionary stage was run with a threshold. The model files get
+                the threshold in their names too.
+            vocabulary_format: json if the dictionary is a json dictionary, binary if it is a
+                binary vocabulary file.
         """
         super(SRILMModelStage, self).__init__(parent)
         self.ngram = ngram
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.arpa = arpa
+        self.frequency_threshold = frequency_threshold
+        self.vocabulary_format = vocabulary_format
 
     def pre_run(self):
         """The function that is executed before the stage is run.
@@ -56,10 +145,53 @@ class SRILMModelStage(BaseStage):
             True if the stage execution succeded, False otherwise.
         """
         self.logger.info("Starting model training...")
-        train_file_path = join(constants.DATA_PATH, "{}.train.txt".format(self.parent.topic))
-        test_file_path = join(constants.DATA_PATH, "{}.test.txt".format(self.parent.topic))
-        valid_file_path = join(constants.DATA_PATH, "{}.valid.txt".format(self.parent.topic))
+        train_file_path, test_file_path, valid_file_path = [
+            join(constants.DATA_PATH, "{}.{}".format(self.parent.topic, get_token_ids_file_name(
+                corpus_file, self.frequency_threshold)))
+            for corpus_file in ["train.txt", "test.txt", "valid.txt"]]
+        model_name = get_model_name(self.parent.topic, self.ngram, self.frequency_threshold)
+        dictionary_file_path = join(constants.DATA_PATH, get_dictionary_file_name(
+            self.parent.topic, self.frequency_threshold, self.vocabulary_format))
+        if not exists(dictionary_file_path):
+            self.logger.error("There is no dictionary {}, the unknown tokens of the splits "
+                              "cannot be found. Check the frequency_threshold and the "
+                              "vocabulary_format of the stage.".format(dictionary_file_path))
+            return False
         train_tokens = get_tokens_from_file(train_file_path)
         test_tokens = get_tokens_from_file(test_file_path)
         valid_tokens = get_tokens_from_file(valid_file_path)
+
+        vocabulary_size = max([int(tokens.max()) + 1 if len(tokens) else 0
+                               for tokens in [train_tokens, test_tokens, valid_tokens]])
+        bits = get_bits_per_id(vocabulary_size)
+        self.logger.info("Counting n-grams of {} training tokens...".format(len(train_tokens)))
+        counts = count_ngrams(train_file_path, self.ngram, bits, self.workers,
+                              self.chunk_size * 1000000)
+        for order, (keys, _) in enumerate(counts, 1):
+            self.logger.info("{} distinct {}-grams".format(len(keys), order))
+        counts_file_path = join(constants.DATA_PATH, "{}.counts.npz".format(model_name))
+        save_ngram_counts(counts, bits, counts_file_path)
+
+        self.logger.info("Training modified Kneser-Ney model...")
+        model = train_kneser_ney(counts, bits, vocabulary_size)
+        model_dir = join(constants.DATA_PATH, get_model_dir_name(self.parent.topic, self.ngram,
+                                                                 self.frequency_threshold))
+        model.save(model_dir)
+        self.logger.info("Saved the model to {}".format(model_dir))
+
+        unknown_id = get_unknown_id(dictionary_file_path, self.vocabulary_format)
+        for split_name, file_path in [("test", test_file_path), ("valid", valid_file_path)]:
+            result = evaluate_perplexity(file_path, model_dir, unknown_id, self.workers,
+                                         self.chunk_size * 1000000)
+            self.logger.info("{}: perplexity {:.2f}, OOV rate {:.2%} ({} of {} tokens), "
+                             "{:.0f} tokens/s".format(split_name, result["perplexity"],
+                                                      result["oov_rate"], result["num_oov"],
+                                                      result["num_tokens"],
+                                                      result["tokens_per_second"]))
+
+        if self.arpa:
+            tokens = load_dictionary_tokens(dictionary_file_path, self.vocabulary_format)
+            arpa_file_path = join(constants.DATA_PATH, "{}.arpa".format(model_name))
+            write_arpa(model, tokens, arpa_file_path)
+            self.logger.info("Saved the ARPA model to {}".format(arpa_file_path))
         return True
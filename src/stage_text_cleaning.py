@@ -0,0 +1,286 @@
+"""Base stage for cleaning the text of wiki articles.
+
+The wikipedia and fandom wiki cleaning stages share everything but the name and whether
+the tokens are reduced to ascii characters.
+"""
+from base_stage import BaseStage
+from corpus_io import build_article_index, read_articles
+from normalization_cache import NormalizationCache
+from text_normalization import normalize_text
+from tokenization import get_tokenizer
+
+import constants
+
+from functools import partial
+from itertools import islice
+from nltk.stem import WordNetLemmatizer
+from os.path import join
+from wiki_dump_reader import Cleaner
+
+import multiprocessing
+import nltk
+import re
+
+
+nltk.download('punkt')
+nltk.download('wordnet')
+
+worker_cache = None
+worker_tokenizer = None
+
+def normalize_token(token, lemmatizer, ascii_only=True):
+    """Helper function that normalizes 1 token.
+
+    Args:
+        token: the raw token.
+        lemmatizer: nltk WordNetLemmatizer.
+        ascii_only: whether to remove the characters that are not ascii.
+
+    Returns:
+        The normalized token.
+    """
+    token = token.lower()
+    if ascii_only:
+        token = token.encode("ascii", "ignore")
+        token = token.decode()
+    return lemmatizer.lemmatize(token)
+
+def create_cache(cache_size, track_added=False, ascii_only=True):
+    """Helper function that creates the token normalization cache.
+
+    Args:
+        cache_size: maximum number of tokens kept in the cache.
+        track_added: whether the cache should remember newly normalized tokens.
+        ascii_only: whether normalize_token removes the characters that are not ascii.
+
+    Returns:
+        NormalizationCache that normalizes tokens with normalize_token.
+    """
+    lemmatizer = WordNetLemmatizer()
+    return NormalizationCache(partial(normalize_token, lemmatizer=lemmatizer,
+                                      ascii_only=ascii_only), cache_size, track_added)
+
+def clean_article(article, cleaner, cache, tokenize):
+    """Helper function that cleans 1 wiki article.
+
+    Args:
+        article: raw text of the article.
+        cleaner: wiki_dump_reader Cleaner.
+        cache: NormalizationCache used for normalizing the tokens.
+        tokenize: the function that splits the text into tokens.
+
+    Returns:
+        String with the cleaned article surrounded by the article tokens.
+    """
+    # Removing special tokens
+    article = re.sub('<<article_start>>', '', article)
+    # Removing wikipedia markup
+    article = cleaner.clean_text(article)
+    # Removing left out >
+    article = re.sub(">", '', article)
+    # Openning up [[...]]
+    article = re.sub('\[{2}(.*?)(\|[\w\s\|]*)?\]{2}', '\\1', article)
+    # Removing |
+    article = re.sub('\|', ' ', article)
+
+    tokens = tokenize(article)
+    article = " ".join([cache.get(token) for token in tokens])
+
+    return "<<article_start>> {} <<article_end>>".format(article)
+
+def clean_articles(articles, cache, tokenizer="nltk"):
+    """Helper function that cleans a chunk of wiki articles.
+
+    The years, numbers and section titles of every article are replaced by normalize_text,
+    so a section marker is never matched with one of another article.
+
+    Args:
+        articles: a list with raw texts of the articles.
+        cache: NormalizationCache used for normalizing the tokens.
+        tokenizer: the name of the tokenizer, see tokenization.get_tokenizer.
+
+    Returns:
+        A list with the cleaned articles, in the same order.
+    """
+    cleaner = Cleaner()
+    tokenize = get_tokenizer(tokenizer)
+    return [normalize_text(clean_article(article, cleaner, cache, tokenize))
+            for article in articles]
+
+def init_worker(cache_size, cache_entries, tokenizer="nltk", ascii_only=True):
+    """Initializes the normalization cache and the tokenizer of a worker process.
+
+    Args:
+        cache_size: maximum number of tokens kept in the cache.
+        cache_entries: (raw token, normalized token) pairs to start the cache with.
+        tokenizer: the name of the tokenizer, see tokenization.get_tokenizer.
+        ascii_only: whether to remove the characters of the tokens that are not ascii.
+    """
+    global worker_cache, worker_tokenizer
+    worker_cache = create_cache(cache_size, track_added=True, ascii_only=ascii_only)
+    worker_cache.update(cache_entries)
+    worker_tokenizer = tokenizer
+
+def clean_articles_in_worker(articles):
+    """Helper function that cleans a chunk of wiki articles in a worker process.
+
+    Args:
+        articles: a list with raw texts of the articles.
+
+    Returns:
+        A tuple with the cleaned articles, the (raw token, normalized token) pairs added to
+        the worker cache, and the number of cache hits and misses while cleaning the chunk.
+    """
+    hits, misses = worker_cache.hits, worker_cache.misses
+    articles = clean_articles(articles, worker_cache, worker_tokenizer)
+    return (articles, worker_cache.pop_added(), worker_cache.hits - hits,
+            worker_cache.misses - misses)
+
+class TextCleaningStage(BaseStage):
+    """Base stage for cleaning wiki text data.
+    """
+    ascii_only = True
+
+    def __init__(self, parent=None, workers=1, chunk_size=100, cache_size=100000,
+                 persist_cache=False, streaming=False, tokenizer="nltk"):
+        """Initialization for the text cleaning stage.
+
+        Both modes clean and normalize the articles one by one, so they write the same text.
+
+        Args:
+            parent: The parent stage.
+            workers: number of processes used for cleaning the articles.
+            chunk_size: number of articles sent to a worker at once.
+            cache_size: maximum number of tokens kept in the normalization cache.
+            persist_cache: whether to keep the normalization cache between runs.
+            streaming: whether to clean the articles one batch at a time instead of loading
+                the whole corpus into memory.
+            tokenizer: nltk to tokenize with nltk.word_tokenize, regex for the faster regex
+                tokenizer that approximates it.
+        """
+        super(TextCleaningStage, self).__init__(parent)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.persist_cache = persist_cache
+        self.streaming = streaming
+        self.tokenizer = tokenizer
+
+    def run(self):
+        """Cleans the raw text of the topic.
+
+        Returns:
+            True if the stage execution succeded, False otherwise.
+        """
+        self.logger.info("Starting text cleaning...")
+        input_file_path = join(constants.TMP_PATH, "{}.raw.txt".format(self.parent.topic))
+        output_file_path = join(constants.TMP_PATH, "{}.clean.txt".format(self.parent.topic))
+        cache_file_path = join(constants.CACHE_PATH, "{}.tokens.json".format(self.name))
+        cache = create_cache(self.cache_size, ascii_only=self.ascii_only)
+        if self.persist_cache and cache.load(cache_file_path):
+            self.logger.info("Loaded {} cached tokens".format(len(cache)))
+
+        pool = None
+        if self.workers > 1:
+            self.logger.info("Cleaning the articles with {} workers".format(self.workers))
+            pool = multiprocessing.Pool(self.workers, init_worker,
+                                        (self.cache_size, list(cache.entries.items()),
+                                         self.tokenizer, self.ascii_only))
+        try:
+            if self.streaming:
+                num_tokens = self.clean_streaming(input_file_path, output_file_path, cache, pool)
+            else:
+                num_tokens = self.clean_in_memory(input_file_path, output_file_path, cache, pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.logger.info("Normalization cache: {} hits, {} misses ({:.1%} hit rate)".format(
+            cache.hits, cache.misses, cache.hit_rate()))
+        if self.persist_cache:
+            cache.save(cache_file_path)
+        self.logger.info("Indexed {} articles".format(len(build_article_index(output_file_path))))
+        self.logger.info("Saved the cleaned text. Contains ~ {} tokens".format(num_tokens))
+        return True
+
+    def clean(self, articles, cache, pool=None):
+        """Cleans a list of raw articles.
+
+        Args:
+            articles: a list with raw texts of the articles.
+            cache: NormalizationCache used for normalizing the tokens.
+            pool: optional multiprocessing.Pool the article chunks are sent to.
+
+        Returns:
+            A list with the cleaned articles, in the same order.
+        """
+        if pool is None:
+            return clean_articles(articles, cache, self.tokenizer)
+
+        chunks = [articles[i:i + self.chunk_size]
+                  for i in range(0, len(articles), self.chunk_size)]
+        cleaned = []
+        for cleaned_articles, added, hits, misses in pool.map(clean_articles_in_worker, chunks):
+            cleaned.extend(cleaned_articles)
+            cache.update(added)
+            cache.hits += hits
+            cache.misses += misses
+        return cleaned
+
+    def clean_in_memory(self, input_file_path, output_file_path, cache, pool=None):
+        """Cleans the whole corpus at once.
+
+        Args:
+            input_file_path: path to the raw text.
+            output_file_path: path to the cleaned text.
+            cache: NormalizationCache used for normalizing the tokens.
+            pool: optional multiprocessing.Pool used for cleaning the articles.
+
+        Returns:
+            The number of tokens in the cleaned text.
+        """
+        with open(input_file_path, "r") as file:
+            text = file.read()
+
+        text = re.sub('&nbsp', '', text)
+
+        self.logger.info("Cleaning the markup, applying token-wise operations and replacing "
+                         "years, numbers and section titles")
+        text = " ".join(self.clean(text.split("<<article_end>>"), cache, pool))
+
+        with open(output_file_path, "w") as file:
+            file.write(text)
+        return len(text.split(" "))
+
+    def clean_streaming(self, input_file_path, output_file_path, cache, pool=None):
+        """Cleans the corpus one batch of articles at a time, appending them to the output.
+
+        Args:
+            input_file_path: path to the raw text.
+            output_file_path: path to the cleaned text.
+            cache: NormalizationCache used for normalizing the tokens.
+            pool: optional multiprocessing.Pool used for cleaning the articles.
+
+        Returns:
+            The number of tokens in the cleaned text.
+        """
+        self.logger.info("Cleaning the articles in streaming mode")
+        articles = read_articles(input_file_path)
+        batch_size = self.chunk_size * max(self.workers, 1)
+        num_tokens = 0
+        num_articles = 0
+        separator = ""
+        with open(output_file_path, "w") as file:
+            while True:
+                batch = [re.sub('&nbsp', '', article)
+                         for article in islice(articles, batch_size)]
+                if not batch:
+                    break
+                for article in self.clean(batch, cache, pool):
+                    file.write(separator + article)
+                    separator = " "
+                    num_tokens += len(article.split(" "))
+                num_articles += len(batch)
+                self.logger.info("Cleaned {} articles".format(num_articles))
+        return num_tokens
@@ -0,0 +1,269 @@
+"""Stage for reading the text data from a local wikipedia dump.
+"""
+from base_stage import BaseStage
+from configuration import run_configuration
+from stage_scraping import format_article
+from stage_wikipedia_scraping import get_article_list
+
+import constants
+
+from multiprocessing import Pool
+from os.path import getsize, join
+from xml.etree import ElementTree
+
+import bz2
+import logging
+import re
+
+
+worker_settings = None
+
+def normalize_title(title):
+    """Helper function that brings a page title to the form used in the dumps.
+
+    Args:
+        title: the page title.
+
+    Returns:
+        The title with spaces instead of underscores and an upper case first letter.
+    """
+    title = title.replace("_", " ").strip()
+    return title[:1].upper() + title[1:]
+
+def create_category_pattern(category):
+    """Helper function that creates a regex matching the links to a category in wikitext.
+
+    Args:
+        category: the category name, with or without the namespace prefix.
+
+    Returns:
+        Compiled regex, None if there is no category.
+    """
+    if not category:
+        return None
+    name = normalize_title(re.sub("^[Cc]ategory:", "", category))
+    # Only the first letter of a title is case-insensitive.
+    name = "[{}{}]{}".format(re.escape(name[:1]), re.escape(name[:1].lower()),
+                             re.escape(name[1:]).replace("\\ ", "[ _]+"))
+    return re.compile("\\[\\[\\s*[Cc]ategory\\s*:\\s*{}\\s*(\\|[^\\]]*)?\\]\\]".format(name))
+
+def select_page(page, settings):
+    """Helper function that checks whether a page of the dump should be ingested.
+
+    Args:
+        page: a dictionary with the title, namespace, redirect flag and text of the page.
+        settings: a dictionary with the selected titles, namespaces and category pattern.
+
+    Returns:
+        True if the page passes the filters, False otherwise.
+    """
+    if page["redirect"] or page["ns"] not in settings["namespaces"]:
+        return False
+    if settings["titles"] is not None and page["title"] not in settings["titles"]:
+        return False
+    pattern = settings["category_pattern"]
+    return pattern is None or pattern.search(page["text"]) is not None
+
+def read_page(element):
+    """Helper function that extracts the fields of a page element of the dump.
+
+    Args:
+        element: the page element, with or without the export namespace.
+
+    Returns:
+        A dictionary with the title, namespace, redirect flag and text of the page.
+    """
+    return {
+        "title": element.findtext("{*}title", ""),
+        "ns": int(element.findtext("{*}ns", "0")),
+        "redirect": element.find("{*}redirect") is not None,
+        "text": element.findtext("{*}revision/{*}text", "") or "",
+    }
+
+def iterate_pages(dump_file_path):
+    """Helper function that streams the pages of a dump without keeping them in memory.
+
+    Args:
+        dump_file_path: a path to the pages-articles xml.bz2 dump.
+
+    Yields:
+        A dictionary for every page of the dump.
+    """
+    with bz2.open(dump_file_path, "rb") as dump_file:
+        context = ElementTree.iterparse(dump_file, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event == "end" and element.tag.rsplit("}", 1)[-1] == "page":
+                yield read_page(element)
+                # The parsed pages stay attached to the root until it is cleared.
+                root.clear()
+
+def read_stream_ranges(index_file_path, dump_file_path, titles=None):
+    """Helper function that finds the bz2 streams of a multistream dump.
+
+    Args:
+        index_file_path: a path to the multistream index of the dump.
+        dump_file_path: a path to the multistream dump.
+        titles: a set of titles, only the streams with these pages are returned if given.
+
+    Returns:
+        A list of (start, end) byte ranges of the streams with pages.
+    """
+    offsets = []
+    with bz2.open(index_file_path, "rt", encoding="utf-8") as index_file:
+        for line in index_file:
+            offset, _, title = line.rstrip("\n").split(":", 2)
+            offset = int(offset)
+            if not offsets or offsets[-1][0] != offset:
+                offsets.append([offset, False])
+            if titles is None or title in titles:
+                offsets[-1][1] = True
+    # The last stream also holds the closing tag of the dump, bz2 reads through it.
+    ends = [offset for offset, _ in offsets[1:]] + [getsize(dump_file_path)]
+    return [(offset, end) for (offset, selected), end in zip(offsets, ends) if selected]
+
+def init_worker(settings):
+    """Initializer of the worker processes, stores the filter settings.
+
+    Args:
+        settings: a dictionary with the dump path and the filter settings.
+    """
+    global worker_settings
+    worker_settings = settings
+
+def ingest_stream(stream_range):
+    """Decompresses 1 stream of a multistream dump and formats its selected pages.
+
+    Args:
+        stream_range: (start, end) byte range of the stream.
+
+    Returns:
+        A tuple of the number of selected pages and the string with the formatted articles.
+    """
+    start, end = stream_range
+    with open(worker_settings["dump_file_path"], "rb") as dump_file:
+        dump_file.seek(start)
+        data = bz2.decompress(dump_file.read(end - start))
+    # A stream holds a run of page elements, the closing tag of the dump is dropped.
+    data = data.replace(b"</mediawiki>", b"")
+    root = ElementTree.fromstring(b"<pages>" + data + b"</pages>")
+    pages = [read_page(element) for element in root.iterfind("{*}page")]
+    pages = [page for page in pages if select_page(page, worker_settings)]
+    articles = [format_article(page["text"], worker_settings["min_num_tokens"])
+                for page in pages]
+    return len(pages), "".join(articles)
+
+class WikipediaDumpIngestionStage(BaseStage):
+    """Stage for reading the articles from a local wikipedia dump instead of scraping them.
+    """
+    name = "wikipedia_dump_ingestion"
+    logger = logging.getLogger("pipeline").getChild("wikipedia_dump_ingestion_stage")
+
+    def __init__(self, parent=None, dump_file="enwiki-latest-pages-articles.xml.bz2",
+                 index_file=None, sparql_file=None, titles_file=None, namespaces=None,
+                 category=None, min_num_tokens=500, workers=1):
+        """Initialization for Wikipedia Dump Ingestion stage.
+
+        Args:
+            parent: The parent stage.
+            dump_file: the pages-articles xml.bz2 dump in the data folder.
+            index_file: the multistream index of the dump in the data folder. With the index
+                the streams of the dump are decompressed in parallel.
+            sparql_file: file with sparql query for wikidata that selects the articles.
+            titles_file: file in the data folder with 1 article title per line.
+            namespaces: a list of the namespaces to ingest, main namespace by default.
+            category: only the articles in this category are ingested if given.
+            min_num_tokens: The minimum number of tokens in the article.
+            workers: number of processes decompressing the dump.
+        """
+        super(WikipediaDumpIngestionStage, self).__init__(parent)
+        self.dump_file_path = join(constants.DATA_PATH, dump_file)
+        self.index_file_path = join(constants.DATA_PATH, index_file) if index_file else None
+        self.search_query_file_path = join(constants.SQL_SCRIPTS_PATH, sparql_file) \
+            if sparql_file else None
+        self.titles_file_path = join(constants.DATA_PATH, titles_file) if titles_file else None
+        self.namespaces = namespaces if namespaces is not None else [0]
+        self.category = category
+        self.min_num_tokens = min_num_tokens
+        self.workers = workers
+
+    def pre_run(self):
+        """The function that is executed before the stage is run.
+        """
+        self.logger.info("=" * 40)
+        self.logger.info("Executing wikipedia dump ingestion stage")
+        self.logger.info("-" * 40)
+
+    def get_titles(self):
+        """Reads the titles of the selected articles.
+
+        Returns:
+            A set of normalized titles, None if all articles are selected.
+        """
+        if self.search_query_file_path is not None:
+            self.logger.info("Querying wikidata for articles to ingest...")
+            article_list = get_article_list(self.search_query_file_path)
+            label_key = ""
+            for key in article_list:
+                if "Label" in key and "value" in key:
+                    label_key = key
+                    break
+            titles = list(article_list[label_key])
+        elif self.titles_file_path is not None:
+            with open(self.titles_file_path, "r", encoding="utf-8") as titles_file:
+                titles = [line for line in titles_file.read().split("\n") if line.strip()]
+        else:
+            return None
+        titles = set([normalize_title(title) for title in titles])
+        self.logger.info("Got {} articles.".format(len(titles)))
+        return titles
+
+    def run(self):
+        """Reads the selected articles from the dump.
+
+        Returns:
+            True if the stage execution succeded, False otherwise.
+        """
+        settings = {
+            "dump_file_path": self.dump_file_path,
+            "titles": self.get_titles(),
+            "namespaces": set(self.namespaces),
+            "category_pattern": create_category_pattern(self.category),
+            "min_num_tokens": self.min_num_tokens,
+        }
+        output_file_path = join(constants.TMP_PATH, "{}.raw.txt".format(self.parent.topic))
+
+        num_selected = 0
+        # The tokens are counted as the articles are written, the same as splitting the
+        # whole output on " " would count them.
+        num_tokens = 1
+        with open(output_file_path, "w") as output_file:
+            if self.index_file_path is None:
+                self.logger.info("Streaming the dump...")
+                for i, page in enumerate(iterate_pages(self.dump_file_path)):
+                    if select_page(page, settings):
+                        num_selected += 1
+                        article = format_article(page["text"], self.min_num_tokens)
+                        num_tokens += article.count(" ")
+                        output_file.write(article)
+                    if i % 100000 == 99999:
+                        self.logger.info("Read {} pages, selected {}".format(i + 1,
+                                                                             num_selected))
+            else:
+                stream_ranges = read_stream_ranges(self.index_file_path, self.dump_file_path,
+                                                   settings["titles"])
+                self.logger.info("Reading {} streams of the dump...".format(len(stream_ranges)))
+                step_size = max(len(stream_ranges) // 10, 1)
+                with Pool(max(self.workers, 1), init_worker, (settings,)) as pool:
+                    # imap keeps the articles in the order of the dump.
+                    for i, (num_pages, articles) in enumerate(
+                            pool.imap(ingest_stream, stream_ranges)):
+                        num_selected += num_pages
+                        num_tokens += articles.count(" ")
+                        output_file.write(articles)
+                        if i % step_size == step_size - 1:
+                            self.logger.info("Read {} streams out of {}".format(
+                                i + 1, len(stream_ranges)))
+        self.logger.info("Selected {} articles.".format(num_selected))
+        self.logger.info("Ingestion finished. Output contains ~ {} tokens".format(num_tokens))
+        return True
@@ -1,7 +1,7 @@
 """Stage for scrapping the text data from the wikipedia.
 """
-from base_stage import BaseStage
 from configuration import run_configuration
+from stage_scraping import ScrapingStage
 
 import constants
 
@@ -32,47 +32,37 @@ def get_article_list(sparql_file_path):
         results_df = pd.json_normalize(results['results']['bindings'])
         return results_df
 
-def scrape_article(site, query_row, label_key, min_num_tokens=500):
-    """Helper function that scrapes 1 wikipedia article.
-
-    Args:
-        site: pywikibot Site.
-        query_row: 1 row of the result from the sparql query.
-        label_key: a key to use in order to get label.
-        min_num_tokens: required minimum number of tokens in the page.
-
-    Returns:
-        String with the article, if it has more than min_num_tokens tokens.
-    """
-    entry_label = query_row[label_key]
-    try:
-        page = pywikibot.Page(site, entry_label)
-        num_tokens = len(page.text.split(" "))
-        if num_tokens < min_num_tokens:
-            result = ""
-        else:
-            result = "<<article_start>> {} <<article_end>>\n".format(page.text)
-    except Exception:
-        result = ""
-    return result
-
-class WikipediaScrapingStage(BaseStage):
+class WikipediaScrapingStage(ScrapingStage):
     """Stage for scraping the data from the wikipedia.
     """
     name = "wikipedia_scraping"
     logger = logging.getLogger("pipeline").getChild("wikipedia_scraping_stage")
 
-    def __init__(self, parent=None, sparql_file="search_query.sparql", min_num_tokens=500):
+    def __init__(self, parent=None, sparql_file="search_query.sparql", min_num_tokens=500,
+                 concurrency=1, requests_per_second=None, api_url=None, batch_size=1,
+                 page_cache=False, page_cache_size=1024, resume=True, retries=3, fetcher=None):
         """Initialization for Wikipedia Scraping stage.
 
         Args:
             parent: The parent stage.
             sparql_file: file with sparql query for wikidata.
             min_num_tokens: The minimum number of tokens in the article.
+            concurrency: number of articles fetched at the same time.
+            requests_per_second: maximum number of requests per second sent to the wiki.
+            api_url: url of a MediaWiki api.php to fetch from instead of using pywikibot.
+            batch_size: number of articles fetched with 1 request.
+            page_cache: whether to keep the fetched pages in the on-disk page cache.
+            page_cache_size: maximum size of the page cache in megabytes.
+            resume: whether to continue an interrupted scrape from its last checkpoint.
+            retries: number of times a page that failed is fetched again before it is
+                skipped.
+            fetcher: PageFetcher to use instead of the one created from the options above.
         """
-        super(WikipediaScrapingStage, self).__init__(parent)
+        super(WikipediaScrapingStage, self).__init__(parent, min_num_tokens, concurrency,
+                                                     requests_per_second, api_url, batch_size,
+                                                     page_cache, page_cache_size, resume,
+                                                     retries, fetcher)
         self.search_query_file_path = join(constants.SQL_SCRIPTS_PATH, sparql_file)
-        self.min_num_tokens = min_num_tokens
 
     def pre_run(self):
         """The function that is executed before the stage is run.
@@ -81,11 +71,24 @@ class WikipediaScrapingStage(BaseStage):
         self.logger.info("Executing wikipedia scraping stage")
         self.logger.info("-" * 40)
 
-    def run(self):
-        """Scraps the articles from wikipedia.
+    def create_site(self):
+        """Creates the pywikibot site of english wikipedia.
+        """
+        return pywikibot.Site("en", "wikipedia")
+
+    def get_source(self):
+        """Returns the path to the query file, the source of the articles.
+        """
+        return self.search_query_file_path
+
+    def get_titles(self, fetcher):
+        """Queries wikidata for the articles to scrape.
+
+        Args:
+            fetcher: PageFetcher of the wiki.
 
         Returns:
-            True if the stage execution succeded, False otherwise.
+            A list of article titles.
         """
         self.logger.info("Querying wikidata for articles to scrape...")
         article_list = get_article_list(self.search_query_file_path)
@@ -97,17 +100,4 @@ class WikipediaScrapingStage(BaseStage):
                 label_key = key
                 break
 
-        site = pywikibot.Site("en", "wikipedia")
-        step_size = len(article_list) // 10
-        output_file_path = join(constants.TMP_PATH, "{}.raw.txt".format(self.parent.topic))
-        with open(output_file_path, "w") as output_file:
-            for i in range(len(article_list)):
-                output_file.write(scrape_article(site, article_list.iloc[i], label_key,
-                                                 self.min_num_tokens))
-                if i % step_size == step_size - 1:
-                    self.logger.info("Scraped {} articles out of {}".format(i+1, len(article_list)))
-
-        with open(output_file_path, "r") as output_file:
-            num_tokens = len(output_file.read().split(" "))
-            self.logger.info("Scraping finished. Output contains ~ {} tokens".format(num_tokens))
-        return True
+        return list(article_list[label_key])
@@ -0,0 +1,64 @@
+"""Single-pass normalization of cleaned text.
+
+Replaces years, numbers and section titles with special tokens and removes extra
+white-spaces in one scan. The result is the same as running these substitutions one after
+the other:
+
+    re.sub(' \\d{4}(\\-\\d+|s)?', ' <<year>>', text)
+    re.sub(' \\d[\\d\\.,%]*(st|nd|rd|th| %)?', ' <<number>>', text)
+    re.sub('<<number>>\\-[\\d\\.,%]+', '<<number>>', text)
+    re.sub('==+(.*?)==+', '<<section_title_start>> \\1 <<section_title_end>>', text)
+    re.sub('\\s\\s+', ' ', text)
+"""
+import re
+
+
+# Every alternative starts with a white-space, < or =, so the scan skips all other
+# characters quickly. The white-spaces in front of a year or a number are matched together
+# with it, so they are never collapsed before the space that the year or number needs.
+NORMALIZATION_PATTERN = re.compile(
+    r"\s(?=[\s\d])(?:(?P<year>(?:(?<= )|\s* )\d{4}(?:\-\d+|s)?)"
+    r"|(?P<number>(?:(?<= )|\s* )\d[\d\.,%]*(?:st|nd|rd|th| %)?(?:\-[\d\.,%]+)?)"
+    r"|(?P<spaces>\s+))"
+    r"|<(?P<number_range><number>>\-[\d\.,%]+)"
+    r"|=(?P<section>=+(?P<title>.*?)==+)")
+EDGE_SPACES_PATTERN = re.compile(r"^\s+|\s+$")
+
+REPLACEMENTS = {
+    "year": " <<year>>",
+    "number": " <<number>>",
+    "number_range": "<<number>>",
+    "spaces": " ",
+}
+
+
+def replace_match(match):
+    """Returns the replacement for 1 match of the normalization pattern.
+
+    Args:
+        match: re.Match of NORMALIZATION_PATTERN.
+
+    Returns:
+        String that replaces the match.
+    """
+    kind = match.lastgroup
+    if kind != "section":
+        return REPLACEMENTS[kind]
+
+    title = EDGE_SPACES_PATTERN.sub("", normalize_text(match.group("title")))
+    if not title:
+        return "<<section_title_start>> <<section_title_end>>"
+    return "<<section_title_start>> {} <<section_title_end>>".format(title)
+
+def normalize_text(text):
+    """Replaces years, numbers and section titles and removes extra white-spaces.
+
+    Works on any piece of cleaned text, e.g. 1 article or the whole corpus.
+
+    Args:
+        text: cleaned text.
+
+    Returns:
+        The normalized text.
+    """
+    return NORMALIZATION_PATTERN.sub(replace_match, text)
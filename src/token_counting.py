@@ -0,0 +1,175 @@
+"""Counting the tokens of corpus files that do not fit into memory.
+
+The file is read in chunks that are counted in worker processes. The counts of the chunks
+are merged in the order of the chunks, so the tokens keep the order they first appear in.
+When there are more distinct tokens than the memory budget allows, the counts are spilled
+to sorted run files and merged from the disk at the end.
+"""
+from corpus_io import read_token_chunks
+
+from collections import Counter, deque
+from multiprocessing import Pool
+
+import heapq
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+
+def count_chunk(chunk):
+    """Counts the tokens of 1 chunk.
+
+    Args:
+        chunk: string with space separated tokens.
+
+    Returns:
+        A list of (token, count) pairs in the order the tokens first appear.
+    """
+    return list(Counter(chunk.split(" ")).items())
+
+def write_run(entries, file_path):
+    """Helper function that writes sorted entries to a run file, 1 json list per line.
+
+    Args:
+        entries: an iterable of lists.
+        file_path: a path to the file.
+    """
+    with open(file_path, "w") as file:
+        for entry in entries:
+            file.write(json.dumps(entry))
+            file.write("\n")
+
+def read_run(file_path):
+    """Helper function that reads the entries of a run file.
+
+    Args:
+        file_path: a path to the file.
+
+    Yields:
+        The entries as lists.
+    """
+    with open(file_path, "r") as file:
+        for line in file:
+            yield json.loads(line)
+
+class TokenCounter:
+    """Merges the counts of chunks, spilling them to disk over the memory budget.
+
+    The counts are merged in the order of the chunks, so the insertion order of the counts
+    in memory is the order of first appearance. A spilled token keeps its position in that
+    order as a key, so the order survives the spills.
+    """
+
+    def __init__(self, max_entries=None, tmp_dir=None):
+        """Initialization for the token counter.
+
+        Args:
+            max_entries: maximum number of distinct tokens kept in memory, None for no limit.
+            tmp_dir: directory for the run files, the system default if None.
+        """
+        self.max_entries = max_entries
+        self.tmp_dir = tmp_dir
+        self.run_dir = None
+        self.runs = []
+        self.counts = {}
+        self.num_spilled = 0
+
+    def add(self, chunk_counts):
+        """Merges the counts of the next chunk.
+
+        Args:
+            chunk_counts: a list of (token, count) pairs in the order of first appearance.
+        """
+        counts = self.counts
+        get = counts.get
+        for token, count in chunk_counts:
+            counts[token] = get(token, 0) + count
+        if self.max_entries is not None and len(counts) > self.max_entries:
+            self.spill()
+
+    def spill(self):
+        """Writes the counts in memory to a run file sorted by token.
+        """
+        if self.run_dir is None:
+            self.run_dir = tempfile.mkdtemp(prefix="token_counts.", dir=self.tmp_dir)
+        file_path = os.path.join(self.run_dir, "run{}".format(len(self.runs)))
+        entries = [[token, count, self.num_spilled + key]
+                   for key, (token, count) in enumerate(self.counts.items())]
+        entries.sort()
+        write_run(entries, file_path)
+        self.runs.append(file_path)
+        self.num_spilled += len(entries)
+        self.counts = {}
+
+    def merge_runs(self):
+        """Merges the run files into the total counts of the tokens.
+
+        Yields:
+            [key, token, count] lists sorted by token.
+        """
+        entries = heapq.merge(*[read_run(file_path) for file_path in self.runs])
+        for token, group in itertools.groupby(entries, key=lambda entry: entry[0]):
+            group = list(group)
+            yield [min(entry[2] for entry in group), token, sum(entry[1] for entry in group)]
+
+    def items(self):
+        """Returns the total counts of the tokens.
+
+        Yields:
+            (token, count) pairs in the order the tokens first appear.
+        """
+        if not self.runs:
+            yield from self.counts.items()
+            return
+
+        try:
+            self.spill()
+            # The merged counts are sorted again by the first appearance, in runs that fit
+            # into the budget.
+            merged_runs = []
+            entries = self.merge_runs()
+            while True:
+                batch = sorted(itertools.islice(entries, self.max_entries))
+                if not batch:
+                    break
+                file_path = os.path.join(self.run_dir, "merged{}".format(len(merged_runs)))
+                write_run(batch, file_path)
+                merged_runs.append(file_path)
+            for _, token, count in heapq.merge(*[read_run(path) for path in merged_runs]):
+                yield token, count
+        finally:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+
+def count_tokens(file_path, workers=1, chunk_size=1 << 24, max_entries=None, tmp_dir=None):
+    """Counts the space separated tokens of a file.
+
+    The counts are the same as Counter(text.split(" ")) would give for the whole text.
+
+    Args:
+        file_path: a path to the file.
+        workers: number of processes counting the chunks.
+        chunk_size: number of characters in 1 chunk.
+        max_entries: maximum number of distinct tokens kept in memory, None for no limit.
+        tmp_dir: directory for the files of the spilled counts.
+
+    Yields:
+        (token, count) pairs in the order the tokens first appear.
+    """
+    counter = TokenCounter(max_entries, tmp_dir)
+    chunks = read_token_chunks(file_path, chunk_size)
+    if workers > 1:
+        with Pool(workers) as pool:
+            # Only a few chunks are read ahead, so the memory does not grow with the file.
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(count_chunk, (chunk,)))
+                if len(pending) > 2 * workers:
+                    counter.add(pending.popleft().get())
+            while pending:
+                counter.add(pending.popleft().get())
+    else:
+        for chunk in chunks:
+            counter.add(count_chunk(chunk))
+    yield from counter.items()
@@ -0,0 +1,218 @@
+"""Frequency analysis of a corpus on the counts of its distinct tokens.
+
+Every token of the corpus is replaced by the code of its distinct token, so the corpus is 1
+integer array and the normalizations run once per distinct token. The frequency tables are
+computed from the counts of the codes, and the files with 1 row per token are written by
+joining the rows of the distinct tokens.
+"""
+from corpus_io import read_token_chunks
+from numeric_corpus import ARTICLE_START
+
+import csv
+import io
+import string
+
+import numpy as np
+import pandas as pd
+
+
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+MARKERS = ['<<', '>>']
+
+def remove_unicode(token):
+    """Removes the characters of a token that are not ascii.
+    """
+    return token.encode("ascii", "ignore").decode()
+
+def strip_punctuation(token):
+    """Removes the punctuation of a token, unless it is a marker like <<article_start>>.
+    """
+    if any(marker in token for marker in MARKERS):
+        return token
+    return token.translate(PUNCTUATION_TABLE)
+
+def encode_tokens(file_path, chunk_size=1 << 24):
+    """Replaces the space separated tokens of a file by the codes of the distinct tokens.
+
+    Args:
+        file_path: a path to the file.
+        chunk_size: number of characters read from the file at once.
+
+    Returns:
+        A tuple of the list of the distinct tokens in the order they first appear and the
+        numpy int32 array with the code of every token, the index of its distinct token. The
+        tokens are the same as text.split(" ") of the whole text.
+    """
+    codes = {}
+    setdefault = codes.setdefault
+    chunk_codes = []
+    for chunk in read_token_chunks(file_path, chunk_size):
+        chunk_codes.append(np.array([setdefault(token, len(codes))
+                                     for token in chunk.split(" ")], dtype=np.int32))
+    return list(codes), np.concatenate(chunk_codes)
+
+def format_csv_rows(rows):
+    """Formats rows the same way as pandas.DataFrame.to_csv writes them.
+
+    Args:
+        rows: an iterable of lists of values.
+
+    Returns:
+        A numpy object array with the line of every row.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    lines = []
+    for row in rows:
+        writer.writerow(row)
+        lines.append(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+    return np.array(lines, dtype=object)
+
+def write_token_rows(file_path, header, lines, codes, chunk_size=1 << 20):
+    """Writes a csv file with 1 row per token from the rows of the distinct tokens.
+
+    Args:
+        file_path: a path to the file.
+        header: a list with the names of the columns.
+        lines: numpy object array with the line of every code.
+        codes: numpy array with the code of every token.
+        chunk_size: number of tokens joined at once.
+    """
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(format_csv_rows([header])[0])
+        for start in range(0, len(codes), chunk_size):
+            file.write("".join(lines[codes[start:start + chunk_size]].tolist()))
+
+def frequency_table(texts, counts):
+    """Builds the frequency table of texts, the same as sidetable's df.stb.freq(['text'])
+    on a DataFrame with 1 row per token.
+
+    Args:
+        texts: a list of distinct texts.
+        counts: numpy array with the number of tokens of every text.
+
+    Returns:
+        A DataFrame with the text, count, percent, cumulative_count and cumulative_percent
+        columns, sorted by the count and the text, descending.
+    """
+    table = pd.DataFrame({"text": pd.Series(texts, dtype="string"),
+                          "count": np.asarray(counts, dtype=np.int64)})
+    table = table[table["count"] > 0]
+    table = table.sort_values(["count", "text"], ascending=False).reset_index(drop=True)
+    total = table["count"].sum()
+    table["percent"] = (table["count"] / total) * 100
+    table["cumulative_count"] = table["count"].cumsum()
+    table["cumulative_percent"] = (table["cumulative_count"] / total) * 100
+    return table
+
+def get_article_lengths(start_positions):
+    """Computes the lengths of the articles from the positions of their start markers.
+
+    The token after a start marker always belongs to its article, even if it is a start
+    marker too. The last article is not counted, as it has no following start marker.
+
+    Args:
+        start_positions: sorted positions of the tokens containing <<article_start>>.
+
+    Returns:
+        A list with the number of tokens of every article.
+    """
+    starts = []
+    for position in start_positions:
+        if starts and position == starts[-1] + 1:
+            continue
+        starts.append(position)
+    return np.diff(np.array(starts, dtype=np.int64)).tolist()
+
+class TokenFrequencies:
+    """Normalized forms and counts of the distinct tokens of a corpus.
+    """
+
+    def __init__(self, tokens, codes, stop_words):
+        """Normalizes every distinct token and counts the cleaned texts.
+
+        The cleaned text of a token is its form without unicode characters and punctuation.
+        Empty texts and markers are dropped. The distinct tokens that do not occur in the
+        codes, e.g. the words of a shared vocabulary missing from a split, are dropped and the
+        codes renumbered, so they are not counted as texts of the corpus.
+
+        Args:
+            tokens: a list of the distinct tokens.
+            codes: numpy array with the index of the distinct token of every token.
+            stop_words: a list of stop words.
+        """
+        used = np.bincount(codes, minlength=len(tokens)) > 0
+        if not used.all():
+            tokens = [token for token, is_used in zip(tokens, used.tolist()) if is_used]
+            codes = (np.cumsum(used) - 1).astype(np.int32)[codes]
+        self.tokens = tokens
+        self.codes = codes
+        self.unicode_forms = [remove_unicode(token) for token in tokens]
+        self.punctuation_forms = [strip_punctuation(token) for token in self.unicode_forms]
+
+        text_ids = {}
+        code_text_ids = np.full(len(tokens), -1, dtype=np.int32)
+        for code, text in enumerate(self.punctuation_forms):
+            if text and "<<" not in text:
+                code_text_ids[code] = text_ids.setdefault(text, len(text_ids))
+        self.texts = list(text_ids)
+        token_text_ids = code_text_ids[codes]
+        self.text_ids = token_text_ids[token_text_ids >= 0]
+        self.text_counts = np.bincount(self.text_ids, minlength=len(self.texts))
+        stop_words = set(stop_words)
+        self.stop_flags = np.array([text in stop_words for text in self.texts], dtype=bool)
+
+    def cleaning_rows(self):
+        """Returns the lines of the cleaning summary of every code.
+        """
+        return format_csv_rows(zip(self.tokens, self.unicode_forms, self.punctuation_forms))
+
+    def cleaned_text_rows(self):
+        """Returns the lines of the cleaned text of every text id.
+        """
+        return format_csv_rows(zip(self.texts, self.stop_flags.tolist()))
+
+    def cleaned_text(self):
+        """Returns the cleaned text as a DataFrame with 1 row per token.
+
+        Returns:
+            A DataFrame with the text and stop_flag columns.
+        """
+        texts = np.array(self.texts, dtype=object)
+        return pd.DataFrame({"text": pd.Series(texts[self.text_ids], dtype="string"),
+                             "stop_flag": self.stop_flags[self.text_ids]})
+
+    def frequency_table(self, stop_flag=None):
+        """Builds the frequency table of the texts.
+
+        Args:
+            stop_flag: True for the stop words only, False for the other words only, None for
+                all words.
+
+        Returns:
+            A DataFrame like sidetable's df.stb.freq(['text']).
+        """
+        counts = self.text_counts
+        if stop_flag is not None:
+            counts = np.where(self.stop_flags == stop_flag, counts, 0)
+        return frequency_table(self.texts, counts)
+
+    def word_counts(self):
+        """Returns the counts of the words that are not stop words.
+
+        Returns:
+            A DataFrame with the text and count columns, sorted by the text.
+        """
+        keep = ~self.stop_flags
+        texts = pd.Series(np.array(self.texts, dtype=object)[keep], dtype="string")
+        counts = pd.DataFrame({"text": texts, "count": self.text_counts[keep]})
+        return counts.sort_values("text").reset_index(drop=True)
+
+    def article_lengths(self):
+        """Returns the lengths of the articles of the corpus, see get_article_lengths.
+        """
+        is_start = np.array([ARTICLE_START in text for text in self.punctuation_forms],
+                            dtype=bool)
+        return get_article_lengths(np.flatnonzero(is_start[self.codes]))
@@ -0,0 +1,53 @@
+"""Binary files with the token ids of a corpus.
+
+The ids are stored as a uint32 numpy array in the .npy format, whose header records the
+type and the number of ids. The files are opened with memory mapping, so loading a split
+does not copy it into memory.
+"""
+from os.path import splitext
+
+import numpy as np
+import os
+
+
+TOKEN_ID_DTYPE = np.uint32
+
+def get_token_ids_file_name(corpus_file, frequency_threshold=None):
+    """Helper function that names the token id file of a corpus file.
+
+    Args:
+        corpus_file: name of the corpus file, e.g. train.txt.
+        frequency_threshold: the threshold of the dictionary the ids belong to, if a
+            dictionary of a threshold was selected.
+
+    Returns:
+        The name of the token id file, e.g. train.npy, or train.3.npy for threshold 3.
+    """
+    if frequency_threshold is None:
+        return "{}.npy".format(splitext(corpus_file)[0])
+    return "{}.{}.npy".format(splitext(corpus_file)[0], frequency_threshold)
+
+def save_token_ids(token_ids, file_path):
+    """Helper function for saving token ids to file.
+
+    Args:
+        token_ids: an iterable of token ids.
+        file_path: a path to the file.
+    """
+    if not isinstance(token_ids, np.ndarray):
+        token_ids = np.fromiter(token_ids, dtype=TOKEN_ID_DTYPE)
+    tmp_file_path = "{}.tmp".format(file_path)
+    with open(tmp_file_path, "wb") as file:
+        np.save(file, token_ids.astype(TOKEN_ID_DTYPE, copy=False))
+    os.replace(tmp_file_path, file_path)
+
+def load_token_ids(file_path):
+    """Helper function for loading token ids from file without reading it into memory.
+
+    Args:
+        file_path: a path to the file.
+
+    Returns:
+        A read-only memory mapped numpy array of token ids.
+    """
+    return np.load(file_path, mmap_mode="r")
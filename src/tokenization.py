@@ -0,0 +1,102 @@
+"""Tokenizers used by the cleaning stages for splitting the articles into tokens.
+
+The nltk tokenizer is nltk.word_tokenize, which splits the text into sentences with Punkt and
+every sentence with the Treebank regexes. The regex tokenizer does the same in 1 pass of 1
+compiled regex over the article. It follows the Treebank rules and approximates the sentence
+splitting: a period that ends a word is split off unless the word looks like an abbreviation.
+"""
+from nltk.tokenize import word_tokenize
+
+import re
+
+
+# Splitting off the n't of "don't" and the 's, 'm, 'd, 'll, 're and 've of "it's" is only done
+# at the end of a word.
+CLITIC = r"(?i:n't|'s|'m|'d|'ll|'re|'ve)(?![\w'])"
+# Characters that are always tokens of their own.
+SYMBOLS = r"«»“”‘’„\u2012-\u2015;@#$%&*?!()\[\]{}<>"
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ellipsis>\.{{2,}})
+  | (?P<quote>"|'')
+  | ``|`
+  | --
+  | [{symbols}]
+  | (?P<clitic>{clitic})
+  | (?P<word>
+        (?:[^\s{symbols}"'`.,:-]|[.,:](?=\d)|\.(?=\w)|-(?!-))
+        (?:(?!{clitic})(?:[^\s{symbols}"'`.,:-]|[.,:](?=\d)|\.(?=\w)|-(?!-)|'(?=\w)))*
+    )
+    (?P<period>\.(?!\.))?
+  | \S
+""".format(clitic=CLITIC, symbols=SYMBOLS), re.VERBOSE)
+# What follows the period at the end of a sentence.
+SENTENCE_END_PATTERN = re.compile(r"[\]\)}>\"'”’»]*(?:\s|$)")
+# A sentence does not end with a number followed by a lower case word, as in "1. item".
+LOWER_CASE_WORD_PATTERN = re.compile(r"\s+[a-z]")
+
+# Words that keep their period, like the abbreviations of the English Punkt model.
+ABBREVIATIONS = set([
+    "mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "rev", "gen", "col", "lt", "sgt",
+    "capt", "gov", "sen", "rep", "inc", "ltd", "co", "corp", "bros", "vs", "etc", "al", "cf",
+    "approx", "no", "vol", "pp", "ed", "eds", "fig", "est", "dept", "univ", "ft", "mt",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+])
+
+# Words the Treebank tokenizer splits in two.
+CONTRACTIONS = {
+    "cannot": 3, "gimme": 3, "gonna": 3, "gotta": 3, "lemme": 3, "wanna": 3,
+}
+
+def regex_tokenize(text):
+    """Tokenizes a text the way nltk.word_tokenize would, in 1 pass over the text.
+
+    Args:
+        text: the text to tokenize.
+
+    Returns:
+        A list of tokens.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        word = match.group("word")
+        if word is not None:
+            period = match.group("period") is not None
+            if period and ((len(word) == 1 and word.isalpha()) or "." in word
+                           or word.lower() in ABBREVIATIONS
+                           or not SENTENCE_END_PATTERN.match(text, match.end())
+                           or (word.isdigit()
+                               and LOWER_CASE_WORD_PATTERN.match(text, match.end()))):
+                word += "."
+                period = False
+            split = CONTRACTIONS.get(word.lower())
+            if split is not None:
+                tokens.append(word[:split])
+                word = word[split:]
+            tokens.append(word)
+            if period:
+                tokens.append(".")
+        elif match.group("quote") is not None:
+            start = match.start()
+            tokens.append("``" if start == 0 or text[start - 1] in " ([{<" else "''")
+        else:
+            tokens.append(match.group())
+    return tokens
+
+TOKENIZERS = {
+    "nltk": word_tokenize,
+    "regex": regex_tokenize,
+}
+
+def get_tokenizer(name):
+    """Helper function that returns a tokenizer by its name.
+
+    Args:
+        name: nltk for nltk.word_tokenize, regex for the faster regex tokenizer.
+
+    Returns:
+        A function that splits a text into a list of tokens.
+    """
+    if name not in TOKENIZERS:
+        raise LookupError("There is no tokenizer with the {} name.".format(name))
+    return TOKENIZERS[name]
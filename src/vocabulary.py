@@ -0,0 +1,225 @@
+"""Binary vocabulary files that are memory mapped instead of parsed.
+
+Layout of the file, all numbers little endian and all arrays aligned to 8 bytes:
+
+    header      magic (8 bytes), number of tokens n, size of the token blob
+    offsets     uint64[n + 1], where every token starts in the blob
+    ids         uint32[n], the id of every token
+    hashes      uint64[n], the hashes of the tokens, sorted
+    positions   uint32[n], the position of the token of every hash
+    blob        the utf-8 bytes of the tokens, sorted bytewise
+
+A lookup finds the hashes of the tokens with a vectorized binary search and checks that the
+tokens at the positions of the hashes are the tokens that were looked up.
+"""
+from token_ids import TOKEN_ID_DTYPE
+
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+
+MAGIC = b"NLPVOCAB"
+HEADER = struct.Struct("<8sQQ")
+
+def hash_token(token_bytes):
+    """Helper function that hashes a token, the same way in every process.
+
+    Args:
+        token_bytes: the utf-8 bytes of the token.
+
+    Returns:
+        A 64 bit hash of the token.
+    """
+    return zlib.crc32(token_bytes) << 32 | zlib.adler32(token_bytes)
+
+def write_array(file, array, dtype):
+    """Helper function that writes an array to a file, padded to a multiple of 8 bytes.
+    """
+    data = np.asarray(array).astype(dtype).tobytes()
+    file.write(data)
+    file.write(b"\0" * (-len(data) % 8))
+
+def save_vocabulary(dictionary, file_path):
+    """Saves a dictionary in the binary vocabulary format.
+
+    Args:
+        dictionary: token to number mapping.
+        file_path: a path to the file.
+    """
+    entries = sorted((token.encode("utf-8"), id) for token, id in dictionary.items())
+    offsets = np.zeros(len(entries) + 1, dtype=np.uint64)
+    np.cumsum([len(token_bytes) for token_bytes, _ in entries], out=offsets[1:])
+    hashes = np.array([hash_token(token_bytes) for token_bytes, _ in entries], dtype=np.uint64)
+    positions = np.argsort(hashes, kind="stable")
+    blob = b"".join([token_bytes for token_bytes, _ in entries])
+
+    tmp_file_path = "{}.tmp".format(file_path)
+    with open(tmp_file_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(entries), len(blob)))
+        write_array(file, offsets, "<u8")
+        write_array(file, [id for _, id in entries], "<u4")
+        write_array(file, hashes[positions], "<u8")
+        write_array(file, positions, "<u4")
+        file.write(blob)
+    os.replace(tmp_file_path, file_path)
+
+def order_by_frequency(dictionary, counts, unknown_token="<<unk>>"):
+    """Renumbers a dictionary so that the most frequent tokens get the smallest ids.
+
+    Args:
+        dictionary: token to number mapping.
+        counts: an iterable of (token, count) pairs.
+        unknown_token: the token that keeps the last id.
+
+    Returns:
+        Token to number mapping ordered by decreasing count, ties keep their old order.
+    """
+    counts = dict((token, count) for token, count in counts if token in dictionary)
+    tokens = sorted([token for token in dictionary if token != unknown_token],
+                    key=lambda token: (-counts.get(token, 0), dictionary[token]))
+    ordered = dict((token, id) for id, token in enumerate(tokens))
+    if unknown_token in dictionary:
+        ordered[unknown_token] = len(ordered)
+    return ordered
+
+def convert_dictionary_file(json_file_path, file_path, counts=None):
+    """Converts a json dictionary file to the binary vocabulary format.
+
+    Args:
+        json_file_path: a path to the json dictionary.
+        file_path: a path to the binary vocabulary file.
+        counts: an iterable of (token, count) pairs, to order the ids by frequency.
+    """
+    with open(json_file_path) as file:
+        dictionary = json.loads(file.read())
+    if counts is not None:
+        dictionary = order_by_frequency(dictionary, counts)
+    save_vocabulary(dictionary, file_path)
+
+class Vocabulary:
+    """Read-only token to number mapping backed by a memory mapped vocabulary file.
+    """
+
+    def __init__(self, file_path):
+        """Initialization for the vocabulary.
+
+        Args:
+            file_path: a path to the binary vocabulary file.
+        """
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            magic, size, blob_size = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("{} is not a vocabulary file.".format(file_path))
+        self.size = size
+
+        self.offset = HEADER.size
+        self.offsets = self.map_array("<u8", size + 1)
+        self.ids = self.map_array("<u4", size)
+        self.hashes = self.map_array("<u8", size)
+        self.positions = self.map_array("<u4", size)
+        self.blob = self.map_array(np.uint8, blob_size)
+
+    def map_array(self, dtype, length):
+        """Memory maps the next array of the file.
+
+        Args:
+            dtype: the type of the array.
+            length: the number of items in the array.
+
+        Returns:
+            A read-only numpy array.
+        """
+        dtype = np.dtype(dtype)
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        array = np.memmap(self.file_path, dtype=dtype, mode="r", offset=self.offset,
+                          shape=(length,))
+        self.offset += length * dtype.itemsize + (-length * dtype.itemsize % 8)
+        return array
+
+    def __reduce__(self):
+        return (Vocabulary, (self.file_path,))
+
+    def __len__(self):
+        return self.size
+
+    def token_bytes(self, position):
+        """Returns the utf-8 bytes of the token at the given position of the sorted tokens.
+        """
+        return self.blob[int(self.offsets[position]):int(self.offsets[position + 1])].tobytes()
+
+    def tokens(self):
+        """Returns the tokens of the vocabulary in the order of their ids.
+
+        Returns:
+            A list of tokens, the token with id i at index i. Ids missing from the vocabulary
+            have None.
+        """
+        blob = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        tokens = [None] * (int(self.ids.max()) + 1 if self.size else 0)
+        for position, id in enumerate(self.ids.tolist()):
+            tokens[id] = blob[offsets[position]:offsets[position + 1]].decode("utf-8")
+        return tokens
+
+    def get(self, token, default=None):
+        """Returns the id of a token, default if it is not in the vocabulary.
+        """
+        id = int(self.lookup([token])[0])
+        return id if id >= 0 else default
+
+    def __getitem__(self, token):
+        id = self.get(token)
+        if id is None:
+            raise KeyError(token)
+        return id
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def lookup(self, tokens, default=-1):
+        """Returns the ids of many tokens at once.
+
+        Args:
+            tokens: a sequence of tokens.
+            default: the id of the tokens that are not in the vocabulary.
+
+        Returns:
+            A numpy int64 array with the ids.
+        """
+        token_bytes = [token.encode("utf-8") for token in tokens]
+        hashes = np.array([hash_token(b) for b in token_bytes], dtype=np.uint64)
+        starts = np.searchsorted(self.hashes, hashes, side="left")
+        ends = np.searchsorted(self.hashes, hashes, side="right")
+        ids = np.full(len(token_bytes), default, dtype=np.int64)
+
+        # Compares the looked up tokens with the first token of their hash, byte by byte.
+        found = np.flatnonzero(ends > starts)
+        positions = self.positions[starts[found]].astype(np.int64)
+        lengths = np.array([len(b) for b in token_bytes], dtype=np.int64)[found]
+        vocabulary_starts = self.offsets[positions].astype(np.int64)
+        matches = self.offsets[positions + 1].astype(np.int64) - vocabulary_starts == lengths
+        compared = np.flatnonzero(matches & (lengths > 0))
+        if len(compared):
+            query_blob = np.frombuffer(b"".join([token_bytes[i] for i in found[compared]]),
+                                       dtype=np.uint8)
+            query_starts = np.cumsum(lengths[compared]) - lengths[compared]
+            shifts = np.repeat(vocabulary_starts[compared] - query_starts, lengths[compared])
+            mismatches = self.blob[np.arange(len(query_blob)) + shifts] != query_blob
+            matches[compared] = np.add.reduceat(mismatches, query_starts) == 0
+        ids[found[matches]] = self.ids[positions[matches]]
+
+        # Tokens whose hash is shared by several tokens are checked one by one.
+        unmatched = np.ones(len(token_bytes), dtype=bool)
+        unmatched[found[matches]] = False
+        for i in np.flatnonzero((ends - starts > 1) & unmatched):
+            for position in self.positions[starts[i]:ends[i]]:
+                if self.token_bytes(position) == token_bytes[i]:
+                    ids[i] = self.ids[position]
+                    break
+        return ids
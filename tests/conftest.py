@@ -0,0 +1,4 @@
+import sys
+from os.path import dirname, join
+
+sys.path.insert(0, join(dirname(dirname(__file__)), "src"))
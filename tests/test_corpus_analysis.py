@@ -0,0 +1,148 @@
+"""Tests of the corpus analysis stage against the analysis of a DataFrame with 1 row per token.
+"""
+from numeric_corpus import ARTICLE_START, NumericCorpus, encode_corpus, get_article_offsets
+from stage_corpus_analysis import CorpusAnalysisStage
+from token_frequencies import remove_unicode, strip_punctuation
+
+import constants
+import stage_corpus_analysis
+
+from collections import deque
+from os.path import join
+
+import logging
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+import sidetable
+
+
+matplotlib.use("Agg")
+
+STOP_WORDS = ["the", "and", "of", "a", "is", "wa"]
+WORDS = ["the", "and", "of", "a", "is", "wa", "capital", "city", "river", "France",
+         "Paris", "country's", "north-east", "(population)", "1,000", "café", "naïve",
+         "Zürich", "--", ",", ".", "", "<<unk>>", "x<<y", "mountain", "mountains"]
+# Words that only occur in the articles that are not in the train split.
+OTHER_WORDS = ["lake", "Genève", "valley"]
+CSV_FILES = ["1_cleaning_summary.csv", "2_raw_text_summary.csv", "3_stop_text_summary.csv",
+             "4_cleaned_text_summary.csv", "5_cleaned_text.csv", "6_text_frequency_t10.csv"]
+
+class Parent:
+    topic = "test"
+
+class FakeStopwords:
+    def words(self, language):
+        return list(STOP_WORDS)
+
+def analyze_dataframe(tokens, output_prefix, stop_words):
+    """The analysis of the stage before it worked on the counts of the distinct tokens.
+
+    Returns:
+        A tuple of the statistics, the DataFrame with the counts of the words that are not
+        stop words and the list of the lengths of the articles.
+    """
+    df = pd.DataFrame(tokens, columns=['text_orig'])
+    df['text_strp_unicode'] = df['text_orig'].apply(lambda x: remove_unicode(x))
+    df['text_strp_punct'] = df['text_strp_unicode'].apply(lambda x: strip_punctuation(x))
+    df_corpus = df[['text_strp_punct']].copy()
+    df.to_csv(output_prefix + '1_cleaning_summary.csv', index=False)
+
+    df['text_strp_punct'] = df['text_strp_punct'].replace('', np.nan)
+    df = df[['text_strp_punct']].dropna()
+    df = df[~df['text_strp_punct'].str.contains("<<")]
+    df['text_strp_punct'] = df['text_strp_punct'].astype('string')
+    df.rename(columns={'text_strp_punct': 'text'}, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    df.stb.freq(['text']).to_csv(output_prefix + '2_raw_text_summary.csv', index=False)
+
+    df['stop_flag'] = df[['text']].isin(stop_words).any(axis=1)
+    stops = df[df['stop_flag'] == True].reset_index(drop=True).drop(columns='stop_flag')
+    stops.stb.freq(['text']).to_csv(output_prefix + '3_stop_text_summary.csv', index=False)
+
+    summary_4 = df[df['stop_flag'] == False].reset_index(drop=True).drop(columns='stop_flag')
+    summary_4.stb.freq(['text']).to_csv(output_prefix + '4_cleaned_text_summary.csv',
+                                        index=False)
+    df.to_csv(output_prefix + '5_cleaned_text.csv', index=False)
+    df.to_pickle(output_prefix + '5_cleaned_text.pickle', protocol=2)
+
+    stats_dict = {"unique_words_bf_stop": len(df['text'].unique())}
+    df = df[df['stop_flag'] == False].reset_index(drop=True).drop(columns='stop_flag')
+    stats_dict.update({"unique_words_af_stop": len(df['text'].unique())})
+    df.stb.freq(['text'])[:10].to_csv(output_prefix + '6_text_frequency_t10.csv', index=False)
+    df = df.groupby(['text'])['text'].agg('count').reset_index(name='count')
+
+    corpus_text = deque(df_corpus['text_strp_punct'].values)
+    corpus_dict = {}
+    counter = 0
+    accu = []
+    while corpus_text:
+        curr = corpus_text.popleft()
+        if ARTICLE_START in curr:
+            if accu:
+                counter += 1
+                corpus_dict.update({counter: (accu)})
+            accu = [curr]
+            curr = corpus_text.popleft()
+        if accu:
+            accu.append(curr)
+    article_lengths = [len(value) for key, value in corpus_dict.items()]
+    return stats_dict, df, article_lengths
+
+@pytest.fixture
+def corpus_dir(tmp_path, monkeypatch):
+    for name in ["TMP_PATH", "OUTPUT_PATH", "DATA_PATH"]:
+        monkeypatch.setattr(constants, name, str(tmp_path))
+    rng = np.random.default_rng(0)
+    articles = []
+    for i in range(30):
+        words = WORDS + OTHER_WORDS if i >= 20 else WORDS
+        tokens = [words[index] for index in rng.integers(0, len(words), rng.integers(1, 40))]
+        # An article starting right after an empty one has 2 start markers in a row.
+        articles.append([ARTICLE_START] + ([ARTICLE_START] if i == 10 else []) + tokens)
+    with open(join(str(tmp_path), "test.clean.txt"), "w") as file:
+        file.write(" ".join([token for article in articles for token in article]))
+    with open(join(str(tmp_path), "test.train.txt"), "w") as file:
+        file.write(" ".join([token for article in articles[:20] for token in article]))
+
+    clean = encode_corpus(join(str(tmp_path), "test.clean.txt"), "test", "clean")
+    train_ids = np.array(clean.token_ids[:sum([len(article) for article in articles[:20]])])
+    NumericCorpus("test", "train").save(train_ids, get_article_offsets(
+        train_ids, clean.vocabulary.get(ARTICLE_START)))
+    return str(tmp_path)
+
+@pytest.mark.parametrize("numeric_corpus", [False, True])
+def test_analysis_of_the_counts(corpus_dir, numeric_corpus):
+    stage = CorpusAnalysisStage(Parent(), "train.txt", numeric_corpus=numeric_corpus)
+    with open(join(corpus_dir, "test.train.txt")) as file:
+        tokens = file.read().split(" ")
+    stats_dict, word_counts, article_lengths = stage.analyze_counts(
+        join(corpus_dir, "test.train.txt"), join(corpus_dir, "counts."), STOP_WORDS)
+    expected_stats, expected_counts, expected_lengths = analyze_dataframe(
+        tokens, join(corpus_dir, "dataframe."), STOP_WORDS)
+
+    assert stats_dict == expected_stats
+    pd.testing.assert_frame_equal(word_counts, expected_counts, check_dtype=False)
+    assert article_lengths == expected_lengths
+    assert not set(OTHER_WORDS) & set(word_counts["text"].tolist())
+    for csv_file in CSV_FILES:
+        with open(join(corpus_dir, "counts." + csv_file)) as file, \
+                open(join(corpus_dir, "dataframe." + csv_file)) as expected_file:
+            assert file.read() == expected_file.read(), csv_file
+    pd.testing.assert_frame_equal(pd.read_pickle(join(corpus_dir, "counts.5_cleaned_text.pickle")),
+                                  pd.read_pickle(join(corpus_dir,
+                                                      "dataframe.5_cleaned_text.pickle")))
+
+@pytest.mark.parametrize("numeric_corpus", [False, True])
+def test_stage_run(corpus_dir, numeric_corpus, monkeypatch, caplog):
+    monkeypatch.setattr(stage_corpus_analysis, "stopwords", FakeStopwords())
+    with open(join(corpus_dir, "test.train.txt")) as file:
+        tokens = file.read().split(" ")
+    _, _, article_lengths = analyze_dataframe(tokens, join(corpus_dir, "dataframe."),
+                                              STOP_WORDS)
+    with caplog.at_level(logging.INFO, logger="pipeline"):
+        assert CorpusAnalysisStage(Parent(), "train.txt", numeric_corpus=numeric_corpus).run()
+    assert "'total_articles': {}".format(len(article_lengths)) in caplog.text
@@ -0,0 +1,64 @@
+"""Tests of the wikipedia dump ingestion stage on a small generated dump.
+"""
+from stage_wikipedia_dump_ingestion import WikipediaDumpIngestionStage
+
+import constants
+
+from os.path import join
+from xml.sax.saxutils import escape
+
+import bz2
+import logging
+
+import pytest
+
+
+HEADER = ('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">\n'
+          '<siteinfo><sitename>Wikipedia</sitename></siteinfo>\n')
+
+class Parent:
+    topic = "test"
+
+def page_xml(page_id, title, text, redirect=False):
+    return ("<page><title>{}</title><ns>0</ns><id>{}</id>{}<revision><id>{}</id>"
+            "<text>{}</text></revision></page>\n").format(
+                escape(title), page_id, "<redirect />" if redirect else "", page_id,
+                escape(text))
+
+@pytest.fixture
+def dump_dir(tmp_path):
+    pages = []
+    for i in range(30):
+        text = " ".join(["word{}".format(j) for j in range(i * 3)]) + "  end\nline"
+        pages.append(("Page {}".format(i), text, i % 7 == 0))
+    xml = [page_xml(i + 1, *page) for i, page in enumerate(pages)]
+    with open(join(str(tmp_path), "single.xml.bz2"), "wb") as file:
+        file.write(bz2.compress((HEADER + "".join(xml) + "</mediawiki>\n").encode("utf-8")))
+
+    data = bz2.compress(HEADER.encode("utf-8"))
+    index = []
+    for start in range(0, len(xml), 8):
+        for i in range(start, min(start + 8, len(xml))):
+            index.append("{}:{}:{}".format(len(data), i + 1, pages[i][0]))
+        data += bz2.compress("".join(xml[start:start + 8]).encode("utf-8"))
+    data += bz2.compress(b"</mediawiki>\n")
+    with open(join(str(tmp_path), "multi.xml.bz2"), "wb") as file:
+        file.write(data)
+    with open(join(str(tmp_path), "multi-index.txt.bz2"), "wb") as file:
+        file.write(bz2.compress(("\n".join(index) + "\n").encode("utf-8")))
+    return str(tmp_path)
+
+@pytest.mark.parametrize("options", [{"dump_file": "single.xml.bz2"},
+                                     {"dump_file": "multi.xml.bz2",
+                                      "index_file": "multi-index.txt.bz2"}])
+def test_token_count_of_the_output(dump_dir, options, monkeypatch, caplog):
+    monkeypatch.setattr(constants, "DATA_PATH", dump_dir)
+    monkeypatch.setattr(constants, "TMP_PATH", dump_dir)
+    stage = WikipediaDumpIngestionStage(Parent(), min_num_tokens=20, **options)
+    with caplog.at_level(logging.INFO, logger="pipeline"):
+        assert stage.run()
+
+    with open(join(dump_dir, "test.raw.txt")) as file:
+        text = file.read()
+    assert text.count("<<article_start>>") == 20
+    assert "Output contains ~ {} tokens".format(len(text.split(" "))) in caplog.text
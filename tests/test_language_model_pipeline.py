@@ -0,0 +1,76 @@
+"""Tests of the dictionary, apply dictionary and srilm model stages run together.
+"""
+from ngram_scoring import NgramScorer, get_model_paths
+from stage_apply_dictionary import ApplyDictionaryStage
+from stage_dictionary_creation import DictionaryCreationStage
+from stage_srilm_model import SRILMModelStage, get_unknown_id
+from token_ids import load_token_ids
+
+import constants
+
+from os.path import exists, join
+
+import logging
+import os
+import re
+
+import numpy as np
+import pytest
+
+
+SPLITS = ["train.txt", "test.txt", "valid.txt"]
+
+class Parent:
+    topic = "test"
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(constants, "TMP_PATH", str(tmp_path))
+    rng = np.random.default_rng(0)
+    for corpus_file, num_tokens in zip(SPLITS, [5000, 1000, 1000]):
+        words = rng.zipf(1.5, num_tokens) % 500
+        with open(join(str(tmp_path), "test.{}".format(corpus_file)), "w") as file:
+            file.write(" ".join(["w{}".format(word) for word in words]))
+    return str(tmp_path)
+
+def test_stages_of_several_thresholds(data_dir, caplog):
+    with caplog.at_level(logging.INFO, logger="pipeline"):
+        assert DictionaryCreationStage(Parent(), "train.txt", frequency_threshold=[0, 3]).run()
+        for threshold in [0, 3]:
+            assert ApplyDictionaryStage(Parent(), corpus_files=SPLITS,
+                                        frequency_threshold=threshold).run()
+        assert SRILMModelStage(Parent(), ngram=3, arpa=True, frequency_threshold=3).run()
+
+    # Every threshold keeps its own token ids.
+    for split in ["train", "test", "valid"]:
+        ids = [load_token_ids(join(data_dir, "test.{}.{}.npy".format(split, threshold)))
+               for threshold in [0, 3]]
+        assert len(ids[0]) == len(ids[1])
+    assert not exists(join(data_dir, "test.train.npy"))
+
+    # The model counts the tokens the threshold 3 dictionary changed to <<unk>> as OOV.
+    num_changed = int(re.findall(r"test.txt: \d+ tokens, changed (\d+) tokens",
+                                 caplog.text)[-1])
+    num_oov = int(re.search(r"test: perplexity .*\((\d+) of \d+ tokens\)", caplog.text)
+                  .group(1))
+    assert num_changed > 0
+    assert num_oov == num_changed
+    assert exists(join(data_dir, "test.3gram.3.arpa"))
+
+    scorer = NgramScorer(*get_model_paths("test", 3, 3))
+    result = scorer.score(["w1 w2 w3 unknownword"])[0]
+    assert result["num_tokens"] == 4 and result["num_oov"] == 1
+
+def test_missing_dictionary(data_dir, caplog):
+    assert DictionaryCreationStage(Parent(), "train.txt", frequency_threshold=[0, 3]).run()
+    assert ApplyDictionaryStage(Parent(), corpus_files=SPLITS, frequency_threshold=3).run()
+    assert get_unknown_id(join(data_dir, "test.dictionary.3.json")) is not None
+    os.remove(join(data_dir, "test.dictionary.3.json"))
+
+    # The token ids exist, but the unknown token cannot be found without the dictionary.
+    with pytest.raises(FileNotFoundError):
+        get_unknown_id(join(data_dir, "test.dictionary.3.json"))
+    with caplog.at_level(logging.INFO, logger="pipeline"):
+        assert not SRILMModelStage(Parent(), ngram=2, frequency_threshold=3).run()
+    assert "There is no dictionary" in caplog.text
@@ -0,0 +1,53 @@
+"""Tests of reading and writing n-gram models in the ARPA format.
+"""
+from ngram_counting import count_ngrams, get_bits_per_id
+from ngram_model import read_arpa, train_kneser_ney, write_arpa
+from token_ids import save_token_ids
+
+from os.path import join
+
+import re
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def model(tmp_path):
+    rng = np.random.default_rng(0)
+    token_ids = (rng.zipf(1.3, 20000) % 300).astype(np.int64)
+    file_path = str(tmp_path / "train.npy")
+    save_token_ids(token_ids, file_path)
+    bits = get_bits_per_id(300)
+    return train_kneser_ney(count_ngrams(file_path, 3, bits), bits, 300)
+
+@pytest.mark.parametrize("chunk_size", [1 << 20, 1000, 7])
+def test_read_arpa_round_trip(model, tmp_path, chunk_size):
+    tokens = ["w{}".format(id) for id in range(model.vocabulary_size)]
+    file_path = join(str(tmp_path), "model.arpa")
+    write_arpa(model, tokens, file_path)
+    dictionary = dict([(token, id) for id, token in enumerate(tokens)])
+
+    read_model, read_tokens = read_arpa(file_path, dictionary, chunk_size)
+
+    assert read_model.bits == model.bits
+    assert read_tokens == tokens
+    for order in range(model.order):
+        np.testing.assert_array_equal(read_model.keys[order], model.keys[order])
+        np.testing.assert_allclose(read_model.log_probs[order], model.log_probs[order],
+                                   rtol=1e-6)
+        np.testing.assert_allclose(read_model.backoffs[order], model.backoffs[order],
+                                   rtol=1e-6, atol=1e-7)
+
+def test_read_arpa_missing_words(model, tmp_path):
+    file_path = join(str(tmp_path), "model.arpa")
+    write_arpa(model, ["w{}".format(id) for id in range(model.vocabulary_size)], file_path)
+    with open(file_path) as file:
+        text = file.read()
+    # The first word of the first bigram is not a unigram of the model.
+    text = re.sub(r"(\\2-grams:\n[^\t]*\t)\S+", r"\1missing", text, count=1)
+    with open(file_path, "w") as file:
+        file.write(text)
+
+    with pytest.raises(ValueError):
+        read_arpa(file_path, chunk_size=5)
@@ -0,0 +1,51 @@
+"""Tests of the on-disk page cache.
+"""
+from page_cache import PageCache
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import sqlite3
+
+import pytest
+
+
+def test_get_returns_current_revision(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put("site", "a", 1, "text a")
+    assert cache.get("site", "a", 1) == "text a"
+    assert cache.get("site", "a", 2) is None
+    assert cache.get("site", "b", 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_missing_text_file_is_a_miss(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put("site", "a", 1, "text a")
+    digest = cache.connection.execute("SELECT digest FROM pages").fetchone()[0]
+    os.remove(cache.text_path(digest))
+    assert cache.get("site", "a", 1) is None
+    assert cache.misses == 1
+
+def test_concurrent_gets_and_evicting_puts(tmp_path):
+    # The cache only holds a few pages, so most puts evict pages other threads read.
+    cache = PageCache(str(tmp_path), max_size=200)
+
+    def work(i):
+        title = "page{}".format(i % 20)
+        text = "{} ".format(title) * 5
+        cache.put("site", title, 1, text)
+        for j in range(20):
+            other = "page{}".format(j)
+            assert cache.get("site", other, 1) in [None, "{} ".format(other) * 5]
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(work, range(400)))
+    assert cache.size <= 200
+
+def test_context_manager_closes_the_index(tmp_path):
+    with PageCache(str(tmp_path)) as cache:
+        cache.put("site", "a", 1, "text a")
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.connection.execute("SELECT 1")
+    with PageCache(str(tmp_path)) as cache:
+        assert cache.get("site", "a", 1) == "text a"
@@ -0,0 +1,120 @@
+"""Failure handling of the scraping stages.
+"""
+from page_cache import PageCache
+from page_fetcher import PageFetcher
+from scraping_checkpoint import ScrapingCheckpoint
+
+import constants
+import stage_fandom_wiki_scraping
+import stage_wikipedia_scraping
+
+from collections import Counter
+from os.path import exists, join
+
+import json
+import sqlite3
+
+import pytest
+
+
+TITLES = ["t{}".format(i) for i in range(10)]
+
+class Parent:
+    topic = "test"
+
+class FlakyFetcher(PageFetcher):
+    """Fetcher whose batch requests fail, and whose single requests fail for some titles.
+    """
+
+    def __init__(self, failing_titles=()):
+        super(FlakyFetcher, self).__init__("test")
+        self.failing_titles = set(failing_titles)
+        self.num_attempts = Counter()
+
+    def fetch_many(self, titles, min_length=0):
+        if len(titles) > 1:
+            raise ConnectionError("batch request failed")
+        return super(FlakyFetcher, self).fetch_many(titles, min_length)
+
+    def category_members(self, category):
+        return [{"ns": 0, "title": title} for title in TITLES]
+
+    def fetch_page(self, title):
+        self.num_attempts[title] += 1
+        if title in self.failing_titles:
+            raise ConnectionError("request failed")
+        return " ".join([title] * 10)
+
+
+def create_stage(module, fetcher, monkeypatch, batch_size=2):
+    if module is stage_wikipedia_scraping:
+        monkeypatch.setattr(module, "get_article_list", lambda file_path: {"itemLabel.value":
+                                                                             TITLES})
+        stage = module.WikipediaScrapingStage(Parent(), min_num_tokens=5,
+                                              batch_size=batch_size, fetcher=fetcher)
+    else:
+        stage = module.FandomWikiScrapingStage(Parent(), min_num_tokens=5,
+                                               batch_size=batch_size, fetcher=fetcher)
+    return stage
+
+def read_titles(output_file_path):
+    with open(output_file_path) as file:
+        return [article.split(" ")[1] for article in file.read().splitlines()]
+
+@pytest.mark.parametrize("module", [stage_wikipedia_scraping, stage_fandom_wiki_scraping])
+def test_failed_batch_is_fetched_one_by_one(module, monkeypatch):
+    stage = create_stage(module, None, monkeypatch)
+    articles = stage.scrape_articles(FlakyFetcher(), ["a", "b", "c"])
+    assert articles.count("<<article_start>>") == 3
+
+@pytest.mark.parametrize("module", [stage_wikipedia_scraping, stage_fandom_wiki_scraping])
+def test_failed_page_is_retried_and_skipped(module, monkeypatch):
+    stage = create_stage(module, None, monkeypatch)
+    fetcher = FlakyFetcher(["b"])
+    articles = stage.scrape_articles(fetcher, ["a", "b", "c"])
+    assert [article.split(" ")[1] for article in articles.splitlines()] == ["a", "c"]
+    assert fetcher.num_attempts["b"] == stage.retries + 1
+
+@pytest.mark.parametrize("module", [stage_wikipedia_scraping, stage_fandom_wiki_scraping])
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_scrape_skips_a_page_that_always_fails(module, batch_size, tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "TMP_PATH", str(tmp_path))
+    output_file_path = join(str(tmp_path), "test.raw.txt")
+
+    assert create_stage(module, FlakyFetcher(["t5"]), monkeypatch, batch_size).run()
+    assert read_titles(output_file_path) == [title for title in TITLES if title != "t5"]
+    assert not exists("{}.checkpoint.json".format(output_file_path))
+
+@pytest.mark.parametrize("module", [stage_wikipedia_scraping, stage_fandom_wiki_scraping])
+def test_stopped_scrape_resumes_at_the_checkpoint(module, tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "TMP_PATH", str(tmp_path))
+    output_file_path = join(str(tmp_path), "test.raw.txt")
+    save = ScrapingCheckpoint.save
+    num_saves = [0]
+
+    def failing_save(checkpoint, num_rows, output_file):
+        num_saves[0] += 1
+        if num_saves[0] > 2:
+            raise OSError("disk full")
+        save(checkpoint, num_rows, output_file)
+
+    monkeypatch.setattr(ScrapingCheckpoint, "save", failing_save)
+    assert not create_stage(module, FlakyFetcher(), monkeypatch).run()
+    with open("{}.checkpoint.json".format(output_file_path)) as file:
+        assert json.loads(file.read())["num_rows"] == 4
+
+    monkeypatch.setattr(ScrapingCheckpoint, "save", save)
+    assert create_stage(module, FlakyFetcher(), monkeypatch).run()
+    assert read_titles(output_file_path) == TITLES
+
+@pytest.mark.parametrize("module", [stage_wikipedia_scraping, stage_fandom_wiki_scraping])
+def test_page_cache_is_closed(module, tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "TMP_PATH", str(tmp_path))
+    fetcher = FlakyFetcher()
+    fetcher.cache = PageCache(str(tmp_path / "pages"))
+    stage = create_stage(module, None, monkeypatch)
+    monkeypatch.setattr(stage, "create_fetcher", lambda: fetcher)
+
+    assert stage.run()
+    with pytest.raises(sqlite3.ProgrammingError):
+        fetcher.cache.connection.execute("SELECT 1")
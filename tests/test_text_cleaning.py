@@ -0,0 +1,68 @@
+"""Tests of the streaming and in-memory modes of the text cleaning stages.
+"""
+from stage_fandom_wiki_text_cleaning import FandomWikiTextCleaningStage
+from stage_wikipedia_text_cleaning import WikipediaTextCleaningStage
+
+import constants
+import stage_text_cleaning
+
+from os.path import join
+
+import pytest
+
+
+ARTICLES = [
+    "== History == In 1990 the city had 1,000 people and 12th-century walls.",
+    # The section marker of this article has no closing marker.
+    "An unmatched == marker, in the 1950s.",
+    "'''Zürich''' is a [[city|town]] of 400,000 people. == Geography == It is 20 % lake.",
+    "",
+    "== Empty ==\n\nThe  end of   2001 == and more == text.",
+]
+
+class Parent:
+    topic = "test"
+
+class FakeLemmatizer:
+    """Stand-in for the WordNetLemmatizer, whose data is not needed for these tests.
+    """
+
+    def lemmatize(self, token):
+        return token
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "TMP_PATH", str(tmp_path))
+    monkeypatch.setattr(constants, "CACHE_PATH", str(tmp_path))
+    monkeypatch.setattr(stage_text_cleaning, "WordNetLemmatizer", FakeLemmatizer)
+    with open(join(str(tmp_path), "test.raw.txt"), "w") as file:
+        file.write(" ".join(["<<article_start>> {} <<article_end>>".format(article)
+                             for article in ARTICLES]))
+    return str(tmp_path)
+
+def clean(stage_class, streaming, workers):
+    stage = stage_class(Parent(), workers=workers, chunk_size=2, streaming=streaming,
+                        tokenizer="regex")
+    assert stage.run()
+    with open(join(constants.TMP_PATH, "test.clean.txt")) as file:
+        return file.read()
+
+@pytest.mark.parametrize("stage_class", [WikipediaTextCleaningStage,
+                                         FandomWikiTextCleaningStage])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_streaming_same_as_in_memory(raw_dir, stage_class, workers):
+    text = clean(stage_class, False, workers)
+
+    assert clean(stage_class, True, workers) == text
+    articles = text.split("<<article_end>>")
+    assert len(articles) == len(ARTICLES) + 2
+    # The unmatched section marker is not paired with a marker of the next article.
+    for article in articles:
+        assert article.count("<<section_title_start>>") == \
+            article.count("<<section_title_end>>")
+    assert "<<section_title_start>> geography <<section_title_end>>" in articles[2]
+    assert "<<year>>" in articles[1]
+
+def test_ascii_only(raw_dir):
+    assert " zrich " in clean(WikipediaTextCleaningStage, False, 1)
+    assert " zürich " in clean(FandomWikiTextCleaningStage, False, 1)
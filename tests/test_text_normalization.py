@@ -0,0 +1,40 @@
+"""Equivalence of the single-pass normalizer and the chained re.sub passes it replaced.
+"""
+from text_normalization import normalize_text
+
+import random
+import re
+
+
+def normalize_text_chained(text):
+    """The substitutions of the cleaning stages before the single-pass normalizer.
+    """
+    text = re.sub(r' \d{4}(\-\d+|s)?', ' <<year>>', text)
+    text = re.sub(r' \d[\d\.,%]*(st|nd|rd|th| %)?', ' <<number>>', text)
+    text = re.sub(r'<<number>>\-[\d\.,%]+', '<<number>>', text)
+    text = re.sub(r'==+(.*?)==+', r'<<section_title_start>> \1 <<section_title_end>>', text)
+    text = re.sub(r'\s\s+', ' ', text)
+    return text
+
+PIECES = [" ", "  ", "\t", "\n", "1", "19", "2021", "1990s", "-", "-5", ".", ",", "%", " %",
+          "st", "nd", "rd", "th", "s", "=", "==", "===", "<", ">", "<<number>>", "a", "word",
+          "x y", "é"]
+
+def random_text(rng, max_pieces=12):
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, max_pieces)))
+
+def test_examples():
+    text = "In 1990s the  2,000 people == History == lived 5th - 10 %  of 1999-2001\n"
+    assert normalize_text(text) == normalize_text_chained(text)
+
+def test_random_texts():
+    rng = random.Random(0)
+    for _ in range(50000):
+        text = random_text(rng)
+        assert normalize_text(text) == normalize_text_chained(text), repr(text)
+
+def test_long_random_texts():
+    rng = random.Random(1)
+    for _ in range(2000):
+        text = random_text(rng, 200)
+        assert normalize_text(text) == normalize_text_chained(text), repr(text)